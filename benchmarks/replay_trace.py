@@ -0,0 +1,143 @@
+# benchmarks/replay_trace.py
+"""Headless replay of a recorded annotation session (see `main.py --record-trace`).
+
+    python -m benchmarks.replay_trace session.jsonl --images IMG_DIR --jsons JSON_DIR --output replay.json
+
+The JSON folder is copied to a temporary directory first, so the replay never touches
+the real annotations. Each action is dispatched to the same MainWindow handler that
+handled it originally; its latency includes the UI flush that follows it.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication, QMessageBox
+from PyQt6.QtCore import QRectF
+
+from src.interaction_trace import read_trace
+
+
+def _select_file(window, args):
+    widget = window.right_panel.file_list_widget
+    for row in range(widget.count()):
+        if widget.item(row).text() == args["file"]:
+            window.on_file_selected(widget.item(row)); return
+
+
+def _idle_click(window, args):
+    rect_item = window.image_viewer.component_rects.get(args.get("name"))
+    window.handle_idle_mode_click([rect_item] if rect_item else [])
+
+
+def _box_drawn(window, args):
+    window.set_mode('idle', force=True)
+    if args.get("name"): window.add_component_from_box(args["name"], QRectF(*args["rect"]))
+
+
+ACTIONS = {
+    "cancel": lambda w, a: w._cancel_operation(),
+    "set_mode": lambda w, a: w.set_mode(a["mode"]),
+    "save": lambda w, a: w.save_current_annotations(force=True),
+    "select_file": _select_file,
+    "select_component": lambda w, a: w.on_component_selected_from_list(a["name"]),
+    "cycle": lambda w, a: w.cycle_component_selection(a["forward"]),
+    "connect_click": lambda w, a: w.handle_connect_mode_click(a["name"]),
+    "idle_click": _idle_click,
+    "delete_arrow": lambda w, a: w.delete_connection(a["source"], a["target"], a["conn_type"]),
+    "accept_connections": lambda w, a: w.add_proposed_connections(a["proposals"]),
+    "delete_component": lambda w, a: w.delete_component(a["name"]),
+    "toggle_view": lambda w, a: w.on_toggle_connections_view(),
+    "skip_image": lambda w, a: w.on_skip_image(a["reason"]),
+    "copy_annotations": lambda w, a: w.copy_annotations_to_duplicate(a["file"], a["source"]),
+    "navigate": lambda w, a: w._navigate_by(a["step"], a.get("coalesce", False)),
+    "commit_navigation": lambda w, a: w._commit_pending_navigation(),
+    "box_drawn": _box_drawn,
+    "rename": lambda w, a: w.on_component_name_changed(a["old_name"], a["new_name"]),
+    "edit_connections": lambda w, a: w.on_component_connections_changed(a["name"], a["conn_type"], a["value"]),
+}
+
+
+def replay(events, window, app, image_folder=None, json_folder=None, realtime=False):
+    """Dispatches `events` and returns a list of (action, latency_ms) plus unknown actions."""
+    latencies, unknown = [], []
+    replay_start = time.perf_counter()
+    for event in events:
+        action, args = event["action"], dict(event.get("args", {}))
+        if action == "load_image_folder": handler, args = (lambda w, a: w.load_image_folder(a["path"])), {"path": image_folder or args["path"]}
+        elif action == "load_json_folder": handler, args = (lambda w, a: w.load_json_folder(a["path"])), {"path": json_folder or args["path"]}
+        else: handler = ACTIONS.get(action)
+        if handler is None: unknown.append(action); continue
+        if realtime:
+            delay = event.get("t", 0) - (time.perf_counter() - replay_start)
+            if delay > 0: time.sleep(delay)
+        start = time.perf_counter()
+        handler(window, args)
+        window.ui_updates.flush()
+        app.processEvents()
+        latencies.append((action, (time.perf_counter() - start) * 1000))
+    return latencies, unknown
+
+
+def summarize(latencies):
+    by_action = {}
+    for action, ms in latencies: by_action.setdefault(action, []).append(ms)
+    summary = {}
+    for action, values in sorted(by_action.items()):
+        values.sort()
+        summary[action] = {"count": len(values), "p50_ms": round(statistics.median(values), 3),
+                           "p95_ms": round(values[min(len(values) - 1, int(0.95 * (len(values) - 1) + 0.5))], 3),
+                           "max_ms": round(values[-1], 3), "total_ms": round(sum(values), 3)}
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace")
+    parser.add_argument("--images", help="Image folder to use instead of the recorded one")
+    parser.add_argument("--jsons", help="JSON folder to copy and use instead of the recorded one")
+    parser.add_argument("--realtime", action="store_true", help="Honour the recorded timing between actions")
+    parser.add_argument("--output", default="replay_results.json")
+    args = parser.parse_args(argv)
+
+    header, events = read_trace(args.trace)
+    recorded_jsons = next((e["args"]["path"] for e in events if e["action"] == "load_json_folder"), None)
+    source_jsons = args.jsons or recorded_jsons
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    # Modal error boxes would block a headless replay; report them on stdout instead
+    QMessageBox.critical = staticmethod(lambda parent, title, text, *a, **k: print(f"[{title}] {text}"))
+    QMessageBox.warning = staticmethod(lambda parent, title, text, *a, **k: print(f"[{title}] {text}"))
+
+    from src.main_window import MainWindow
+    with tempfile.TemporaryDirectory() as tmp:
+        json_copy = os.path.join(tmp, "jsons")
+        if source_jsons and os.path.isdir(source_jsons): shutil.copytree(source_jsons, json_copy)
+        else: os.makedirs(json_copy)
+        window = MainWindow()
+        window.show()
+        start = time.perf_counter()
+        latencies, unknown = replay(events, window, app, args.images, json_copy, args.realtime)
+        total_ms = (time.perf_counter() - start) * 1000
+        window.close()
+
+    summary = summarize(latencies)
+    report = {"trace": os.path.abspath(args.trace), "trace_version": header.get("version"),
+              "events": len(events), "replayed": len(latencies), "total_ms": round(total_ms, 3),
+              "unknown_actions": sorted(set(unknown)), "actions": summary}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    for action, stats in summary.items():
+        print(f"{action:<20} n={stats['count']:<6} p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms  max {stats['max_ms']:>8.2f} ms")
+    print(f"Replayed {len(latencies)}/{len(events)} actions in {total_ms:.1f} ms; report written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+# benchmarks/run_benchmarks.py
+"""Headless benchmark suite.
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --baseline bench_baseline.json --tolerance 0.25
+
+Runs under QT_QPA_PLATFORM=offscreen, writes machine-readable results and, with
+--baseline, exits non-zero when any benchmark's median regressed beyond the tolerance
+or any accuracy figure dropped.
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QRectF, QPointF, QT_VERSION_STR, PYQT_VERSION_STR
+
+from benchmarks.synthetic import make_components, visible_edges, write_dataset
+from src.session import SESSION_ENV_VAR
+
+
+def measure(func, repeat, setup=None):
+    """Runs `func(state)` `repeat` times (after `setup()` each time) and returns timings in ms."""
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        func(state)
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize(timings)
+
+
+def summarize(timings):
+    return {"median_ms": round(statistics.median(timings), 3), "min_ms": round(min(timings), 3),
+            "mean_ms": round(statistics.fmean(timings), 3), "repeat": len(timings)}
+
+
+def bench_data_model(args, results):
+    from src.data_model import AnnotationData
+    template = make_components(args.components, args.edges, args.max_count, image_size=args.image_size)
+    names = list(template)
+    edges = [(name, conn["name"], conn_type) for name, details in template.items()
+             for conn_type in ("output", "inout") for conn in details["connections"][conn_type]]
+
+    def build(_):
+        model = AnnotationData()
+        for name in names:
+            x1, y1, x2, y2 = template[name]["component_box"]
+            model.add_component(name, QRectF(x1, y1, x2 - x1, y2 - y1))
+        for source, target, conn_type in edges: model.add_connection(source, target, conn_type)
+        return model
+    results["data_model.build"] = measure(build, args.repeat)
+
+    def loaded_model():
+        model = AnnotationData(); model.components = copy.deepcopy(template); return model
+    step = max(1, len(names) // 10)
+    results["data_model.rename_10pct"] = measure(
+        lambda m: [m.rename_component(n, n + "_renamed") for n in names[::step]], args.repeat, loaded_model)
+    results["data_model.remove_10pct"] = measure(
+        lambda m: [m.remove_component(n) for n in names[::step]], args.repeat, loaded_model)
+    results["data_model.update_connections_from_string"] = measure(
+        lambda m: [m.update_connections_from_string(n, "inout", ", ".join(f"{t}*2" for t in names[:5])) for n in names[::step]],
+        args.repeat, loaded_model)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.json")
+        model = loaded_model()
+        results["data_model.save_to_json"] = measure(lambda _: model.save_to_json(path), args.repeat)
+        results["data_model.load_from_json"] = measure(lambda _: AnnotationData().load_from_json(path), args.repeat)
+
+
+def bench_viewer(args, results):
+    from src.data_model import AnnotationData
+    from src.image_viewer import ImageViewer
+    model = AnnotationData()
+    model.components = make_components(args.components, args.edges, args.max_count, image_size=args.image_size)
+    viewer = ImageViewer()
+    viewer.resize(1200, 900)
+    selected = next(iter(model.components), None)
+    results["viewer.redraw_component_rects"] = measure(lambda _: viewer.redraw_component_rects(model), args.repeat)
+    results["viewer.redraw_connections.all"] = measure(lambda _: viewer.redraw_connections(model, True, selected), args.repeat)
+    results["viewer.redraw_connections.focus"] = measure(lambda _: viewer.redraw_connections(model, False, selected), args.repeat)
+    # The geometry stage alone: offsets and box clipping for every arrow of the diagram
+    from src.arrow_geometry import layout_arrows
+    from src.drawing_items import connection_pairs, PARALLEL_SPACING
+    index = {name: i for i, name in enumerate(model.components)}
+    boxes = [details["component_box"] for details in model.components.values()]
+    pairs = [(index[s], index[t], info["count"]) for (s, t), info in connection_pairs(model.components).items() if s in index and t in index]
+    sources, targets, counts = zip(*pairs) if pairs else ((), (), ())
+    results["arrow_geometry.layout_arrows"] = measure(lambda _: layout_arrows(boxes, sources, targets, counts, PARALLEL_SPACING), args.repeat)
+
+    viewer.redraw_connections(model, True, selected)
+    # New items are indexed on the next event-loop pass, as they would be in the running app
+    QApplication.processEvents()
+    rng = random.Random(1)
+    points = [QPointF(rng.uniform(0, args.image_size[0]), rng.uniform(0, args.image_size[1])) for _ in range(args.hit_tests)]
+    results["viewer.hit_test"] = measure(lambda _: [viewer.scene.items(p) for p in points], args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, "bench.png")
+        from benchmarks.synthetic import render_image
+        render_image(model.components, args.image_size, image_path)
+        results["viewer.set_image"] = measure(lambda _: viewer.set_image(image_path), args.repeat)
+    # One full repaint of the view with every arrow shown, fitted, zoomed out and zoomed in
+    viewer.redraw_component_rects(model); viewer.redraw_connections(model, True, selected)
+    results["viewer.paint.fit"] = measure(lambda _: viewer.viewport().grab(), args.repeat)
+    viewer.zoom_by(0.5)
+    results["viewer.paint.zoomed_out"] = measure(lambda _: viewer.viewport().grab(), args.repeat)
+    viewer.fit_to_image(); viewer.zoom_by(8.0)
+    results["viewer.paint.zoomed_in"] = measure(lambda _: viewer.viewport().grab(), args.repeat)
+    viewer.deleteLater()
+
+
+def bench_file_list(args, results):
+    from src.widgets.right_panel import RightPanel
+    with tempfile.TemporaryDirectory() as tmp:
+        _, json_dir, file_names = write_dataset(tmp, args.folder_size, 20, 20, with_images=False)
+        panel = RightPanel()
+        results["right_panel.update_file_list"] = measure(
+            lambda _: panel.update_file_list(file_names, json_dir), max(1, args.repeat // 2))
+        # What a session restore does instead of the scan above
+        entries = panel.file_entries()
+        results["right_panel.populate_file_list"] = measure(lambda _: panel.populate_file_list(entries), args.repeat)
+        panel.deleteLater()
+
+
+def bench_navigation(args, results, app):
+    from src.main_window import MainWindow
+    with tempfile.TemporaryDirectory() as tmp:
+        image_dir, json_dir, file_names = write_dataset(tmp, args.nav_images, args.components, args.edges,
+                                                        args.max_count, image_size=args.image_size)
+        window = MainWindow()
+        window.show()
+        window.load_json_folder(json_dir)
+        window.load_image_folder(image_dir)
+        app.processEvents()
+
+        def walk(step):
+            def run(_):
+                for _ in range(len(file_names) - 1):
+                    window._navigate_by(step)
+                    window.ui_updates.flush()
+            return run
+        results["main_window.navigate_forward"] = measure(walk(1), 1)
+        results["main_window.navigate_back"] = measure(walk(-1), 1)
+        window.close()
+        window.deleteLater()
+
+
+def bench_startup(args, results):
+    """Cold starts of main.py in fresh processes: time to the first frame and each phase before it."""
+    main_py = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+    wall, phases = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "startup.json")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            # A throwaway session file, so the user's last session is neither restored nor replaced
+            subprocess.run([sys.executable, main_py, "--quit-after-startup", "--startup-report", report_path],
+                           check=True, cwd=os.path.dirname(main_py), stdout=subprocess.DEVNULL,
+                           env={**os.environ, SESSION_ENV_VAR: os.path.join(tmp, "session.json")})
+            wall.append((time.perf_counter() - start) * 1000)
+            with open(report_path, 'r', encoding='utf-8') as f: report = json.load(f)
+            phases.setdefault("time_to_first_window", []).append(report["total_ms"])
+            for mark in report["marks"]: phases.setdefault(mark["name"], []).append(mark["phase_ms"])
+    results["startup.process_wall"] = summarize(wall)
+    for name, timings in phases.items(): results[f"startup.{name}"] = summarize(timings)
+
+
+def bench_connection_proposals(args, results, accuracy):
+    """Detection time per image, and how well the proposals match the drawn connections.
+
+    The diagrams are write_dataset()'s: lines run straight between box centres, so they cross
+    each other and other boxes. `confident` figures cover what Shift+Enter would accept.
+    """
+    from src.connection_proposals import propose_connections
+    from src.image_arrays import load_gray
+    timings = []
+    drawn = proposed = pairs_found = typed_right = confident = confident_right = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        image_dir, json_dir, file_names = write_dataset(tmp, args.proposal_images, 10, 12, image_size=args.image_size)
+        for file_name in file_names:
+            with open(os.path.join(json_dir, os.path.splitext(file_name)[0] + ".json"), 'r', encoding='utf-8') as f:
+                components = json.load(f)
+            # Skipped files keep no annotation to check against
+            if "status" in components: continue
+            gray = load_gray(os.path.join(image_dir, file_name))
+            boxes = {name: details["component_box"] for name, details in components.items()}
+            start = time.perf_counter()
+            proposals = propose_connections(gray, boxes)
+            timings.append((time.perf_counter() - start) * 1000)
+            edges = visible_edges(components)
+            pairs = {edge[1] if edge[0] == "inout" else frozenset(edge[1:]) for edge in edges}
+            drawn += len(edges); proposed += len(proposals); confident += sum(p["confident"] for p in proposals)
+            for proposal in proposals:
+                pair = frozenset((proposal["source"], proposal["target"]))
+                edge = ("inout", pair) if proposal["type"] == "inout" else ("output", proposal["source"], proposal["target"])
+                pairs_found += pair in pairs; typed_right += edge in edges
+                confident_right += proposal["confident"] and edge in edges
+    results["connection_proposals.propose"] = summarize(timings)
+    rate = lambda part, whole: round(part / whole, 3) if whole else 0.0
+    accuracy["connection_proposals.pair_recall"] = rate(pairs_found, drawn)
+    accuracy["connection_proposals.pair_precision"] = rate(pairs_found, proposed)
+    accuracy["connection_proposals.typed_precision"] = rate(typed_right, proposed)
+    accuracy["connection_proposals.confident_share"] = rate(confident_right, drawn)
+    accuracy["connection_proposals.confident_precision"] = rate(confident_right, confident)
+
+
+def compare(results, baseline, tolerance):
+    """Returns [(name, baseline_ms, current_ms, ratio)] for benchmarks slower than tolerance."""
+    regressions = []
+    for name, base in baseline.get("results", {}).items():
+        current = results.get(name)
+        if not current or not base.get("median_ms"): continue
+        ratio = current["median_ms"] / base["median_ms"]
+        if ratio > 1 + tolerance: regressions.append((name, base["median_ms"], current["median_ms"], ratio))
+    return regressions
+
+
+def compare_accuracy(accuracy, baseline):
+    """Returns [(name, baseline, current)] for accuracy figures below the baseline's."""
+    return [(name, base, accuracy[name]) for name, base in baseline.get("accuracy", {}).items()
+            if name in accuracy and accuracy[name] < base]
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--components", type=int, default=200)
+    parser.add_argument("--edges", type=int, default=400)
+    parser.add_argument("--max-count", type=int, default=3, help="Maximum multiplicity of a connection")
+    parser.add_argument("--image-size", type=parse_size, default=(2000, 1500), help="WIDTHxHEIGHT")
+    parser.add_argument("--folder-size", type=int, default=2000, help="Files for the file-list benchmark")
+    parser.add_argument("--nav-images", type=int, default=20, help="Images for the navigation benchmark")
+    parser.add_argument("--hit-tests", type=int, default=1000)
+    parser.add_argument("--proposal-images", type=int, default=5, help="Images for the connection proposal benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", choices=["data_model", "viewer", "file_list", "navigation", "startup",
+                                                          "connection_proposals"])
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results, accuracy = {}, {}
+    selected = set(args.only or ["data_model", "viewer", "file_list", "navigation", "startup", "connection_proposals"])
+    if "data_model" in selected: bench_data_model(args, results)
+    if "viewer" in selected: bench_viewer(args, results)
+    if "file_list" in selected: bench_file_list(args, results)
+    if "navigation" in selected: bench_navigation(args, results, app)
+    if "startup" in selected: bench_startup(args, results)
+    if "connection_proposals" in selected: bench_connection_proposals(args, results, accuracy)
+
+    report = {"meta": {"components": args.components, "edges": args.edges, "max_count": args.max_count,
+                       "image_size": list(args.image_size), "folder_size": args.folder_size,
+                       "nav_images": args.nav_images, "proposal_images": args.proposal_images,
+                       "python": platform.python_version(),
+                       "qt": QT_VERSION_STR, "pyqt": PYQT_VERSION_STR, "platform": platform.platform()},
+              "results": results, "accuracy": accuracy}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    for name, stats in results.items():
+        print(f"{name:<48} {stats['median_ms']:>10.2f} ms  (min {stats['min_ms']:.2f}, n={stats['repeat']})")
+    for name, value in accuracy.items(): print(f"{name:<48} {value:>10.3f}")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, base_ms, cur_ms, ratio in regressions:
+            print(f"REGRESSION {name}: {base_ms:.2f} ms -> {cur_ms:.2f} ms ({ratio:.2f}x)")
+        drops = compare_accuracy(accuracy, baseline)
+        for name, base, current in drops: print(f"ACCURACY DROP {name}: {base:.3f} -> {current:.3f}")
+        if regressions or drops: return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
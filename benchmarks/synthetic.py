@@ -0,0 +1,140 @@
+# benchmarks/synthetic.py
+"""Synthetic block diagrams (annotation dicts and matching images) for benchmarks."""
+import json
+import math
+import os
+import random
+
+
+def make_components(n_components, n_edges, max_count=1, inout_ratio=0.2, image_size=(2000, 1500), seed=0,
+                    neighbours_only=False):
+    """Returns an annotation dict in the JSON format with boxes laid out on a grid.
+
+    `n_edges` connections are drawn between random pairs; a share of `inout_ratio` are
+    bidirectional and every edge gets a multiplicity between 1 and `max_count`. With
+    `neighbours_only` edges only join adjacent grid cells, so rendered lines never cross
+    a third box (as in real diagrams), which the image-analysis benchmarks rely on.
+    """
+    rng = random.Random(seed)
+    width, height = image_size
+    cols = max(1, math.ceil(math.sqrt(n_components * width / height)))
+    rows = max(1, math.ceil(n_components / cols))
+    cell_w, cell_h = width / cols, height / rows
+    components = {}
+    names = []
+    for i in range(n_components):
+        r, c = divmod(i, cols)
+        x1, y1 = c * cell_w + cell_w * 0.2, r * cell_h + cell_h * 0.25
+        x2, y2 = x1 + cell_w * 0.6, y1 + cell_h * 0.5
+        name = f"Block{i}"
+        names.append(name)
+        components[name] = {"component_box": [round(x1, 1), round(y1, 1), round(x2, 1), round(y2, 1)],
+                            "connections": {"input": [], "output": [], "inout": []}}
+    if n_components < 2: return components
+    seen = set()
+    attempts = 0
+    while len(seen) < n_edges and attempts < n_edges * 20:
+        attempts += 1
+        if neighbours_only:
+            source = rng.randrange(n_components)
+            r, c = divmod(source, cols)
+            neighbours = [(r + dr) * cols + c + dc for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+                          if (dr or dc) and 0 <= c + dc < cols and 0 <= (r + dr) * cols + c + dc < n_components]
+            source, target = names[source], names[rng.choice(neighbours)]
+        else:
+            source, target = rng.sample(names, 2)
+        is_inout = rng.random() < inout_ratio
+        key = tuple(sorted((source, target))) if is_inout else (source, target)
+        if key in seen: continue
+        seen.add(key)
+        count = rng.randint(1, max(1, max_count))
+        if is_inout:
+            components[source]["connections"]["inout"].append({"name": target, "count": count})
+            components[target]["connections"]["inout"].append({"name": source, "count": count})
+        else:
+            components[source]["connections"]["output"].append({"name": target, "count": count})
+            components[target]["connections"]["input"].append({"name": source, "count": count})
+    return components
+
+
+def _border_point(box, towards_x, towards_y, gap=4.0):
+    """Point just outside `box` on the ray from its center towards (towards_x, towards_y)."""
+    x1, y1, x2, y2 = box
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    dx, dy = towards_x - cx, towards_y - cy
+    if dx == 0 and dy == 0: return cx, cy
+    tx = ((x2 - cx) if dx > 0 else (x1 - cx)) / dx if dx else float("inf")
+    ty = ((y2 - cy) if dy > 0 else (y1 - cy)) / dy if dy else float("inf")
+    t = min(tx, ty)
+    length = math.hypot(dx, dy)
+    t += gap / length
+    return cx + dx * t, cy + dy * t
+
+
+def render_image(components, image_size, path):
+    """Draws the boxes and border-to-border connection lines black-on-white and saves to `path`."""
+    from PyQt6.QtGui import QImage, QPainter, QColor, QPen, QPolygonF, QBrush
+    from PyQt6.QtCore import QRectF, QPointF
+    image = QImage(image_size[0], image_size[1], QImage.Format.Format_RGB32)
+    image.fill(QColor("white"))
+    painter = QPainter(image)
+    painter.setPen(QPen(QColor("black"), 3))
+    for details in components.values():
+        x1, y1, x2, y2 = details["component_box"]
+        painter.drawRect(QRectF(x1, y1, x2 - x1, y2 - y1))
+    painter.setBrush(QBrush(QColor("black")))
+    for name, details in components.items():
+        box = details["component_box"]
+        for conn_type in ("output", "inout"):
+            for conn in details["connections"][conn_type]:
+                if conn["name"] not in components: continue
+                other = components[conn["name"]]["component_box"]
+                start = _border_point(box, (other[0] + other[2]) / 2, (other[1] + other[3]) / 2)
+                end = _border_point(other, (box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+                painter.drawLine(QPointF(*start), QPointF(*end))
+                heads = [(start, end)] if conn_type == "output" else [(start, end), (end, start)]
+                for tail, tip in heads:
+                    angle = math.atan2(tip[1] - tail[1], tip[0] - tail[0])
+                    points = [QPointF(*tip)] + [QPointF(tip[0] - 12 * math.cos(angle + a), tip[1] - 12 * math.sin(angle + a))
+                                                for a in (math.pi / 7, -math.pi / 7)]
+                    painter.drawPolygon(QPolygonF(points))
+    painter.end()
+    image.save(path)
+
+
+def visible_edges(components):
+    """The connections as render_image() shows them: ("output", source, target) or ("inout", pair).
+
+    Lines of the same pair are drawn on top of each other, so they show the union of their
+    arrowheads: opposite outputs look like one inout line.
+    """
+    heads = {}
+    for name, details in components.items():
+        for conn in details["connections"]["output"]: heads.setdefault(frozenset((name, conn["name"])), set()).add(conn["name"])
+        for conn in details["connections"]["inout"]: heads.setdefault(frozenset((name, conn["name"])), set()).update((name, conn["name"]))
+    return {("inout", pair) if len(tips) == 2 else ("output", next(iter(pair - tips)), next(iter(tips)))
+            for pair, tips in heads.items()}
+
+
+def write_dataset(folder, n_images, n_components, n_edges, max_count=1, image_size=(2000, 1500),
+                  with_images=True, seed=0):
+    """Creates <folder>/images and <folder>/jsons with `n_images` synthetic diagrams.
+
+    With `with_images=False` only the JSON files are written and the image names are
+    returned, which is enough for file-list benchmarks on large folders.
+    """
+    image_dir, json_dir = os.path.join(folder, "images"), os.path.join(folder, "jsons")
+    os.makedirs(image_dir, exist_ok=True); os.makedirs(json_dir, exist_ok=True)
+    file_names = []
+    for i in range(n_images):
+        components = make_components(n_components, n_edges, max_count, image_size=image_size, seed=seed + i)
+        file_name = f"diagram_{i}.png"
+        file_names.append(file_name)
+        if i % 10 == 9:
+            data = {"status": "skipped", "reason": "Synthetic skip"}
+        else:
+            data = components
+        with open(os.path.join(json_dir, f"diagram_{i}.json"), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        if with_images: render_image(components, image_size, os.path.join(image_dir, file_name))
+    return image_dir, json_dir, file_names
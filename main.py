@@ -1,10 +1,60 @@
 # main.py
+import os
 import sys
+import argparse
+from src.startup_profile import STARTUP, STARTUP_ENV_VAR
 from PyQt6.QtWidgets import QApplication
-from src.main_window import MainWindow
+from PyQt6.QtCore import QTimer
+from src.profiling import PROFILER, DEFAULT_TRACE_PATH
+from src.interaction_trace import InteractionRecorder, TRACE_ENV_VAR
+from src.memory_diagnostics import MemoryDiagnostics, MEMDIAG_ENV_VAR
+from src.session import default_session_path
+STARTUP.mark("qt_imported")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="System Block Diagram Annotation Tool")
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_TRACE_PATH, metavar="TRACE_JSON",
+                        help=f"Time hot paths, show p50/p95 in the status bar and write a Chrome trace on exit (default: {DEFAULT_TRACE_PATH})")
+    parser.add_argument("--record-trace", metavar="TRACE_JSONL", default=os.environ.get(TRACE_ENV_VAR),
+                        help="Record annotation actions with timestamps for benchmarks/replay_trace.py")
+    parser.add_argument("--mem-diagnostics", type=int, metavar="N", default=int(os.environ.get(MEMDIAG_ENV_VAR) or 0),
+                        help="Sample live graphics items, pixmap bytes and heap growth every N navigations; report leaks")
+    parser.add_argument("--startup-report", nargs="?", const="-", metavar="REPORT_JSON", default=os.environ.get(STARTUP_ENV_VAR),
+                        help="Report how long each start-up phase took once the window is up (printed, or written as JSON)")
+    parser.add_argument("--no-restore", action="store_true",
+                        help="Start with an empty window instead of reopening the last session (it is still saved on exit)")
+    parser.add_argument("--quit-after-startup", action="store_true",
+                        help="Exit as soon as the first frame is shown (for start-up benchmarks)")
+    # Unknown arguments are left for Qt (e.g. -platform offscreen)
+    return parser.parse_known_args(argv[1:])
+
+
+def on_first_frame(args, app):
+    STARTUP.mark("first_frame")
+    if args.startup_report: STARTUP.write(args.startup_report)
+    if args.quit_after_startup: app.quit()
+
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    args, qt_args = parse_args(sys.argv)
+    if args.profile: PROFILER.enable(args.profile)
+    else: PROFILER.configure_from_env()
+    app = QApplication(sys.argv[:1] + qt_args)
+    if PROFILER.enabled: app.aboutToQuit.connect(PROFILER.dump)
+    STARTUP.mark("app_created")
+    from src.main_window import MainWindow
+    STARTUP.mark("main_window_imported")
     window = MainWindow()
+    if args.record_trace: window.recorder = InteractionRecorder(args.record_trace)
+    if args.mem_diagnostics: window.memory_diagnostics = MemoryDiagnostics(args.mem_diagnostics)
+    STARTUP.mark("window_built")
+    window.session_path = default_session_path()
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    STARTUP.mark("window_shown")
+    if window.session_path and not args.no_restore:
+        window.restore_session()
+        STARTUP.mark("session_restored")
+    # Runs on the first event-loop iteration, i.e. after the window has been laid out and painted
+    QTimer.singleShot(0, lambda: on_first_frame(args, app))
+    sys.exit(app.exec())
@@ -0,0 +1,315 @@
+# src/annotation_core.py
+"""The annotation model and its JSON files, without Qt.
+
+Boxes are plain [x1, y1, x2, y2] lists, so headless jobs (validation, export, statistics)
+and their worker processes never import PyQt. The GUI uses the adapter in
+src/data_model.py. iter_annotations() reads a folder lazily, one file at a time.
+"""
+import json
+import os
+import re
+from src.profiling import timed
+
+
+class ConcurrentModificationError(Exception):
+    """The annotation file was changed by someone else since it was loaded or saved here."""
+
+
+def _stat_key(file_path):
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _digest(raw):
+    import hashlib  # Deferred to the first load; not needed to bring the window up
+    return hashlib.sha1(raw).hexdigest()
+
+
+def _with_counts(components):
+    """Fills in the connection multiplicity older files leave out."""
+    for comp_details in components.values():
+        for conn_list in comp_details.get('connections', {}).values():
+            for conn in conn_list:
+                if 'count' not in conn:
+                    conn['count'] = 1
+    return components
+
+
+def parse_connections(conn_str):
+    """[{'name', 'count'}] from a comma-separated list like "ADC, DSP*2"."""
+    new_conns = []
+    for part in (p.strip() for p in conn_str.split(',')):
+        if not part: continue
+        match = re.match(r'(.+?)\s*\*+\s*([0-9]+)', part)
+        if match:
+            name, count = match.groups()
+            new_conns.append({'name': name.strip(), 'count': int(count)})
+        else:
+            new_conns.append({'name': part, 'count': 1})
+    return new_conns
+
+
+def format_connections(conn_list):
+    """The inverse of parse_connections."""
+    return ", ".join(f"{c['name']}*{c['count']}" if c.get('count', 1) > 1 else c['name'] for c in conn_list)
+
+
+def iter_json_names(folder):
+    """Yields the annotation file names of `folder` in directory order without building a list.
+    Hidden entries (.claims, .proposals, ...) are skipped."""
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and not entry.name.startswith('.') and entry.is_file():
+                yield entry.name
+
+
+def read_annotation(path):
+    """The parsed JSON at `path`, or None if it is missing or unreadable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_skipped(data):
+    return isinstance(data, dict) and data.get("status") == "skipped"
+
+
+def components_of(data):
+    """The component dict of an annotation (empty for skipped or missing files)."""
+    return {} if data is None or is_skipped(data) else data
+
+
+def write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def iter_annotations(folder, names=None):
+    """Yields (file name, AnnotationData) for the JSON files of `folder` (or just `names`),
+    reading each file only when it is reached. Unreadable files yield an empty model."""
+    for file_name in (iter_json_names(folder) if names is None else names):
+        annotation = AnnotationData()
+        annotation.load_from_json(os.path.join(folder, file_name))
+        yield file_name, annotation
+
+
+class AnnotationData:
+    """Components of one image ({name: {"component_box", "connections"}}) or its skip reason."""
+    def __init__(self):
+        self.components = {}
+        self.image_path = None
+        self.skipped_reason = None
+        # True once the annotations differ from what was last loaded/saved
+        self.modified = False
+        # ((mtime_ns, size), sha1) of the file as last loaded/saved here, None if it did not exist
+        self._disk_state = None
+
+    def clear(self):
+        self.components.clear()
+        self.image_path = None
+        self.skipped_reason = None
+        self.modified = False
+        self._disk_state = None
+
+    def mark_skipped(self, reason):
+        self.components = {}
+        self.skipped_reason = reason
+        self.modified = True
+
+    def replace_components(self, components):
+        """Takes over another image's annotations (e.g. for a duplicate); unskips the image."""
+        self.components = _with_counts(components)
+        self.skipped_reason = None
+        self.modified = True
+
+    @timed("load_from_json")
+    def load_from_json(self, file_path):
+        try:
+            # Stat before reading: a write in between then shows up as a (harmless) hash check
+            stat_key = _stat_key(file_path)
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            self._disk_state = (stat_key, _digest(raw))
+            data = json.loads(raw.decode('utf-8'))
+            if "status" in data and data["status"] == "skipped":
+                self.skipped_reason = data.get("reason", "Unknown")
+                self.components = {}
+            else:
+                self.components = _with_counts(data)
+                self.skipped_reason = None
+            self.modified = False
+            return True
+        except FileNotFoundError:
+            self._disk_state = None
+            self.components = {}
+            self.skipped_reason = None
+            self.modified = False
+            return False
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            # A corrupt file may be overwritten; _disk_state was recorded above
+            self.components = {}
+            self.skipped_reason = None
+            self.modified = False
+            return False
+
+    def changed_on_disk(self, file_path):
+        """True if `file_path` no longer holds what was last loaded from or saved to it here."""
+        current = _stat_key(file_path)
+        if current is None: return False
+        if self._disk_state is None: return True
+        if current == self._disk_state[0]: return False
+        try:
+            with open(file_path, 'rb') as f: digest = _digest(f.read())
+        except OSError:
+            return True
+        # Touched but identical content is not a conflict
+        if digest == self._disk_state[1]: self._disk_state = (current, digest); return False
+        return True
+
+    @timed("save_to_json")
+    def save_to_json(self, file_path, overwrite=False):
+        """Writes the annotations atomically. Raises ConcurrentModificationError instead of
+        replacing changes someone else saved in the meantime, unless `overwrite` is set."""
+        if self.skipped_reason:
+            data_to_save = {"status": "skipped", "reason": self.skipped_reason}
+        elif self.components:
+            data_to_save = self.components
+        else:
+            return
+            
+        if not overwrite and self.changed_on_disk(file_path):
+            raise ConcurrentModificationError(f"'{os.path.basename(file_path)}' was modified by someone else since it was loaded.")
+        raw = json.dumps(data_to_save, indent=2, ensure_ascii=False).encode('utf-8')
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(raw)
+            os.replace(tmp_path, file_path)
+            self._disk_state = (_stat_key(file_path), _digest(raw))
+            self.modified = False
+            return True
+        except IOError as e:
+            print(f"Error saving JSON: {e}")
+            try: os.remove(tmp_path)
+            except OSError: pass
+            return False
+
+    def add_component(self, name, box):
+        """Adds a component with no connections; `box` is (x1, y1, x2, y2)."""
+        if name in self.components:
+            raise ValueError(f"Component with name '{name}' already exists.")
+        
+        x1, y1, x2, y2 = box
+        self.components[name] = {
+            "component_box": [x1, y1, x2, y2],
+            "connections": {"input": [], "output": [], "inout": []}
+        }
+        self.modified = True
+
+    def remove_component(self, name):
+        if name in self.components:
+            del self.components[name]
+            self.modified = True
+            # Now we only need to clean up connections TO the deleted component
+            for comp_name, details in self.components.items():
+                for conn_type in ["input", "output", "inout"]:
+                    details["connections"][conn_type] = [
+                        conn for conn in details["connections"][conn_type] if conn["name"] != name
+                    ]
+
+    def rename_component(self, old_name, new_name):
+        if new_name in self.components:
+            raise ValueError(f"Component name '{new_name}' already exists.")
+        if old_name not in self.components:
+            return
+
+        self.components[new_name] = self.components.pop(old_name)
+        self.modified = True
+
+        for details in self.components.values():
+            for conn_list in details["connections"].values():
+                for conn in conn_list:
+                    if conn["name"] == old_name:
+                        conn["name"] = new_name
+    
+    def update_connections_from_string(self, comp_name, conn_type, conn_str):
+        if comp_name not in self.components: return
+
+        new_conns = parse_connections(conn_str)
+        
+        old_conns = self.components[comp_name]['connections'][conn_type]
+        # The field also reports unchanged text when it merely loses focus
+        if [(c['name'], c['count']) for c in new_conns] == [(c['name'], c.get('count', 1)) for c in old_conns]: return
+        self.modified = True
+        
+        # Reciprocity now only applies to 'inout' type connections
+        reciprocal_type = {'inout': 'inout'}.get(conn_type)
+        
+        if reciprocal_type:
+            # Remove old reciprocal connections
+            for old_conn in old_conns:
+                target_name = old_conn['name']
+                if target_name in self.components:
+                    self.components[target_name]['connections'][reciprocal_type] = [
+                        c for c in self.components[target_name]['connections'][reciprocal_type] if c['name'] != comp_name
+                    ]
+
+        # Set the new connections for the source component
+        self.components[comp_name]['connections'][conn_type] = new_conns
+        
+        if reciprocal_type:
+            # Add new reciprocal connections
+            for new_conn in new_conns:
+                target_name = new_conn['name']
+                if target_name in self.components and target_name != comp_name:
+                    if not any(c['name'] == comp_name for c in self.components[target_name]['connections'][reciprocal_type]):
+                         self.components[target_name]['connections'][reciprocal_type].append({'name': comp_name, 'count': 1})
+
+    def add_connection(self, source_name, target_name, conn_type):
+        if source_name not in self.components or target_name not in self.components:
+            return
+
+        def _update_or_add(conn_list, name_to_add):
+            existing_conn = next((c for c in conn_list if c['name'] == name_to_add), None)
+            if existing_conn:
+                existing_conn['count'] = existing_conn.get('count', 1) + 1
+            else:
+                conn_list.append({"name": name_to_add, "count": 1})
+
+        self.modified = True
+        if conn_type == 'output':
+            # ONLY add to the source's output list
+            _update_or_add(self.components[source_name]['connections']['output'], target_name)
+        
+        elif conn_type == 'inout':
+            # inout remains reciprocal
+            _update_or_add(self.components[source_name]['connections']['inout'], target_name)
+            _update_or_add(self.components[target_name]['connections']['inout'], source_name)
+
+    def remove_connection(self, source_name, target_name, conn_type):
+        if source_name not in self.components or target_name not in self.components:
+            return
+
+        def _decrement_or_remove(conn_list, name_to_remove):
+            conn_to_modify = next((c for c in conn_list if c['name'] == name_to_remove), None)
+            if conn_to_modify:
+                if conn_to_modify.get('count', 1) > 1:
+                    conn_to_modify['count'] -= 1
+                else:
+                    conn_list[:] = [c for c in conn_list if c['name'] != name_to_remove]
+
+        self.modified = True
+        if conn_type == 'output':
+            # ONLY remove from the source's output list
+            _decrement_or_remove(self.components[source_name]['connections']['output'], target_name)
+        elif conn_type == 'inout':
+            # inout remains reciprocal
+            _decrement_or_remove(self.components[source_name]['connections']['inout'], target_name)
+            _decrement_or_remove(self.components[target_name]['connections']['inout'], source_name)
@@ -0,0 +1,54 @@
+# src/batch/common.py
+"""Helpers shared by the headless dataset tools: edge counting and a spawn-based worker
+pool. Folder listings and annotation file I/O live in the Qt-free src.annotation_core and
+are re-exported here."""
+import multiprocessing
+from collections import deque
+
+from src.annotation_core import iter_json_names, read_annotation, is_skipped, components_of, write_json_atomic
+
+__all__ = ["edge_counts", "parallel_map",
+           "iter_json_names", "read_annotation", "is_skipped", "components_of", "write_json_atomic"]
+
+
+def edge_counts(components, rename=None):
+    """{edge key: count} over the `output` and `inout` lists. Keys are ('output', source, target)
+    and ('inout', a, b) with a <= b; `rename` maps component names first (unmapped ones are dropped)."""
+    edges = {}
+    for source, details in components.items():
+        src = rename.get(source) if rename is not None else source
+        if src is None: continue
+        connections = details.get("connections", {})
+        for conn in connections.get("output", []):
+            tgt = rename.get(conn["name"]) if rename is not None else conn["name"]
+            if tgt is None: continue
+            key = ("output", src, tgt)
+            edges[key] = edges.get(key, 0) + conn.get("count", 1)
+        for conn in connections.get("inout", []):
+            tgt = rename.get(conn["name"]) if rename is not None else conn["name"]
+            if tgt is None: continue
+            # inout is stored on both ends; keep the larger count, as the viewer does
+            key = ("inout",) + tuple(sorted((src, tgt), key=str))
+            edges[key] = max(edges.get(key, 0), conn.get("count", 1))
+    return edges
+
+
+def parallel_map(func, items, workers=None, chunksize=32, max_pending=None):
+    """Lazily maps `func` over `items` in a spawn process pool, yielding results in completion
+    order (don't rely on any order; workers=1 runs everything in this process, in order, which
+    is handy for debugging and small folders).
+
+    The pool reads `items` ahead as fast as it can; for large items (e.g. chunks of records)
+    pass `max_pending` to keep at most that many tasks in flight. Those results come back in
+    input order, so one slow task holds back the finished ones queued behind it.
+    """
+    if workers == 1:
+        yield from map(func, items); return
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        if max_pending is None:
+            yield from pool.imap_unordered(func, items, chunksize=chunksize); return
+        pending = deque()
+        for item in items:
+            pending.append(pool.apply_async(func, (item,)))
+            if len(pending) >= max_pending: yield pending.popleft().get()
+        while pending: yield pending.popleft().get()
@@ -0,0 +1,206 @@
+# src/batch/merge.py
+"""Agreement and merge of several annotators' JSON folders.
+
+Components are matched by box IoU, not by name: the first folder is the reference and
+every other annotator's boxes are greedily paired with the reference clusters. Box
+agreement is precision/recall of the matches; edge agreement is precision/recall over
+`output`/`inout` edges (with counts) after mapping names through the matches.
+
+Files are processed one per task in a worker pool and only small per-file summaries come
+back, so memory stays bounded on 100k-file folders: merged JSONs are written by the
+workers, conflicts are streamed to a JSON Lines report.
+
+    python -m src.batch.merge ANNOTATOR_A ANNOTATOR_B [...] --output MERGED_DIR
+"""
+import json
+import os
+from collections import Counter
+from functools import partial
+
+from src.annotation_core import iter_json_names, read_annotation, is_skipped, components_of, write_json_atomic
+from src.batch.common import edge_counts, parallel_map
+from src.box_proposals import box_iou
+
+DEFAULT_IOU = 0.5
+
+
+def match_boxes(boxes_a, boxes_b, iou_threshold=DEFAULT_IOU):
+    """Greedy one-to-one matching by descending IoU; returns [(index_a, index_b, iou)]."""
+    pairs = [(box_iou(a, b), i, j) for i, a in enumerate(boxes_a) for j, b in enumerate(boxes_b)]
+    pairs = sorted((p for p in pairs if p[0] >= iou_threshold), reverse=True)
+    used_a, used_b, matches = set(), set(), []
+    for iou, i, j in pairs:
+        if i in used_a or j in used_b: continue
+        used_a.add(i); used_b.add(j); matches.append((i, j, iou))
+    return matches
+
+
+def _edge_agreement(edges_ref, edges_other):
+    """(true positives, reference total, other total) with counts as multiplicities."""
+    tp = sum(min(count, edges_other.get(key, 0)) for key, count in edges_ref.items())
+    return tp, sum(edges_ref.values()), sum(edges_other.values())
+
+
+def _build_json(names, boxes, edges):
+    """Annotation dict in the tool's format from cluster names/boxes and {edge key: count}."""
+    data = {names[c]: {"component_box": [round(v, 2) for v in boxes[c]],
+                       "connections": {"input": [], "output": [], "inout": []}} for c in range(len(names))}
+    for key, count in sorted(edges.items(), key=str):
+        kind, a, b = key
+        if kind == "output":
+            data[names[a]]["connections"]["output"].append({"name": names[b], "count": count})
+            data[names[b]]["connections"]["input"].append({"name": names[a], "count": count})
+        else:
+            data[names[a]]["connections"]["inout"].append({"name": names[b], "count": count})
+            if a != b: data[names[b]]["connections"]["inout"].append({"name": names[a], "count": count})
+    return data
+
+
+def merge_file(file_name, folders, output_folder=None, iou_threshold=DEFAULT_IOU, quorum=None):
+    """Compares and merges one file across `folders`. Returns a summary dict with per-annotator
+    stats (against the reference folder) and the list of conflicts."""
+    annotations = [read_annotation(os.path.join(folder, file_name)) for folder in folders]
+    n = len(folders)
+    summary = {"file": file_name, "missing": [i for i, data in enumerate(annotations) if data is None],
+               "stats": [], "conflicts": []}
+    present = [i for i, data in enumerate(annotations) if data is not None]
+    if not present: return summary
+    # Agreement is judged among the annotators that have the file
+    quorum = min(quorum or len(present) // 2 + 1, len(present))
+    skipped = [i for i in present if is_skipped(annotations[i])]
+    if skipped and len(skipped) < len(present):
+        summary["conflicts"].append({"type": "skip", "skipped_by": skipped,
+                                     "reasons": [annotations[i].get("reason") for i in skipped]})
+    if len(skipped) >= quorum:
+        if output_folder:
+            reasons = Counter(annotations[i].get("reason", "Unknown") for i in skipped)
+            write_json_atomic(os.path.join(output_folder, file_name), {"status": "skipped", "reason": reasons.most_common(1)[0][0]})
+        summary["merged"] = "skipped"
+        return summary
+    if len(present) - len(skipped) < quorum:
+        # Neither skipping nor annotating has a quorum: an empty merged file would read as "no components"
+        summary["conflicts"].append({"type": "unresolved", "skipped_by": skipped,
+                                     "annotated_by": [i for i in present if i not in skipped]})
+        summary["merged"] = None
+        return summary
+
+    # Clusters start from the reference annotator; the others join by IoU against the cluster box
+    ref = components_of(annotations[0])
+    cluster_names = [[name] for name in ref]
+    cluster_boxes = [[details["component_box"]] for details in ref.values()]
+    cluster_votes = [{0} for _ in ref]
+    renames = [{name: c for c, name in enumerate(ref)}]
+    for i in range(1, n):
+        comps = components_of(annotations[i])
+        names = list(comps)
+        rep_boxes = [[sum(v) / len(v) for v in zip(*boxes)] for boxes in cluster_boxes]
+        matches = match_boxes(rep_boxes, [comps[name]["component_box"] for name in names], iou_threshold)
+        rename = {}
+        for c, j, _ in matches:
+            rename[names[j]] = c
+            cluster_names[c].append(names[j]); cluster_boxes[c].append(comps[names[j]]["component_box"]); cluster_votes[c].add(i)
+        for j, name in enumerate(names):
+            if name in rename: continue
+            rename[name] = len(cluster_names)
+            cluster_names.append([name]); cluster_boxes.append([comps[name]["component_box"]]); cluster_votes.append({i})
+        renames.append(rename)
+        if annotations[i] is not None and annotations[0] is not None:
+            ref_edges, other_edges = edge_counts(ref, renames[0]), edge_counts(comps, rename)
+            tp, ref_total, other_total = _edge_agreement(ref_edges, other_edges)
+            summary["stats"].append({"annotator": i, "box_tp": len(matches), "box_ref": len(ref), "box_other": len(comps),
+                                     "edge_tp": tp, "edge_ref": ref_total, "edge_other": other_total})
+
+    for c, names in enumerate(cluster_names):
+        if len(set(names)) > 1:
+            summary["conflicts"].append({"type": "name", "names": names})
+        if len(cluster_votes[c]) < len(present):
+            summary["conflicts"].append({"type": "box", "name": names[0], "annotators": sorted(cluster_votes[c]),
+                                         "box": cluster_boxes[c][0]})
+
+    votes, counts = Counter(), {}
+    for i in present:
+        for key, count in edge_counts(components_of(annotations[i]), renames[i]).items():
+            votes[key] += 1; counts.setdefault(key, []).append(count)
+    kept_clusters = [c for c in range(len(cluster_names)) if len(cluster_votes[c]) >= quorum]
+    kept_index = {c: k for k, c in enumerate(kept_clusters)}
+    merged_edges = {}
+    for key, vote in votes.items():
+        kind, a, b = key
+        cluster_names_ab = [cluster_names[a][0], cluster_names[b][0]]
+        if vote < len(present) or len(set(counts[key])) > 1:
+            summary["conflicts"].append({"type": "edge", "kind": kind, "between": cluster_names_ab, "votes": vote,
+                                         "counts": counts[key]})
+        if vote >= quorum and a in kept_index and b in kept_index:
+            ordered = sorted(counts[key])
+            merged_edges[(kind, kept_index[a], kept_index[b])] = ordered[(len(ordered) - 1) // 2]
+
+    if output_folder:
+        merged_names, used = [], set()
+        for c in kept_clusters:
+            name = Counter(cluster_names[c]).most_common(1)[0][0]
+            # Majority name, with ties going to the earliest annotator; disambiguate clashes
+            suffix = 2
+            unique = name
+            while unique in used: unique = f"{name}_{suffix}"; suffix += 1
+            used.add(unique); merged_names.append(unique)
+        merged_boxes = [[sum(v) / len(v) for v in zip(*cluster_boxes[c])] for c in kept_clusters]
+        write_json_atomic(os.path.join(output_folder, file_name), _build_json(merged_names, merged_boxes, merged_edges))
+    summary["merged"] = len(kept_clusters)
+    return summary
+
+
+def _file_names(folders):
+    """All file names of the reference folder, then those only the other folders have."""
+    yield from iter_json_names(folders[0])
+    for folder in folders[1:]:
+        for name in iter_json_names(folder):
+            if not os.path.exists(os.path.join(folders[0], name)): yield name
+
+
+def merge_folders(folders, output_folder=None, report_path=None, iou_threshold=DEFAULT_IOU, quorum=None,
+                  workers=None, progress=None):
+    """Runs merge_file over every file and returns the aggregated agreement numbers."""
+    if output_folder: os.makedirs(output_folder, exist_ok=True)
+    worker = partial(merge_file, folders=list(folders), output_folder=output_folder, iou_threshold=iou_threshold, quorum=quorum)
+    totals = {i: Counter() for i in range(1, len(folders))}
+    files, conflict_count, missing = 0, Counter(), Counter()
+    report = open(report_path, 'w', encoding='utf-8') if report_path else None
+    try:
+        for summary in parallel_map(worker, _file_names(folders), workers):
+            files += 1
+            for i in summary["missing"]: missing[i] += 1
+            for stats in summary["stats"]: totals[stats["annotator"]].update({k: v for k, v in stats.items() if k != "annotator"})
+            for conflict in summary["conflicts"]:
+                conflict_count[conflict["type"]] += 1
+                if report: report.write(json.dumps({"file": summary["file"], **conflict}, ensure_ascii=False) + "\n")
+            if progress: progress(files)
+    finally:
+        if report: report.close()
+
+    def ratio(a, b): return round(a / b, 4) if b else None
+    agreement = {}
+    for i, t in totals.items():
+        agreement[folders[i]] = {"box_precision": ratio(t["box_tp"], t["box_other"]), "box_recall": ratio(t["box_tp"], t["box_ref"]),
+                                 "edge_precision": ratio(t["edge_tp"], t["edge_other"]), "edge_recall": ratio(t["edge_tp"], t["edge_ref"]),
+                                 **dict(t)}
+    return {"reference": folders[0], "files": files, "missing": {folders[i]: c for i, c in missing.items()},
+            "conflicts": dict(conflict_count), "agreement": agreement}
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Annotator agreement and merged annotations (first folder is the reference)")
+    parser.add_argument("folders", nargs='+', help="JSON folders of the annotators")
+    parser.add_argument("--output", help="Folder for the merged JSON files")
+    parser.add_argument("--report", default="merge_conflicts.jsonl", help="Conflict report (JSON Lines)")
+    parser.add_argument("--summary", help="Write the agreement summary to this JSON file")
+    parser.add_argument("--iou", type=float, default=DEFAULT_IOU, help="Minimum box IoU for a match")
+    parser.add_argument("--quorum", type=int, default=None, help="Annotators that must agree (default: majority)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    if len(args.folders) < 2: parser.error("need at least two folders")
+    result = merge_folders(args.folders, args.output, args.report, args.iou, args.quorum, args.workers)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f: f.write(text)
+    print(text)
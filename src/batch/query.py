@@ -0,0 +1,366 @@
+# src/batch/query.py
+"""Graph queries over an annotated dataset.
+
+Each JSON file is turned into a compact adjacency record: component names plus integer
+edge lists for `output` and `inout` connections, with counts. Records are kept in an SQLite
+index in the user's local cache directory, one per JSON folder (keyed by its path), never
+in the shared folder itself: SQLite locking is unreliable on network shares.
+``SBA_QUERY_CACHE`` overrides the directory. The index is refreshed incrementally by file
+mtime/size and read back as a stream, so memory stays flat on large folders. Records are
+built and queries evaluated in a worker pool.
+
+Query language (combine with ``and``, ``or``, ``not`` and parentheses; quote names with spaces):
+
+    cycle                          a directed cycle over output edges
+    skipped                        the image was skipped
+    has NAME                       a component with this name exists
+    path X -> Y <= N               X feeds Y through at most N hops (inout goes both ways)
+    METRIC OP N                    METRIC is components, edges, inout_pairs, fanout or fanin
+                                   (fanout/fanin: the largest per-component value, counts included)
+
+    python -m src.batch.query JSON_DIR "cycle and fanout > 5"
+    python -m src.batch.query JSON_DIR 'path "Mixer" -> ADC <= 2' --images IMG_DIR
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from collections import deque
+from functools import lru_cache, partial
+
+from src.annotation_core import iter_json_names, read_annotation, is_skipped
+from src.batch.common import parallel_map
+
+QUERY_CACHE_ENV_VAR = "SBA_QUERY_CACHE"
+INDEX_VERSION = 1
+CHUNK_SIZE = 256
+METRICS = ("components", "edges", "inout_pairs", "fanout", "fanin")
+
+
+class QueryError(ValueError):
+    pass
+
+
+# --- Adjacency records --------------------------------------------------------------------
+
+def graph_record(components, skipped=False):
+    """Compact adjacency: {"names", "out": [[i, j, count]], "inout": [[i, j, count]] (i < j), "skipped"}."""
+    names = list(components)
+    index = {name: i for i, name in enumerate(names)}
+    out, inout = {}, {}
+    for source, details in components.items():
+        i = index[source]
+        connections = details.get("connections", {})
+        for conn in connections.get("output", []):
+            j = index.get(conn["name"])
+            if j is not None: out[(i, j)] = out.get((i, j), 0) + conn.get("count", 1)
+        for conn in connections.get("inout", []):
+            j = index.get(conn["name"])
+            if j is not None:
+                key = (min(i, j), max(i, j))
+                inout[key] = max(inout.get(key, 0), conn.get("count", 1))
+    return {"names": names, "out": [[i, j, c] for (i, j), c in out.items()],
+            "inout": [[i, j, c] for (i, j), c in inout.items()], "skipped": skipped}
+
+
+def _record_for_file(file_name, json_folder):
+    path = os.path.join(json_folder, file_name)
+    try: st = os.stat(path)
+    except OSError: return file_name, None, None, None
+    data = read_annotation(path)
+    if not isinstance(data, dict): record = graph_record({})
+    elif is_skipped(data): record = graph_record({}, skipped=True)
+    else: record = graph_record(data)
+    return file_name, st.st_mtime_ns, st.st_size, json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+class Graph:
+    """Adjacency built from a record, with the derived values queries need (computed lazily)."""
+    def __init__(self, record):
+        self.names = record["names"]
+        self.skipped = record["skipped"]
+        self.out_edges, self.inout_edges = record["out"], record["inout"]
+        n = len(self.names)
+        self.succ = [dict() for _ in range(n)]
+        self.fanout, self.fanin = [0] * n, [0] * n
+        for i, j, c in self.out_edges:
+            self.succ[i][j] = self.succ[i].get(j, 0) + c; self.fanout[i] += c; self.fanin[j] += c
+        self.neighbours = [set(s) for s in self.succ]
+        for i, j, c in self.inout_edges:
+            self.neighbours[i].add(j); self.neighbours[j].add(i)
+            self.fanout[i] += c; self.fanin[i] += c
+            if i != j: self.fanout[j] += c; self.fanin[j] += c
+        self._index = None
+        self._has_cycle = None
+
+    def metric(self, name):
+        if name == "components": return len(self.names)
+        if name == "edges": return sum(c for _, _, c in self.out_edges) + sum(c for _, _, c in self.inout_edges)
+        if name == "inout_pairs": return len(self.inout_edges)
+        if name == "fanout": return max(self.fanout, default=0)
+        if name == "fanin": return max(self.fanin, default=0)
+        raise QueryError(f"Unknown metric {name!r}")
+
+    def index_of(self, name):
+        if self._index is None: self._index = {n: i for i, n in enumerate(self.names)}
+        return self._index.get(name)
+
+    def has_cycle(self):
+        """Directed cycle over output edges (inout pairs alone do not count), iterative DFS."""
+        if self._has_cycle is None:
+            state = [0] * len(self.names)  # 0 new, 1 on stack, 2 done
+            self._has_cycle = False
+            for root in range(len(self.names)):
+                if state[root]: continue
+                stack = [(root, iter(self.succ[root]))]; state[root] = 1
+                while stack and not self._has_cycle:
+                    node, children = stack[-1]
+                    child = next(children, None)
+                    if child is None: state[node] = 2; stack.pop()
+                    elif state[child] == 1: self._has_cycle = True
+                    elif state[child] == 0: state[child] = 1; stack.append((child, iter(self.succ[child])))
+                if self._has_cycle: break
+        return self._has_cycle
+
+    def hops(self, source, target, limit):
+        """True if `target` is reachable from `source` within `limit` edges."""
+        start, goal = self.index_of(source), self.index_of(target)
+        if start is None or goal is None: return False
+        seen, frontier = {start}, deque([(start, 0)])
+        while frontier:
+            node, depth = frontier.popleft()
+            if depth == limit: continue
+            for nxt in self.neighbours[node]:
+                if nxt == goal: return True
+                if nxt not in seen: seen.add(nxt); frontier.append((nxt, depth + 1))
+        return False
+
+
+# --- Query language -----------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r'\s*(?:"([^"]*)"|\'([^\']*)\'|(->|<=|>=|==|!=|<|>|\(|\))|([^\s()<>=!"\']+?(?=\s|$|[()<>=!]|->)))')
+_OPS = {"<": lambda a, b: a < b, "<=": lambda a, b: a <= b, ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+        "==": lambda a, b: a == b, "!=": lambda a, b: a != b}
+
+
+def _tokenize(text):
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos: raise QueryError(f"Cannot parse query near {text[pos:]!r}")
+        quoted = match.group(1) if match.group(1) is not None else match.group(2)
+        if quoted is not None: tokens.append(("name", quoted))
+        elif match.group(3): tokens.append(("op", match.group(3)))
+        else: tokens.append(("word", match.group(4)))
+        pos = match.end()
+        while pos < len(text) and text[pos].isspace(): pos += 1
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens, self.pos = _tokenize(text), 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (value and token[1] != value):
+            found = repr(token[1]) if token[0] else "the end of the query"
+            raise QueryError(f"Expected {value or ('a number' if kind == 'word' else kind)} but found {found}")
+        self.pos += 1
+        return token[1]
+
+    def keyword(self, word):
+        if self.peek() == ("word", word): self.pos += 1; return True
+        return False
+
+    def name(self):
+        kind, value = self.peek()
+        if kind not in ("name", "word"): raise QueryError(f"Expected a component name, found {value!r}")
+        self.pos += 1
+        return value
+
+    def number(self):
+        value = self.take("word")
+        try: return int(value)
+        except ValueError: raise QueryError(f"Expected a number, found {value!r}")
+
+    def parse(self):
+        predicate = self.parse_or()
+        if self.pos != len(self.tokens): raise QueryError(f"Unexpected {self.peek()[1]!r}")
+        return predicate
+
+    def parse_or(self):
+        terms = [self.parse_and()]
+        while self.keyword("or"): terms.append(self.parse_and())
+        return terms[0] if len(terms) == 1 else (lambda g: any(t(g) for t in terms))
+
+    def parse_and(self):
+        terms = [self.parse_not()]
+        while self.keyword("and"): terms.append(self.parse_not())
+        return terms[0] if len(terms) == 1 else (lambda g: all(t(g) for t in terms))
+
+    def parse_not(self):
+        if self.keyword("not"):
+            inner = self.parse_not()
+            return lambda g: not inner(g)
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, value = self.peek()
+        if (kind, value) == ("op", "("):
+            self.pos += 1; inner = self.parse_or(); self.take("op", ")")
+            return inner
+        if self.keyword("cycle"): return lambda g: g.has_cycle()
+        if self.keyword("skipped"): return lambda g: g.skipped
+        if self.keyword("has"):
+            name = self.name()
+            return lambda g: g.index_of(name) is not None
+        if self.keyword("path"):
+            source = self.name(); self.take("op", "->"); target = self.name()
+            limit = float("inf")
+            if self.peek() in (("op", "<="), ("op", "<")):
+                op = self.take("op"); limit = self.number() - (1 if op == "<" else 0)
+            return lambda g: g.hops(source, target, limit)
+        if kind == "word" and value in METRICS:
+            self.pos += 1
+            op = self.take("op")
+            if op not in _OPS: raise QueryError(f"Expected a comparison after {value}, found {op!r}")
+            number, compare = self.number(), _OPS[op]
+            return lambda g: compare(g.metric(value), number)
+        raise QueryError(f"Unknown query term {value!r}")
+
+
+@lru_cache(maxsize=32)
+def compile_query(text):
+    """Parses `text` into a predicate over Graph; raises QueryError on syntax errors."""
+    return _Parser(text).parse()
+
+
+def _evaluate_chunk(rows, query):
+    predicate = compile_query(query)
+    return [file_name for file_name, payload in rows if predicate(Graph(json.loads(payload)))]
+
+
+# --- Index and evaluation -----------------------------------------------------------------
+
+def index_path(json_folder):
+    """The index file of `json_folder` in the local cache."""
+    cache_dir = os.environ.get(QUERY_CACHE_ENV_VAR, "").strip()
+    if not cache_dir:
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(cache_home, "SysBlockAnnotator", "query")
+    key = hashlib.blake2b(os.path.abspath(json_folder).encode(), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, f"{key}.sqlite")
+
+
+def _connect(json_folder):
+    path = index_path(json_folder)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    connection.execute("CREATE TABLE IF NOT EXISTS graphs (file TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, record TEXT)")
+    connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    version = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    if version is None or int(version[0]) != INDEX_VERSION:
+        with connection:
+            connection.execute("DELETE FROM graphs")
+            connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+    return connection
+
+
+def update_index(json_folder, workers=None, progress=None):
+    """Brings the index up to date with the folder; returns the number of (re)built records, or
+    None if `progress(built, stale)` returned False. Records built until then are kept."""
+    connection = _connect(json_folder)
+    try:
+        known = {file: (mtime, size) for file, mtime, size in connection.execute("SELECT file, mtime_ns, size FROM graphs")}
+        stale, present = [], set()
+        for file_name in iter_json_names(json_folder):
+            present.add(file_name)
+            try: st = os.stat(os.path.join(json_folder, file_name))
+            except OSError: continue
+            if known.get(file_name) != (st.st_mtime_ns, st.st_size): stale.append(file_name)
+        removed = [file for file in known if file not in present]
+        del known, present
+        with connection:
+            connection.executemany("DELETE FROM graphs WHERE file = ?", ((file,) for file in removed))
+        built, batch = 0, []
+        worker = partial(_record_for_file, json_folder=json_folder)
+        for row in parallel_map(worker, stale, workers if len(stale) > CHUNK_SIZE else 1, chunksize=64):
+            if row[1] is None: continue
+            batch.append(row); built += 1
+            if len(batch) >= 1000:
+                with connection: connection.executemany("INSERT OR REPLACE INTO graphs VALUES (?, ?, ?, ?)", batch)
+                batch = []
+                if progress and progress(built, len(stale)) is False: return None
+        if batch:
+            with connection: connection.executemany("INSERT OR REPLACE INTO graphs VALUES (?, ?, ?, ?)", batch)
+        return built
+    finally:
+        connection.close()
+
+
+def _row_chunks(json_folder):
+    connection = _connect(json_folder)
+    try:
+        cursor = connection.execute("SELECT file, record FROM graphs ORDER BY file")
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows: break
+            yield rows
+    finally:
+        connection.close()
+
+
+def run_query(json_folder, query, workers=None, refresh=True, progress=None):
+    """Sorted JSON file names whose annotation graph satisfies `query`. `progress(done, total)` is
+    called while the index is refreshed and again per evaluated chunk; if it returns False the
+    query stops and None is returned."""
+    compile_query(query)  # Report syntax errors before any work is done
+    if refresh and update_index(json_folder, workers, progress) is None: return None
+    total = _count_rows(json_folder)
+    evaluate = partial(_evaluate_chunk, query=query)
+    matches, done = [], 0
+    # Small datasets are faster without starting worker processes
+    for chunk_matches in parallel_map(evaluate, _row_chunks(json_folder), workers if total > 4 * CHUNK_SIZE else 1,
+                                      chunksize=1, max_pending=32):
+        matches.extend(chunk_matches)
+        done = min(done + CHUNK_SIZE, total)
+        if progress and progress(done, total) is False: return None
+    return sorted(matches)
+
+
+def _count_rows(json_folder):
+    connection = _connect(json_folder)
+    try: return connection.execute("SELECT COUNT(*) FROM graphs").fetchone()[0]
+    finally: connection.close()
+
+
+def image_names_for(json_names, image_folder):
+    """Maps result JSON names to the image files of `image_folder` with the same base name."""
+    bases = {os.path.splitext(name)[0] for name in json_names}
+    return [name for name in os.listdir(image_folder)
+            if name.lower().endswith(('.png', '.jpg', '.jpeg')) and os.path.splitext(name)[0] in bases]
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Query annotation graphs across a JSON folder")
+    parser.add_argument("json_folder")
+    parser.add_argument("query")
+    parser.add_argument("--images", help="Print the matching image files of this folder instead of JSON names")
+    parser.add_argument("--output", help="Write the file list to this file (one name per line)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    try: results = run_query(args.json_folder, args.query, args.workers)
+    except QueryError as e: parser.error(str(e))
+    if args.images: results = sorted(image_names_for(results, args.images))
+    text = "\n".join(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: f.write(text + "\n")
+    else:
+        print(text)
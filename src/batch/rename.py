@@ -0,0 +1,129 @@
+# src/batch/rename.py
+"""Dataset-wide component renames ("Amp" -> "Amplifier") across a JSON folder.
+
+A mapping is applied to component names and to every connection reference. Matching is
+exact, case-folded, or by regular expression (full match, replacement may use groups).
+A file where two names would end up the same is reported as a collision and left alone.
+Files are rewritten atomically in a worker pool. Files another annotator has claimed are
+skipped.
+
+    python -m src.batch.rename JSON_DIR --map Amp=Amplifier --map "Op ?Amp=Amplifier" --mode regex --dry-run
+"""
+import json
+import os
+import re
+from functools import partial
+
+from src.annotation_core import iter_json_names, read_annotation, is_skipped, write_json_atomic
+from src.batch.common import parallel_map
+
+MODES = ("exact", "casefold", "regex")
+
+
+def parse_mapping_lines(text):
+    """{old: new} from lines like 'old => new' or 'old=new'; blank lines and '#' comments are ignored."""
+    mapping = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'): continue
+        old, sep, new = line.partition('=>') if '=>' in line else line.partition('=')
+        if not sep or not old.strip() or not new.strip(): raise ValueError(f"Invalid mapping line: {line!r}")
+        mapping[old.strip()] = new.strip()
+    return mapping
+
+
+def make_renamer(mapping, mode="exact"):
+    """Returns a function mapping a name to its new name (or the name itself if no rule applies)."""
+    if mode == "exact":
+        return lambda name: mapping.get(name, name)
+    if mode == "casefold":
+        folded = {old.casefold(): new for old, new in mapping.items()}
+        return lambda name: folded.get(name.casefold(), name)
+    if mode == "regex":
+        rules = [(re.compile(pattern), replacement) for pattern, replacement in mapping.items()]
+        def rename(name):
+            for pattern, replacement in rules:
+                match = pattern.fullmatch(name)
+                if match: return match.expand(replacement)
+            return name
+        return rename
+    raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+
+
+def rename_components(components, renamer):
+    """Returns (renamed components, [(old, new)], [collision]) without modifying `components`."""
+    new_names = {name: renamer(name) for name in components}
+    changes = [(old, new) for old, new in new_names.items() if old != new]
+    if not changes: return components, [], []
+    targets = {}
+    for old, new in new_names.items(): targets.setdefault(new, []).append(old)
+    collisions = [{"name": new, "from": olds} for new, olds in targets.items() if len(olds) > 1]
+    if collisions: return components, changes, collisions
+    renamed = {}
+    for old, details in components.items():
+        details = json.loads(json.dumps(details))
+        for conn_list in details.get("connections", {}).values():
+            for conn in conn_list:
+                # References to names without a component (dangling) follow the mapping too
+                conn["name"] = new_names.get(conn["name"]) or renamer(conn["name"])
+        renamed[new_names[old]] = details
+    return renamed, changes, []
+
+
+def rename_file(file_name, json_folder, mapping, mode="exact", dry_run=False, claimed=()):
+    """Applies the mapping to one file; returns a summary dict."""
+    summary = {"file": file_name, "changes": [], "collisions": [], "written": False}
+    if os.path.splitext(file_name)[0] in claimed: summary["claimed"] = True; return summary
+    path = os.path.join(json_folder, file_name)
+    data = read_annotation(path)
+    if not isinstance(data, dict) or is_skipped(data): return summary
+    renamed, changes, collisions = rename_components(data, make_renamer(mapping, mode))
+    summary["changes"], summary["collisions"] = changes, collisions
+    if changes and not collisions and not dry_run:
+        write_json_atomic(path, renamed)
+        summary["written"] = True
+    return summary
+
+
+def rename_folder(json_folder, mapping, mode="exact", dry_run=False, workers=None, skip_claimed=True, progress=None):
+    """Runs rename_file over the folder; returns totals plus the per-file changes and collisions.
+    `progress(files done)` may return False to stop early; the result then has "canceled" set.
+    Files written so far stay renamed, and so may the few that workers were already on."""
+    make_renamer(mapping, mode)  # Fail early on bad patterns, not once per worker
+    claimed = ()
+    if skip_claimed:
+        from src.claims import ClaimManager
+        claimed = frozenset(ClaimManager(json_folder).active_claims())
+    worker = partial(rename_file, json_folder=json_folder, mapping=dict(mapping), mode=mode, dry_run=dry_run, claimed=claimed)
+    result = {"files": 0, "files_changed": 0, "files_written": 0, "renames": {}, "collisions": [], "claimed": [], "canceled": False}
+    for summary in parallel_map(worker, iter_json_names(json_folder), workers):
+        result["files"] += 1
+        if summary.get("claimed"): result["claimed"].append(summary["file"])
+        if summary["changes"] and not summary["collisions"]: result["files_changed"] += 1
+        if summary["written"]: result["files_written"] += 1
+        for old, new in summary["changes"]:
+            key = f"{old} -> {new}"
+            result["renames"][key] = result["renames"].get(key, 0) + 1
+        for collision in summary["collisions"]: result["collisions"].append({"file": summary["file"], **collision})
+        if progress and progress(result["files"]) is False: result["canceled"] = True; break
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Rename components across a JSON folder")
+    parser.add_argument("json_folder")
+    parser.add_argument("--map", action='append', default=[], metavar="OLD=NEW", help="A rename rule (repeatable)")
+    parser.add_argument("--map-file", help="File with one 'old => new' rule per line")
+    parser.add_argument("--mode", choices=MODES, default="exact")
+    parser.add_argument("--dry-run", action='store_true', help="Report what would change without writing")
+    parser.add_argument("--include-claimed", action='store_true', help="Also rewrite files other annotators have claimed")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    text = "\n".join(args.map)
+    if args.map_file:
+        with open(args.map_file, 'r', encoding='utf-8') as f: text += "\n" + f.read()
+    mapping = parse_mapping_lines(text)
+    if not mapping: parser.error("no rename rules given")
+    result = rename_folder(args.json_folder, mapping, args.mode, args.dry_run, args.workers, not args.include_claimed)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
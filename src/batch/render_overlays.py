@@ -0,0 +1,244 @@
+# src/batch/render_overlays.py
+"""Headless rendering of annotation overlays for QA review.
+
+Every annotated image is drawn with the viewer's own items (ComponentRectItem boxes and
+ArrowItem connections, colored as in "show all" mode; skipped images get the SKIPPED banner)
+onto an offscreen QImage, downscaled while decoding and written to ``OUT_DIR/<name>.png``.
+Images are rendered in a worker pool. ``OUT_DIR/.render_manifest.json`` records each JSON's
+mtime and size, so later runs only re-render files whose annotations changed; renders of
+deleted JSON files are removed. Contact sheets tile the renders into COLSxROWS grids under
+``OUT_DIR/sheets/``; only sheets whose tiles changed are redrawn.
+
+    python -m src.batch.render_overlays JSON_DIR IMG_DIR OUT_DIR --max-side 1024 --sheet 4x3
+"""
+import json
+import os
+from functools import partial
+
+from src.annotation_core import iter_json_names, read_annotation, is_skipped, components_of, write_json_atomic
+from src.batch.common import parallel_map
+
+MANIFEST_NAME = ".render_manifest.json"
+MANIFEST_VERSION = 1
+SHEET_DIR = "sheets"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+DEFAULT_MAX_SIDE = 1024
+# Longest side of a contact sheet tile, and the height of the file name strip under it
+DEFAULT_TILE = 320
+LABEL_HEIGHT = 22
+SHEET_BACKGROUND = "#282c34"
+SHEET_TEXT = "#abb2bf"
+
+
+# The QApplication created in worker processes; it must outlive every scene
+_app = None
+
+
+def _ensure_app():
+    """A QApplication for the graphics items; workers get an offscreen one."""
+    global _app
+    from PyQt6.QtWidgets import QApplication
+    if QApplication.instance() is None:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        _app = QApplication(["render_overlays"])
+    return QApplication.instance()
+
+
+def parse_grid(text):
+    """'4x3' -> (4, 3) columns and rows."""
+    try:
+        cols, rows = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Grid must look like COLSxROWS, got '{text}'")
+    if cols < 1 or rows < 1: raise ValueError(f"Grid must be at least 1x1, got '{text}'")
+    return cols, rows
+
+
+def render_overlay(image_path, data, max_side=DEFAULT_MAX_SIDE):
+    """The image with its annotation `data` drawn on top, as a QImage no larger than `max_side`."""
+    from PyQt6.QtCore import Qt, QRectF
+    from PyQt6.QtGui import QImage, QImageReader, QPainter, QPixmap
+    from PyQt6.QtWidgets import QGraphicsScene, QGraphicsPixmapItem
+    from src.drawing_items import build_arrows
+    from src.image_viewer import skipped_text_item
+    from src.widgets.base_items import ComponentRectItem
+    _ensure_app()
+    reader = QImageReader(image_path)
+    full_size = reader.size()
+    if not full_size.isValid(): raise IOError(f"Cannot read image: {image_path}")
+    target = full_size.scaled(max_side, max_side, Qt.AspectRatioMode.KeepAspectRatio) if max(full_size.width(), full_size.height()) > max_side else full_size
+    reader.setScaledSize(target)
+    image = reader.read()
+    if image.isNull(): raise IOError(f"Cannot read image: {image_path}")
+    scene = QGraphicsScene()
+    # Scene coordinates stay those of the full-size image, which the boxes are given in
+    image_item = QGraphicsPixmapItem(QPixmap.fromImage(image))
+    image_item.setScale(full_size.width() / image.width())
+    image_item.setTransformationMode(Qt.TransformationMode.SmoothTransformation)
+    scene.addItem(image_item)
+    component_rects = {}
+    for name, details in components_of(data).items():
+        box = details['component_box']
+        rect_item = ComponentRectItem(QRectF(box[0], box[1], box[2] - box[0], box[3] - box[1]))
+        rect_item.setData(0, name)
+        scene.addItem(rect_item)
+        component_rects[name] = rect_item
+    for arrow in build_arrows(component_rects, components_of(data), True, None):
+        arrow.set_view_scale(image.width() / full_size.width()); scene.addItem(arrow)
+    if is_skipped(data): scene.addItem(skipped_text_item(data.get("reason", ""), image_item.sceneBoundingRect()))
+    out = QImage(image.width(), image.height(), QImage.Format.Format_RGB32)
+    out.fill(Qt.GlobalColor.white)
+    painter = QPainter(out)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing); painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+    # Cosmetic pens and arrowheads come out the same size in pixels as in the viewer
+    scene.render(painter, QRectF(out.rect()), QRectF(0, 0, full_size.width(), full_size.height()))
+    painter.end()
+    scene.clear()
+    return out
+
+
+def _render_for_worker(item, json_folder, image_folder, out_folder, max_side):
+    json_name, image_name, signature = item
+    try:
+        data = read_annotation(os.path.join(json_folder, json_name))
+        if data is None: raise IOError(f"Cannot read {json_name}")
+        image = render_overlay(os.path.join(image_folder, image_name), data, max_side)
+        out_path = os.path.join(out_folder, f"{os.path.splitext(json_name)[0]}.png")
+        tmp_path = f"{out_path}.{os.getpid()}.tmp.png"
+        if not image.save(tmp_path): raise IOError(f"Cannot write {out_path}")
+        os.replace(tmp_path, out_path)
+        return json_name, signature, None
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        return json_name, signature, str(e)
+
+
+def _draw_sheet_for_worker(item, out_folder, cols, rows, tile):
+    sheet_name, stems = item
+    from PyQt6.QtCore import Qt, QRect
+    from PyQt6.QtGui import QImage, QImageReader, QPainter, QColor
+    _ensure_app()
+    sheet = QImage(cols * tile, rows * (tile + LABEL_HEIGHT), QImage.Format.Format_RGB32)
+    sheet.fill(QColor(SHEET_BACKGROUND))
+    painter = QPainter(sheet)
+    painter.setPen(QColor(SHEET_TEXT))
+    for i, stem in enumerate(stems):
+        x, y = (i % cols) * tile, (i // cols) * (tile + LABEL_HEIGHT)
+        reader = QImageReader(os.path.join(out_folder, f"{stem}.png"))
+        if reader.size().isValid(): reader.setScaledSize(reader.size().scaled(tile - 4, tile - 4, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if not image.isNull(): painter.drawImage(x + (tile - image.width()) // 2, y + tile - 2 - image.height(), image) # Sits on its label
+        label_rect = QRect(x + 2, y + tile, tile - 4, LABEL_HEIGHT)
+        label = painter.fontMetrics().elidedText(stem, Qt.TextElideMode.ElideMiddle, label_rect.width())
+        painter.drawText(label_rect, Qt.AlignmentFlag.AlignCenter, label)
+    painter.end()
+    path = os.path.join(out_folder, SHEET_DIR, sheet_name)
+    tmp_path = f"{path}.{os.getpid()}.tmp.png"
+    if not sheet.save(tmp_path): return sheet_name, f"Cannot write {path}"
+    os.replace(tmp_path, path)
+    return sheet_name, None
+
+
+def _load_manifest(path):
+    data = read_annotation(path)
+    return data if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION else {}
+
+
+def _image_names_by_stem(image_folder):
+    with os.scandir(image_folder) as entries:
+        return {os.path.splitext(entry.name)[0]: entry.name for entry in entries if entry.name.lower().endswith(IMAGE_EXTENSIONS)}
+
+
+def render_folder(json_folder, image_folder, out_folder, max_side=DEFAULT_MAX_SIDE, grid=None, tile=DEFAULT_TILE,
+                  workers=None, force=False, progress=None):
+    """Renders the overlays of every JSON file in `json_folder` that changed since the last run
+    (all of them with `force` or a different `max_side`), then the contact sheets if `grid`
+    (cols, rows) is given. `progress(done, total)` may return False to stop early; finished
+    renders are kept in the manifest. Returns a summary dict."""
+    os.makedirs(out_folder, exist_ok=True)
+    manifest_path = os.path.join(out_folder, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    files = manifest.get("files", {}) if not force and manifest.get("max_side") == max_side else {}
+    images = _image_names_by_stem(image_folder)
+    with os.scandir(out_folder) as entries: rendered = {entry.name for entry in entries if entry.name.endswith('.png')}
+    summary = {"rendered": 0, "unchanged": 0, "removed": 0, "missing_image": [], "errors": {}, "sheets": 0}
+    todo, current = [], {}
+    for json_name in iter_json_names(json_folder):
+        stem = os.path.splitext(json_name)[0]
+        image_name = images.get(stem)
+        if image_name is None: summary["missing_image"].append(json_name); continue
+        try: st = os.stat(os.path.join(json_folder, json_name))
+        except OSError: continue
+        signature = [st.st_mtime_ns, st.st_size]
+        current[json_name] = signature
+        if files.get(json_name) == signature and f"{stem}.png" in rendered: summary["unchanged"] += 1
+        else: todo.append((json_name, image_name, signature))
+    # Renders of deleted annotations
+    for json_name in set(files) - set(current):
+        try: os.remove(os.path.join(out_folder, f"{os.path.splitext(json_name)[0]}.png")); summary["removed"] += 1
+        except OSError: pass
+    files = {name: signature for name, signature in files.items() if name in current}
+    changed = set()
+    results = parallel_map(partial(_render_for_worker, json_folder=json_folder, image_folder=image_folder,
+                                   out_folder=out_folder, max_side=max_side), todo, workers, chunksize=8)
+    canceled = False
+    try:
+        for done, (json_name, signature, error) in enumerate(results, 1):
+            if error: summary["errors"][json_name] = error; files.pop(json_name, None)
+            else: files[json_name] = signature; changed.add(os.path.splitext(json_name)[0]); summary["rendered"] += 1
+            if progress and progress(done, len(todo)) is False: canceled = True; break
+    finally:
+        results.close()
+        manifest = {"version": MANIFEST_VERSION, "max_side": max_side, "files": files, "sheets": manifest.get("sheets", {})}
+        write_json_atomic(manifest_path, manifest)
+    if grid and not canceled:
+        summary["sheets"] = _update_sheets(out_folder, manifest, sorted(os.path.splitext(name)[0] for name in files), changed, grid, tile, workers)
+        write_json_atomic(manifest_path, manifest)
+    return summary
+
+
+def _update_sheets(out_folder, manifest, stems, changed, grid, tile, workers):
+    """Redraws the contact sheets whose tiles were re-rendered or moved; returns how many were drawn."""
+    from src.widgets.right_panel import natural_sort_key
+    cols, rows = grid
+    stems.sort(key=natural_sort_key)
+    per_sheet = cols * rows
+    wanted = {f"sheet_{i // per_sheet + 1:04d}.png": stems[i:i + per_sheet] for i in range(0, len(stems), per_sheet)}
+    old = manifest.get("sheets", {})
+    # A different layout invalidates every sheet
+    if old.get("grid") != [cols, rows] or old.get("tile") != tile: old = {}
+    sheet_dir = os.path.join(out_folder, SHEET_DIR)
+    os.makedirs(sheet_dir, exist_ok=True)
+    for sheet_name in set(old.get("members", {})) - set(wanted):
+        try: os.remove(os.path.join(sheet_dir, sheet_name))
+        except OSError: pass
+    todo = [(sheet_name, members) for sheet_name, members in wanted.items()
+            if old.get("members", {}).get(sheet_name) != members or changed.intersection(members)
+            or not os.path.exists(os.path.join(sheet_dir, sheet_name))]
+    drawn = {}
+    for sheet_name, error in parallel_map(partial(_draw_sheet_for_worker, out_folder=out_folder, cols=cols, rows=rows, tile=tile),
+                                          todo, workers, chunksize=1):
+        if not error: drawn[sheet_name] = wanted[sheet_name]
+    redrawn = {sheet_name for sheet_name, _ in todo}
+    members = {name: value for name, value in old.get("members", {}).items() if name in wanted and name not in redrawn}
+    members.update(drawn)
+    manifest["sheets"] = {"grid": [cols, rows], "tile": tile, "members": members}
+    return len(drawn)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Render annotation overlays (and contact sheets) for QA review")
+    parser.add_argument("json_folder")
+    parser.add_argument("image_folder")
+    parser.add_argument("out_folder")
+    parser.add_argument("--max-side", type=int, default=DEFAULT_MAX_SIDE, help="Longest side of each render in pixels")
+    parser.add_argument("--sheet", metavar="COLSxROWS", help="Also tile the renders into contact sheets of this grid")
+    parser.add_argument("--tile", type=int, default=DEFAULT_TILE, help="Longest side of a contact sheet tile")
+    parser.add_argument("--force", action='store_true', help="Re-render everything, not only changed files")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    try: grid = parse_grid(args.sheet) if args.sheet else None
+    except ValueError as e: parser.error(str(e))
+    summary = render_folder(args.json_folder, args.image_folder, args.out_folder, args.max_side, grid, args.tile, args.workers, args.force)
+    summary["missing_image"] = len(summary["missing_image"])
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
@@ -0,0 +1,177 @@
+# src/box_proposals.py
+"""Classical box proposals for clean block diagrams (NumPy only, no ML).
+
+Component boxes are closed rectangles, so their interiors are white regions that do not
+touch the image border and are enclosed by dark pixels on all four sides. We label the
+white regions, keep the rectangle-like ones and grow each by its border thickness.
+
+Proposals are cached per image in ``<json_folder>/.proposals/<image base>.json`` keyed by
+the image's mtime and size, and can be precomputed for a whole folder in a process pool.
+"""
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.cv_utils import binarize, find_runs, label_runs, component_boxes
+
+PROPOSAL_DIR = ".proposals"
+CACHE_VERSION = 1
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Smallest box side (pixels) worth proposing
+MIN_SIDE = 12
+# Share of the bounding box an interior must fill (text inside a box leaves holes)
+MIN_FILL = 0.55
+# Share of each side just outside the interior that must be dark for a closed rectangle
+MIN_BORDER_COVERAGE = 0.8
+# Thickest border (pixels) the box is grown by
+MAX_BORDER = 8
+MAX_AREA_RATIO = 0.9
+# Images per task of the folder precompute; each task also checks its images' cache entries
+CHUNK_SIZE = 64
+
+
+def _side_coverage(dark, y0, y1, x0, x1):
+    return dark[y0:y1 + 1, x0:x1 + 1].mean() if y1 >= y0 and x1 >= x0 else 0.0
+
+
+def propose_boxes(gray, min_side=MIN_SIDE, threshold=None):
+    """Returns candidate component boxes [x1, y1, x2, y2] for a uint8 grayscale image."""
+    h, w = gray.shape
+    if h < 3 or w < 3: return []
+    dark = binarize(gray, threshold)
+    rows, starts, ends = find_runs(~dark)
+    labels, n_labels = label_runs(rows, starts, ends, w)
+    if not n_labels: return []
+    x0, y0, x1, y1, pixels = component_boxes(rows, starts, ends, labels, n_labels)
+    bw, bh = x1 - x0 + 1, y1 - y0 + 1
+    keep = ((x0 > 0) & (y0 > 0) & (x1 < w - 1) & (y1 < h - 1) & (bw >= min_side) & (bh >= min_side)
+            & (pixels >= MIN_FILL * bw * bh) & (bw * bh <= MAX_AREA_RATIO * w * h))
+    boxes = []
+    for i in np.nonzero(keep)[0]:
+        left, top, right, bottom = int(x0[i]), int(y0[i]), int(x1[i]), int(y1[i])
+        # The interior must be closed off by dark pixels on every side
+        if min(_side_coverage(dark, top - 1, top - 1, left, right), _side_coverage(dark, bottom + 1, bottom + 1, left, right),
+               _side_coverage(dark, top, bottom, left - 1, left - 1), _side_coverage(dark, top, bottom, right + 1, right + 1)) < MIN_BORDER_COVERAGE:
+            continue
+        # Grow outwards through the border lines
+        for _ in range(MAX_BORDER):
+            if top > 0 and _side_coverage(dark, top - 1, top - 1, left, right) >= MIN_BORDER_COVERAGE: top -= 1
+            else: break
+        for _ in range(MAX_BORDER):
+            if bottom < h - 1 and _side_coverage(dark, bottom + 1, bottom + 1, left, right) >= MIN_BORDER_COVERAGE: bottom += 1
+            else: break
+        for _ in range(MAX_BORDER):
+            if left > 0 and _side_coverage(dark, top, bottom, left - 1, left - 1) >= MIN_BORDER_COVERAGE: left -= 1
+            else: break
+        for _ in range(MAX_BORDER):
+            if right < w - 1 and _side_coverage(dark, top, bottom, right + 1, right + 1) >= MIN_BORDER_COVERAGE: right += 1
+            else: break
+        boxes.append([float(left), float(top), float(right + 1), float(bottom + 1)])
+    boxes.sort(key=lambda b: (b[1], b[0]))
+    return boxes
+
+
+def box_iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def proposal_cache_path(json_folder, image_path):
+    base_name = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(json_folder, PROPOSAL_DIR, f"{base_name}.json")
+
+
+def _image_key(image_path):
+    st = os.stat(image_path)
+    return st.st_mtime_ns, st.st_size
+
+
+def load_cached_proposals(image_path, json_folder):
+    """Cached boxes for `image_path`, or None if missing or the image changed since."""
+    try:
+        with open(proposal_cache_path(json_folder, image_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") == CACHE_VERSION and tuple(data.get("image_key", ())) == _image_key(image_path):
+            return data["boxes"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def save_proposals(image_path, json_folder, boxes):
+    path = proposal_cache_path(json_folder, image_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": CACHE_VERSION, "image_key": list(_image_key(image_path)), "boxes": boxes}, f)
+    os.replace(tmp_path, path)
+
+
+def compute_proposals(image_path, json_folder=None, gray=None):
+    """Loads cached proposals or computes them, from `gray` if the image is already decoded, and
+    caches them; nothing is cached without a JSON folder. Safe to run in a worker process or thread."""
+    boxes = load_cached_proposals(image_path, json_folder) if json_folder else None
+    if boxes is None:
+        if gray is None:
+            from src.image_arrays import load_gray
+            gray = load_gray(image_path)
+        boxes = propose_boxes(gray)
+        if json_folder: save_proposals(image_path, json_folder, boxes)
+    return boxes
+
+
+def _compute_chunk(image_paths, json_folder):
+    """[(image_path, box count or "error: ...")] for a chunk of the folder precompute."""
+    results = []
+    for image_path in image_paths:
+        try: results.append((image_path, len(compute_proposals(image_path, json_folder))))
+        except (OSError, ValueError) as e: results.append((image_path, f"error: {e}"))
+    return results
+
+
+def create_executor(max_workers=None):
+    """Process pool for proposal work. 'spawn' keeps the GUI's Qt state out of the workers."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def submit_folder(executor, image_folder, json_folder):
+    """Queues the folder's images in chunks of CHUNK_SIZE and returns the futures. Only the folder is
+    listed here: the workers skip the images already cached, so a large folder on a share is not
+    stat'ed image by image in the caller. Each future yields _compute_chunk's list."""
+    names = sorted(name for name in os.listdir(image_folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+    return [executor.submit(_compute_chunk, [os.path.join(image_folder, name) for name in names[i:i + CHUNK_SIZE]], json_folder)
+            for i in range(0, len(names), CHUNK_SIZE)]
+
+
+def failures(futures):
+    """["name: error"] of finished submit_folder futures, including chunks that failed as a whole."""
+    failed = []
+    for future in futures:
+        if future.cancelled(): continue
+        error = future.exception()
+        if error: failed.append(f"{type(error).__name__}: {error}"); continue
+        failed.extend(f"{os.path.basename(path)}: {result[len('error: '):]}" for path, result in future.result() if isinstance(result, str))
+    return failed
+
+
+def precompute_folder(image_folder, json_folder, max_workers=None):
+    """Blocking variant of submit_folder; returns {image_path: box count or error}."""
+    with create_executor(max_workers) as executor:
+        return dict(pair for future in submit_folder(executor, image_folder, json_folder) for pair in future.result())
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Precompute box proposals for an image folder")
+    parser.add_argument("image_folder")
+    parser.add_argument("json_folder")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    results = precompute_folder(args.image_folder, args.json_folder, args.workers)
+    print(f"Computed proposals for {len(results)} images")
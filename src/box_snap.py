@@ -0,0 +1,65 @@
+# src/box_snap.py
+"""Snaps a loosely drawn box onto the rectangle border drawn in the image (NumPy only).
+
+Only thin bands around the four drawn edges are read, so the cost depends on the box
+perimeter and the tolerance, not on the image size. In each band the share of dark pixels
+per row (or column) is a projection profile; the border is the run of rows whose share is
+high, and the edge moves to its outer side.
+"""
+import numpy as np
+
+from src.cv_utils import otsu_threshold
+
+# Share of an edge's span that must be dark for a row/column to count as border
+MIN_COVERAGE = 0.5
+SNAP_PASSES = 2
+
+
+def _bands(gray, box, tol):
+    """The four edge bands as (array, offset, axis) with rows/columns indexed from `offset`."""
+    h, w = gray.shape
+    x1, y1, x2, y2 = box
+    cx1, cx2 = max(0, x1), min(w, x2)
+    cy1, cy2 = max(0, y1), min(h, y2)
+    top = max(0, y1 - tol), min(h, y1 + tol + 1)
+    bottom = max(0, y2 - tol - 1), min(h, y2 + tol)
+    left = max(0, x1 - tol), min(w, x1 + tol + 1)
+    right = max(0, x2 - tol - 1), min(w, x2 + tol)
+    return (gray[top[0]:top[1], cx1:cx2], top[0], 1), (gray[bottom[0]:bottom[1], cx1:cx2], bottom[0], 1), \
+           (gray[cy1:cy2, left[0]:left[1]], left[0], 0), (gray[cy1:cy2, right[0]:right[1]], right[0], 0)
+
+
+def _snap_edge(band, offset, axis, edge, outer_is_low, threshold):
+    if band.size == 0: return edge
+    profile = (band < threshold).mean(axis=axis)
+    candidates = np.nonzero(profile >= MIN_COVERAGE)[0]
+    if not len(candidates): return edge
+    positions = candidates + offset
+    # The border run closest to where the user let go
+    nearest = int(np.argmin(np.abs(positions - (edge if outer_is_low else edge - 1))))
+    run_start = run_end = nearest
+    while run_start > 0 and candidates[run_start - 1] == candidates[run_start] - 1: run_start -= 1
+    while run_end < len(candidates) - 1 and candidates[run_end + 1] == candidates[run_end] + 1: run_end += 1
+    return int(positions[run_start]) if outer_is_low else int(positions[run_end]) + 1
+
+
+def snap_box(gray, box, tolerance=10, threshold=None):
+    """Moves each edge of `box` [x1, y1, x2, y2] (x2/y2 exclusive) to the outer side of the
+    nearest border within `tolerance` pixels; edges with no border nearby stay put."""
+    h, w = gray.shape
+    snapped = [int(round(v)) for v in box]
+    snapped = [min(max(snapped[0], 0), w), min(max(snapped[1], 0), h), min(max(snapped[2], 0), w), min(max(snapped[3], 0), h)]
+    if snapped[2] - snapped[0] < 2 or snapped[3] - snapped[1] < 2: return list(box)
+    tol = max(1, int(tolerance))
+    if threshold is None:
+        samples = np.concatenate([band.ravel() for band, _, _ in _bands(gray, snapped, tol)])
+        if not samples.size: return list(box)
+        threshold = min(max(otsu_threshold(samples), 64), 224)
+    for _ in range(SNAP_PASSES):
+        # A loose box dilutes the coverage of the real border; the second pass measures on the tightened span
+        top, bottom, left, right = _bands(gray, snapped, tol)
+        refined = [_snap_edge(*left, snapped[0], True, threshold), _snap_edge(*top, snapped[1], True, threshold),
+                   _snap_edge(*right, snapped[2], False, threshold), _snap_edge(*bottom, snapped[3], False, threshold)]
+        if refined[2] - refined[0] < 2 or refined[3] - refined[1] < 2 or refined == snapped: break
+        snapped = refined
+    return [float(v) for v in snapped]
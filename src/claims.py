@@ -0,0 +1,160 @@
+# src/claims.py
+"""Lease-based claims on images for several annotators sharing one JSON folder.
+
+A claim is a small lock file ``<json_folder>/.claims/<image base>.lock`` holding the owner
+and an expiry time. It is created with O_EXCL, renewed by a heartbeat and taken over by
+anyone once it has expired (e.g. after a crash). Only plain files are used, so it works on
+any shared folder the JSON files themselves can live on.
+
+Off unless ``SBA_CLAIMS`` is set: a single annotator gets no lock files in the dataset and
+no heartbeat.
+"""
+import getpass
+import json
+import os
+import socket
+import threading
+import time
+
+CLAIMS_ENV_VAR = "SBA_CLAIMS"
+CLAIM_DIR = ".claims"
+DEFAULT_LEASE_SECONDS = 120
+# Heartbeat interval; well below the lease so one missed beat does not lose the claim
+HEARTBEAT_SECONDS = 30
+# Tolerated clock difference between annotators' machines
+CLOCK_SKEW_SECONDS = 10
+
+
+def claims_enabled():
+    return os.environ.get(CLAIMS_ENV_VAR, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def default_owner():
+    try: user = getpass.getuser()
+    except (KeyError, OSError): user = "unknown"
+    return f"{user}@{socket.gethostname()}:{os.getpid()}"
+
+
+class ClaimManager:
+    def __init__(self, json_folder, owner=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.claim_dir = os.path.join(json_folder, CLAIM_DIR)
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        # Image base names claimed by this process
+        self.held = set()
+
+    def _path(self, base_name):
+        return os.path.join(self.claim_dir, f"{base_name}.lock")
+
+    @staticmethod
+    def _base(image_path):
+        return os.path.splitext(os.path.basename(image_path))[0]
+
+    def _read(self, path):
+        """The claim stored at `path`, None if there is none. Unreadable files count as live until
+        they are a lease old, since they are most likely being written right now."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            try: mtime = os.path.getmtime(path)
+            except OSError: return None
+            return {"owner": "unknown", "expires": mtime + self.lease_seconds}
+
+    def _is_live(self, claim, now=None):
+        return claim is not None and claim.get("expires", 0) + CLOCK_SKEW_SECONDS > (now or time.time())
+
+    def _write(self, path, exclusive):
+        now = time.time()
+        payload = json.dumps({"owner": self.owner, "acquired": now, "expires": now + self.lease_seconds}).encode('utf-8')
+        if exclusive:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            try: os.write(fd, payload)
+            finally: os.close(fd)
+        else:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f: f.write(payload)
+            os.replace(tmp_path, path)
+
+    def holder(self, image_path):
+        """Owner of a live claim on `image_path` held by someone else, or None."""
+        claim = self._read(self._path(self._base(image_path)))
+        if not self._is_live(claim) or claim.get("owner") == self.owner: return None
+        return claim.get("owner", "unknown")
+
+    def try_claim(self, image_path):
+        """Claims `image_path`. Returns None on success, otherwise the current holder."""
+        base = self._base(image_path)
+        path = self._path(base)
+        os.makedirs(self.claim_dir, exist_ok=True)
+        try:
+            self._write(path, exclusive=True)
+        except FileExistsError:
+            claim = self._read(path)
+            # Only this process writes claims under its owner, so its own one is simply renewed
+            if claim and claim.get("owner") == self.owner: self._write(path, exclusive=False)
+            elif self._is_live(claim): return claim.get("owner", "unknown")
+            else:
+                holder = self._take_over(path)
+                if holder: return holder
+        self.held.add(base)
+        return None
+
+    def _take_over(self, path):
+        """Replaces the expired claim at `path`. Returns None on success, otherwise the holder that
+        won. The stale file is renamed aside, which only one annotator can do, and the claim is then
+        created with O_EXCL as usual; a fresh claim renamed aside by mistake is put back."""
+        stale_path = f"{path}.{os.getpid()}.{threading.get_ident()}.stale"
+        try: os.rename(path, stale_path)
+        except FileNotFoundError: pass # Someone else moved it first; the create below decides
+        else:
+            moved = self._read(stale_path)
+            if self._is_live(moved) and moved.get("owner") != self.owner:
+                # It was replaced between our read and the rename; link fails if a third claim exists
+                try: os.link(stale_path, path)
+                except OSError: pass
+                os.remove(stale_path)
+                return moved.get("owner", "unknown")
+            os.remove(stale_path)
+        try: self._write(path, exclusive=True)
+        except FileExistsError: return (self._read(path) or {}).get("owner", "unknown")
+        return None
+
+    def release(self, image_path):
+        self._release_base(self._base(image_path))
+
+    def _release_base(self, base):
+        if base not in self.held: return
+        self.held.discard(base)
+        path = self._path(base)
+        claim = self._read(path)
+        if claim and claim.get("owner") == self.owner:
+            try: os.remove(path)
+            except OSError: pass
+
+    def release_all(self):
+        for base in list(self.held): self._release_base(base)
+
+    def renew(self):
+        """Extends every held lease. Returns the image base names whose claims were lost."""
+        lost = []
+        for base in list(self.held):
+            path = self._path(base)
+            claim = self._read(path)
+            if claim is not None and claim.get("owner") != self.owner and self._is_live(claim):
+                self.held.discard(base); lost.append(base); continue
+            self._write(path, exclusive=False)
+        return lost
+
+    def active_claims(self):
+        """{image base name: owner} for live claims of other annotators."""
+        try: names = os.listdir(self.claim_dir)
+        except OSError: return {}
+        now, claims = time.time(), {}
+        for name in names:
+            if not name.endswith(".lock"): continue
+            claim = self._read(os.path.join(self.claim_dir, name))
+            if self._is_live(claim, now) and claim.get("owner") != self.owner: claims[name[:-5]] = claim.get("owner", "unknown")
+        return claims
@@ -0,0 +1,280 @@
+# src/connection_proposals.py
+"""Connection proposals between annotated boxes (NumPy only, no ML).
+
+The box borders are blanked out of the binarized image, which leaves the connection
+lines, their arrowheads and text. Each connected group of ink that
+reaches into the thin ring just outside two boxes is a wire between them. At each end
+the ink within a small window is compared with as long a stretch of the same wire
+further on: noticeably more means an arrowhead. A head at one end gives an
+`output` edge towards it, heads at both ends (or at neither, the only undirected kind
+of line) an `inout` edge. Separate wires between the same two boxes add up to the
+multiplicity. Straight lines that cross merge into one group of ink; its ends are paired
+up by direction. A line through a third box is cut in two at its border and rejoined.
+
+Edges that took any of that guesswork are marked not `confident`; only the plain ones
+(one wire, two clear ends aiming into their boxes) are meant for accepting in bulk.
+"""
+import numpy as np
+
+from src.cv_utils import binarize, find_runs, label_runs
+
+# Pixels around each box that are blanked with it (its border, and some slack in the annotation)
+BOX_MARGIN = 4
+# Width of the ring beyond that in which a wire counts as touching the box
+RING_WIDTH = 6
+# Half-size of the window an arrowhead is looked for in, at least, and in stroke widths
+HEAD_WINDOW_PX = 14
+HEAD_WINDOW_STROKES = 5
+# Ink in the window, relative to as long a stretch of the wire further on, that marks an
+# arrowhead; ratios within HEAD_MARGIN of it either way are not clear enough to be confident
+HEAD_FACTOR = 1.5
+HEAD_MARGIN = 1.15
+# Crossing lines: how far (in head windows) each end's heading is measured, and how well two
+# ends' headings must line up (cosine) to be one straight line
+STRAIGHT_REACH = 3
+MIN_STRAIGHTNESS = 0.97
+# Share of the straight path across a box that must be ink to rejoin a line cut at its border
+MIN_THROUGH_INK = 0.9
+# Wires with fewer pixels are text fragments or noise
+MIN_WIRE_PIXELS = 20
+
+
+def _stroke_widths(ys, xs, labels, n_labels):
+    """Median run length per label over horizontal and vertical runs, i.e. the stroke width:
+    across a line the runs are as long as the line is wide, along it they are long but few."""
+    def runs(major, minor):
+        order = np.lexsort((minor, major))
+        major, minor, lab = major[order], minor[order], labels[order]
+        breaks = np.flatnonzero((np.diff(major) != 0) | (np.diff(minor) != 1)) + 1
+        starts = np.concatenate(([0], breaks))
+        return np.diff(np.concatenate((starts, [len(major)]))), lab[starts]
+    row_lengths, row_labels = runs(ys, xs)
+    col_lengths, col_labels = runs(xs, ys)
+    lengths, lab = np.concatenate((row_lengths, col_lengths)), np.concatenate((row_labels, col_labels))
+    order = np.lexsort((lengths, lab))
+    lengths, lab = lengths[order], lab[order]
+    counts = np.bincount(lab, minlength=n_labels)
+    middle = np.cumsum(counts) - counts + counts // 2
+    return np.where(counts > 0, lengths[np.minimum(middle, len(lengths) - 1)], 1).astype(float)
+
+
+def _end_shape(px, py, touch_x, touch_y, radius, stroke):
+    """(heading, head ratio) of the wire end at the touch point, or None if the wire only passes
+    by the box. The heading points from the end into the wire; the ratio is the ink within one
+    window of the end over what the same length of the wire further on holds (or, on wires too
+    short for that, a plain line of the stroke width)."""
+    dist = np.hypot(px - touch_x, py - touch_y)
+    beyond = (dist > radius) & (dist <= STRAIGHT_REACH * radius)
+    if not beyond.any(): beyond = dist > 0
+    if not beyond.any(): return None
+    heading = np.array([px[beyond].mean() - touch_x, py[beyond].mean() - touch_y])
+    norm = np.hypot(*heading)
+    # Ink on both sides of the touch point: the wire runs past the box rather than ending there
+    if norm < 0.5 * dist[beyond].mean(): return None
+    near = np.count_nonzero(dist <= radius)
+    further = min(dist.max(), 2 * radius) - radius
+    if further < radius / 2: return heading / norm, near / (stroke * (radius + BOX_MARGIN))
+    return heading / norm, near * further / (radius * max(np.count_nonzero((dist > radius) & (dist <= 2 * radius)), 1))
+
+
+def _pair_ends(ends, headings, touch_x, touch_y):
+    """Pairs of a wire's ends that it connects. Two ends are simply joined. More ends (lines
+    crossing each other) are paired by straightness: each end's heading must point at the
+    other end. Junctions of a bus do not line up and are left unpaired."""
+    if len(ends) == 2: return [(ends[0], ends[1])]
+    candidates = []
+    for i, a in enumerate(ends):
+        for b in ends[i + 1:]:
+            score = _straightness(headings[a], headings[b], touch_x[b] - touch_x[a], touch_y[b] - touch_y[a])
+            if score >= MIN_STRAIGHTNESS: candidates.append((score, a, b))
+    return _greedy_pairs(candidates)
+
+
+def _straightness(heading_a, heading_b, dx, dy):
+    """How well the span from end a to end b continues both headings, as the smaller cosine;
+    heading_a points along the span and heading_b back against it."""
+    length = np.hypot(dx, dy)
+    if length == 0: return -1.0
+    span = np.array([dx, dy]) / length
+    return min(heading_a @ span, -(heading_b @ span))
+
+
+def _greedy_pairs(candidates):
+    """Best-scoring (score, a, b) candidates first, each end used once."""
+    pairs, used = [], set()
+    for _, a, b in sorted(candidates, reverse=True):
+        if a in used or b in used: continue
+        pairs.append((a, b)); used.update((a, b))
+    return pairs
+
+
+def _inked(ink, x0, y0, x1, y1):
+    """Share of the straight segment between two points that runs over ink (within a pixel)."""
+    h, w = ink.shape
+    steps = int(np.hypot(x1 - x0, y1 - y0)) + 1
+    t = np.linspace(0.0, 1.0, steps)
+    xs, ys = np.round(x0 + (x1 - x0) * t).astype(int), np.round(y0 + (y1 - y0) * t).astype(int)
+    hit = np.zeros(steps, dtype=bool)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            hit |= ink[np.clip(ys + dy, 0, h - 1), np.clip(xs + dx, 0, w - 1)]
+    return hit.mean()
+
+
+def _ray_span(rect, x, y, direction):
+    """(t0, t1) over which the ray (x, y) + t * direction, t >= 0, is inside rect, or None."""
+    t0, t1 = 0.0, np.inf
+    for low, high, start, step in ((rect[0], rect[2], x, direction[0]), (rect[1], rect[3], y, direction[1])):
+        if abs(step) < 1e-9:
+            if not low <= start <= high: return None
+            continue
+        a, b = (low - start) / step, (high - start) / step
+        t0, t1 = max(t0, min(a, b)), min(t1, max(a, b))
+    return (t0, t1) if t0 < t1 else None
+
+
+def _ends_at_box(ink, rect, x, y, direction):
+    """Whether the wire end at (x, y), running on in `direction`, plainly ends at the box: it
+    aims well inside it rather than grazing a corner, and no ink carries it on across."""
+    inner = rect + [RING_WIDTH, RING_WIDTH, -RING_WIDTH, -RING_WIDTH]
+    if _ray_span(inner, x, y, direction) is None: return False
+    t0, t1 = _ray_span(rect, x, y, direction)
+    return _inked(ink, x + t0 * direction[0], y + t0 * direction[1], x + t1 * direction[0], y + t1 * direction[1]) < MIN_THROUGH_INK / 2
+
+
+def propose_connections(gray, boxes, threshold=None):
+    """Proposed edges for a uint8 grayscale image whose components are {name: [x1, y1, x2, y2]}.
+
+    Returns [{"source", "target", "type": "output" | "inout", "count", "confident"}]; inout
+    pairs are in the order of `boxes`. `confident` is False for edges that needed guessing:
+    lines crossing other lines or boxes, ends that graze a box or carry on through it, and
+    ends whose arrowhead was not clearly there or not.
+    """
+    h, w = gray.shape
+    names = list(boxes)
+    if len(names) < 2 or h < 3 or w < 3: return []
+    rects = np.array([boxes[name] for name in names], dtype=float)
+    rects = np.column_stack((np.minimum(rects[:, 0], rects[:, 2]), np.minimum(rects[:, 1], rects[:, 3]),
+                             np.maximum(rects[:, 0], rects[:, 2]), np.maximum(rects[:, 1], rects[:, 3])))
+    grown = np.round(rects + [-BOX_MARGIN, -BOX_MARGIN, BOX_MARGIN, BOX_MARGIN]).astype(int)
+    shrunk = np.round(rects + [BOX_MARGIN, BOX_MARGIN, -BOX_MARGIN, -BOX_MARGIN]).astype(int)
+    outer = grown + [-RING_WIDTH, -RING_WIDTH, RING_WIDTH, RING_WIDTH]
+
+    dark = binarize(gray, threshold)
+    # Kept whole for following lines across boxes
+    ink = dark.copy()
+    # Which box's ring each pixel lies in (-1: none); larger boxes first, so nested ones win
+    ring = np.full((h, w), -1, dtype=np.int16 if len(names) < 2 ** 15 else np.int32)
+    for i in np.argsort(-(rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1])):
+        x0, y0, x1, y1 = outer[i].clip(0, None)
+        ring[y0:y1 + 1, x0:x1 + 1] = i
+        x0, y0, x1, y1 = grown[i].clip(0, None)
+        ring[y0:y1 + 1, x0:x1 + 1] = -1
+    # Blank the borders only: nested boxes and the wires between them stay
+    for (gx0, gy0, gx1, gy1), (sx0, sy0, sx1, sy1) in zip(grown.clip(0, None), shrunk.clip(0, None)):
+        dark[gy0:gy1 + 1, gx0:gx1 + 1][:max(sy0 - gy0, 0)] = False
+        dark[max(sy1, gy0):gy1 + 1, gx0:gx1 + 1] = False
+        dark[gy0:gy1 + 1, gx0:max(sx0, gx0)] = False
+        dark[gy0:gy1 + 1, max(sx1, gx0):gx1 + 1] = False
+
+    rows, starts, ends = find_runs(dark)
+    labels, n_labels = label_runs(rows, starts, ends, w, connectivity=8)
+    if not n_labels: return []
+    # Every ink pixel, in row-major order, with its wire label
+    lengths = ends - starts
+    ys = np.repeat(rows, lengths)
+    xs = np.repeat(starts, lengths) + np.arange(len(ys)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    pixel_labels = np.repeat(labels, lengths)
+    sizes = np.bincount(pixel_labels, minlength=n_labels)
+    stroke = _stroke_widths(ys, xs, pixel_labels, n_labels)
+
+    # The wire ends: each patch of ink in a box's ring (a wire can reach a box more than once),
+    # at the mean of its pixels
+    touching = ring[ys, xs]
+    in_ring = touching >= 0
+    if not in_ring.any(): return []
+    ring_x, ring_y = xs[in_ring], ys[in_ring]
+    run_first = np.concatenate(([0], np.flatnonzero((np.diff(ring_y) != 0) | (np.diff(ring_x) != 1)) + 1))
+    run_length = np.diff(np.concatenate((run_first, [len(ring_x)])))
+    ring_labels, _ = label_runs(ring_y[run_first], ring_x[run_first], ring_x[run_first] + run_length, w, connectivity=8)
+    patch = np.full(len(ys), -1, dtype=np.int64)
+    patch[in_ring] = np.repeat(ring_labels, run_length)
+    hit = in_ring & (sizes[pixel_labels] >= MIN_WIRE_PIXELS)
+    keys, inverse, counts = np.unique(patch[hit] * len(names) + touching[hit], return_inverse=True, return_counts=True)
+    touch_x = np.bincount(inverse, weights=xs[hit]) / counts
+    touch_y = np.bincount(inverse, weights=ys[hit]) / counts
+    touch_box = keys % len(names)
+    touch_label = np.zeros(len(keys), dtype=np.int64)
+    touch_label[inverse] = pixel_labels[hit]
+
+    by_label = np.argsort(pixel_labels, kind='stable')
+    label_start = np.cumsum(sizes) - sizes
+    headings, ratios, segments = {}, {}, []
+    for label in np.unique(touch_label):
+        ends_of_wire = np.flatnonzero(touch_label == label)
+        # A wire into a single box is a stub or text
+        if len(ends_of_wire) < 2: continue
+        pixels = by_label[label_start[label]:label_start[label] + sizes[label]]
+        px, py = xs[pixels], ys[pixels]
+        radius = max(HEAD_WINDOW_PX, HEAD_WINDOW_STROKES * stroke[label])
+        kept = []
+        for end in ends_of_wire:
+            shape = _end_shape(px, py, touch_x[end], touch_y[end], radius, stroke[label])
+            if shape is None: continue
+            headings[end], ratios[end] = shape
+            kept.append(end)
+        if len(kept) < 2: continue
+        segments += [(a, b, len(kept) == 2) for a, b in _pair_ends(kept, headings, touch_x, touch_y)]
+
+    # A line through a third box is cut at its border into two wires ending there; they are
+    # rejoined where they line up and the ink runs straight across the box between them
+    ends_at = {}
+    for index, (a, b, _) in enumerate(segments):
+        for end in (a, b): ends_at.setdefault(int(touch_box[end]), []).append((end, index))
+    candidates = []
+    for at_box in ends_at.values():
+        for i, (a, seg_a) in enumerate(at_box):
+            for b, seg_b in at_box[i + 1:]:
+                if seg_a == seg_b: continue
+                score = _straightness(-headings[a], -headings[b], touch_x[b] - touch_x[a], touch_y[b] - touch_y[a])
+                if score < MIN_STRAIGHTNESS: continue
+                if _inked(ink, touch_x[a], touch_y[a], touch_x[b], touch_y[b]) >= MIN_THROUGH_INK:
+                    candidates.append((score, a, b))
+    joined = {}
+    for a, b in _greedy_pairs(candidates): joined[a], joined[b] = b, a
+    other_end = {}
+    for index, (a, b, _) in enumerate(segments): other_end[a], other_end[b] = (b, index), (a, index)
+
+    edges, confident = {}, {}
+    def add(first, end, sure):
+        a, b = int(touch_box[first]), int(touch_box[end])
+        if a == b: return
+        heads = [ratios[first] > HEAD_FACTOR, ratios[end] > HEAD_FACTOR]
+        clear = not any(HEAD_FACTOR / HEAD_MARGIN < ratios[e] < HEAD_FACTOR * HEAD_MARGIN for e in (first, end))
+        if heads[0] != heads[1]:
+            source, target = (b, a) if heads[0] else (a, b)
+            key = ("output", names[source], names[target])
+        else:
+            key = ("inout",) + tuple(names[i] for i in sorted((a, b)))
+        edges[key] = edges.get(key, 0) + 1
+        confident[key] = confident.get(key, True) and sure and clear
+    visited = set()
+    for first in other_end:
+        # Walk each chain of rejoined wires once, from one of its two free ends
+        if first in joined or other_end[first][1] in visited: continue
+        end, simple = first, True
+        while True:
+            end, index = other_end[end]
+            visited.add(index)
+            simple = simple and segments[index][2]
+            if end not in joined: break
+            end, simple = joined[end], False
+        add(first, end, simple and all(_ends_at_box(ink, rects[touch_box[e]], touch_x[e], touch_y[e], -headings[e])
+                                       for e in (first, end)))
+    # Lines don't carry arrowheads along the way: a head where wires were rejoined is also a
+    # wire ending there, on top of another line through the box
+    for a, b, _ in segments:
+        if (a in joined and ratios[a] > HEAD_FACTOR) or (b in joined and ratios[b] > HEAD_FACTOR): add(a, b, False)
+    return [{"source": source, "target": target, "type": conn_type, "count": count,
+             "confident": confident[(conn_type, source, target)]}
+            for (conn_type, source, target), count in edges.items()]
@@ -0,0 +1,85 @@
+# src/cv_utils.py
+"""Small NumPy image-analysis helpers shared by the proposal engines (no Qt dependency)."""
+import numpy as np
+
+
+def otsu_threshold(gray):
+    """Otsu's threshold for a uint8 grayscale array (dark pixels are `gray < threshold`)."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0: return 128
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    mean_bg = cum_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cum_mean[-1] - cum_mean) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between)) + 1
+
+
+def binarize(gray, threshold=None):
+    """Boolean mask of dark ("ink") pixels; the threshold defaults to Otsu, clamped to a sane range."""
+    if threshold is None: threshold = min(max(otsu_threshold(gray), 64), 224)
+    return gray < threshold
+
+
+def find_runs(mask):
+    """Horizontal runs of True pixels as (rows, starts, ends) with `ends` exclusive, in row-major order."""
+    h, w = mask.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends
+
+
+def label_runs(rows, starts, ends, width, connectivity=4):
+    """Connected-component labels for runs from find_runs().
+
+    Overlapping runs of neighbouring rows are found with two searchsorted calls and merged
+    with vectorised hook-and-compress union-find. Returns (labels, n_labels) with labels
+    numbered 0..n_labels-1 in order of first appearance.
+    """
+    n = len(rows)
+    if n == 0: return np.zeros(0, dtype=np.int64), 0
+    stride = width + 2
+    start_key = rows * stride + starts
+    end_key = rows * stride + ends
+    reach = 1 if connectivity == 8 else 0
+    prev_base = (rows - 1) * stride
+    lo = np.searchsorted(end_key, prev_base + starts - reach, side='right')
+    hi = np.searchsorted(start_key, prev_base + ends + reach, side='left')
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    labels = np.arange(n)
+    if total:
+        b = np.repeat(np.arange(n), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        a = np.repeat(lo, counts) + offsets
+        while True:
+            la, lb = labels[a], labels[b]
+            differ = la != lb
+            if not differ.any(): break
+            low = np.minimum(la[differ], lb[differ])
+            np.minimum.at(labels, la[differ], low)
+            np.minimum.at(labels, lb[differ], low)
+            while True:
+                compressed = labels[labels]
+                if np.array_equal(compressed, labels): break
+                labels = compressed
+    _, first_index, compact = np.unique(labels, return_index=True, return_inverse=True)
+    # Renumber by first appearance so labels follow the row-major scan order
+    order = np.argsort(np.argsort(first_index))
+    return order[compact], len(first_index)
+
+
+def component_boxes(rows, starts, ends, labels, n_labels):
+    """Per-label bounding boxes (x0, y0, x1, y1 inclusive) and pixel counts as arrays."""
+    x0 = np.full(n_labels, np.iinfo(np.int64).max); np.minimum.at(x0, labels, starts)
+    x1 = np.full(n_labels, -1); np.maximum.at(x1, labels, ends - 1)
+    y0 = np.full(n_labels, np.iinfo(np.int64).max); np.minimum.at(y0, labels, rows)
+    y1 = np.full(n_labels, -1); np.maximum.at(y1, labels, rows)
+    pixels = np.bincount(labels, weights=ends - starts, minlength=n_labels)
+    return x0, y0, x1, y1, pixels
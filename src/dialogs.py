@@ -1,5 +1,6 @@
 # src/dialogs.py
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QPushButton, QDialogButtonBox, QComboBox, QLabel
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QLineEdit, QPushButton, QDialogButtonBox, QComboBox, QLabel,
+                             QPlainTextEdit, QCheckBox, QFormLayout)
 from PyQt6.QtCore import Qt # Import Qt
 
 class ComponentNameDialog(QDialog):
@@ -70,4 +71,34 @@ class SkipReasonDialog(QDialog):
     def get_reason(self):
         if self.exec() == QDialog.DialogCode.Accepted:
             return self.reason_combo.currentText()
-        return None
\ No newline at end of file
+        return None
+
+class BulkRenameDialog(QDialog):
+    """Collects rename rules for the whole JSON folder."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Bulk Rename Components")
+        self.resize(480, 360)
+        self.layout = QVBoxLayout(self)
+        self.layout.addWidget(QLabel("One rule per line: <i>old name =&gt; new name</i>"))
+        self.rules_edit = QPlainTextEdit()
+        self.rules_edit.setPlaceholderText("Amp => Amplifier\nLPF => Low-pass Filter")
+        self.layout.addWidget(self.rules_edit)
+        form = QFormLayout()
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(["exact", "casefold", "regex"])
+        form.addRow("Match:", self.mode_combo)
+        self.dry_run_check = QCheckBox("Preview only (dry run)")
+        self.dry_run_check.setChecked(True)
+        form.addRow(self.dry_run_check)
+        self.layout.addLayout(form)
+        self.button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        self.layout.addWidget(self.button_box)
+
+    def get_request(self):
+        """(rules text, mode, dry_run) or None if canceled."""
+        if self.exec() == QDialog.DialogCode.Accepted:
+            return self.rules_edit.toPlainText(), self.mode_combo.currentText(), self.dry_run_check.isChecked()
+        return None
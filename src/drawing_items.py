@@ -1,15 +1,28 @@
 # src/drawing_items.py
 import math
+from collections import defaultdict
 from PyQt6.QtWidgets import QStyleOptionGraphicsItem, QWidget
-from PyQt6.QtGui import QPainterPath, QPen, QColor, QPolygonF, QBrush, QPainter, QPainterPathStroker
-from PyQt6.QtCore import QPointF, Qt, QRectF, QLineF
+from PyQt6.QtGui import QPainterPath, QPen, QColor, QPolygonF, QPainter, QPainterPathStroker, QFont, QFontMetricsF
+from PyQt6.QtCore import QPointF, Qt, QRectF
 from typing import Optional
-from src.widgets.base_items import SelectableGraphicsItem, QGraphicsPathItem
+import numpy as np
+from src.arrow_geometry import layout_arrows, ray_box_exit
+from src.widgets.base_items import SelectableGraphicsItem, QGraphicsPathItem, LOW_DETAIL_SCALE
+
+# Arrowhead size in screen pixels
+ARROW_SIZE_PX = 15.0
+# Gap between the parallel arrows of a connection with count > 1, in scene units
+PARALLEL_SPACING = 15.0
+# Parallel arrows closer than this on screen are drawn as one line with a count badge
+MERGE_SPACING_PX = 4.0
+# How far arrowheads, halos and badges reach past the line, in screen pixels
+DECORATION_PX = 20.0
 
 class ArrowItem(QGraphicsPathItem, SelectableGraphicsItem):
     def __init__(self, start_item, end_item, color: QColor, source_name, target_name, 
                  is_bidirectional: bool, offset: QPointF = QPointF(0, 0), 
-                 line_width: int = 3, parent=None):
+                 line_width: int = 3, parallel_index: int = 0, parallel_count: int = 1,
+                 line: Optional[tuple] = None, parent=None):
         super().__init__(parent)
         self.start_item = start_item
         self.end_item = end_item
@@ -20,82 +33,128 @@ class ArrowItem(QGraphicsPathItem, SelectableGraphicsItem):
         self.conn_type = 'inout' if is_bidirectional else 'output'
         self.offset = offset
         self.line_width = line_width
+        # Position among the arrows drawn for one connection, for merging them when zoomed out
+        self.parallel_index, self.parallel_count = parallel_index, parallel_count
+        # Lower bound of the view scale, set by the viewer; sizes the bounding rect
+        self._view_scale = 1.0
+        # Both are cached until the line or the view scale changes
+        self._shape, self._bounding_rect = None, None
+        # A cosmetic pen for the line, built once rather than on every repaint
+        self._line_pen = QPen(self.arrow_color, self.line_width, Qt.PenStyle.SolidLine)
+        self._line_pen.setCosmetic(True)
 
         self.line_start, self.line_end = QPointF(), QPointF()
         
         self.setFlag(self.GraphicsItemFlag.ItemIsSelectable)
-        self.update_path()
+        # build_arrows lays out all arrows in one batch and passes each its endpoints
+        if line is not None: self.line_start, self.line_end = line
+        else: self.update_path()
 
     def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: Optional[QWidget] = None) -> None:
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        # Create a cosmetic pen for the line
-        line_pen = QPen(self.arrow_color, self.line_width, Qt.PenStyle.SolidLine)
-        line_pen.setCosmetic(True)
-        painter.setPen(line_pen)
-        painter.drawLine(self.line_start, self.line_end)
-        
-        # --- DYNAMIC ARROWHEAD CALCULATION ---
-        # The arrowhead size should also be constant on screen, so we calculate it
-        # based on the current level of detail (zoom factor).
-        lod = painter.worldTransform().m11() # Get the current zoom level
-        if lod == 0: return # Avoid division by zero
-        
-        # Define arrowhead size in screen pixels
-        arrow_size_on_screen = 15.0
-        # Calculate the required size in scene coordinates
-        arrow_size_in_scene = arrow_size_on_screen / lod
+        # --- LEVEL OF DETAIL ---
+        # Decorations keep a constant size on screen, so what is drawn depends on the zoom level.
+        lod = painter.worldTransform().m11() # The view never rotates
+        if lod <= 0: return # Avoid division by zero
+        line_start, line_end = self.line_start, self.line_end
+        # Zoomed out, parallel arrows blur into one: draw the middle one, centered, with a count
+        merged = self.parallel_count > 1 and PARALLEL_SPACING * lod < MERGE_SPACING_PX
+        if merged:
+            if self.parallel_index != self.parallel_count // 2: return
+            line_start, line_end = line_start - self.offset, line_end - self.offset
+        detailed = lod >= LOW_DETAIL_SCALE
 
-        line_vec = self.line_end - self.line_start
+        # Antialiasing is most of the cost of a long line and invisible when far zoomed out
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, detailed)
+        painter.setPen(self._line_pen)
+        painter.drawLine(line_start, line_end)
+
+        line_vec = line_end - line_start
         if line_vec.isNull(): return
+        if detailed: self._paint_arrowheads(painter, line_start, line_end, ARROW_SIZE_PX / lod)
+        if merged: self._paint_count_badge(painter, (line_start + line_end) / 2, self.parallel_count)
+        
+        # This still uses the cosmetic pen set in the base class, which is correct
+        self.paint_selection_highlight(painter, option)
+
+    def _paint_arrowheads(self, painter: QPainter, line_start: QPointF, line_end: QPointF, arrow_size_in_scene: float):
+        line_vec = line_end - line_start
 
         # Calculate arrowhead for the end point
         angle_end = math.atan2(line_vec.y(), line_vec.x())
-        p1 = self.line_end - QPointF(math.cos(angle_end - math.pi / 6) * arrow_size_in_scene, math.sin(angle_end - math.pi / 6) * arrow_size_in_scene)
-        p2 = self.line_end - QPointF(math.cos(angle_end + math.pi / 6) * arrow_size_in_scene, math.sin(angle_end + math.pi / 6) * arrow_size_in_scene)
-        arrow_head_end = QPolygonF([self.line_end, p1, p2])
+        p1 = line_end - QPointF(math.cos(angle_end - math.pi / 6) * arrow_size_in_scene, math.sin(angle_end - math.pi / 6) * arrow_size_in_scene)
+        p2 = line_end - QPointF(math.cos(angle_end + math.pi / 6) * arrow_size_in_scene, math.sin(angle_end + math.pi / 6) * arrow_size_in_scene)
+        arrow_head_end = QPolygonF([line_end, p1, p2])
 
         painter.setPen(Qt.PenStyle.NoPen)
-        painter.setBrush(QBrush(self.arrow_color))
+        painter.setBrush(self.arrow_color)
         painter.drawPolygon(arrow_head_end)
 
         # Calculate and draw arrowhead for the start point if bidirectional
         if self.is_bidirectional:
             angle_start = math.atan2(-line_vec.y(), -line_vec.x())
-            p3 = self.line_start - QPointF(math.cos(angle_start - math.pi / 6) * arrow_size_in_scene, math.sin(angle_start - math.pi / 6) * arrow_size_in_scene)
-            p4 = self.line_start - QPointF(math.cos(angle_start + math.pi / 6) * arrow_size_in_scene, math.sin(angle_start + math.pi / 6) * arrow_size_in_scene)
-            arrow_head_start = QPolygonF([self.line_start, p3, p4])
+            p3 = line_start - QPointF(math.cos(angle_start - math.pi / 6) * arrow_size_in_scene, math.sin(angle_start - math.pi / 6) * arrow_size_in_scene)
+            p4 = line_start - QPointF(math.cos(angle_start + math.pi / 6) * arrow_size_in_scene, math.sin(angle_start + math.pi / 6) * arrow_size_in_scene)
+            arrow_head_start = QPolygonF([line_start, p3, p4])
             painter.drawPolygon(arrow_head_start)
-        
-        # This still uses the cosmetic pen set in the base class, which is correct
-        self.paint_selection_highlight(painter, option)
+
+    def _paint_count_badge(self, painter: QPainter, center: QPointF, count: int):
+        """An "xN" pill at `center`, drawn in device pixels so it stays readable."""
+        text = f"\u00d7{count}"
+        font, size = _badge_metrics(text)
+        transform = painter.worldTransform()
+        rect = QRectF(QPointF(0, 0), size)
+        rect.moveCenter(transform.map(center))
+        painter.resetTransform()
+        painter.setPen(Qt.PenStyle.NoPen); painter.setBrush(self.arrow_color)
+        painter.drawRoundedRect(rect, rect.height() / 2, rect.height() / 2)
+        painter.setPen(Qt.GlobalColor.white); painter.setFont(font)
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, text)
+        painter.setTransform(transform)
+
+    def set_view_scale(self, scale: float):
+        """Tells the arrow the smallest view scale it will be drawn at, so its bounding rect covers
+        the arrowheads and badge (sized in screen pixels)."""
+        if scale == self._view_scale: return
+        self.prepareGeometryChange()
+        self._view_scale, self._bounding_rect = scale, None
+
+    def boundingRect(self) -> QRectF:
+        # The path is never set; without this the scene indexes every arrow at the origin and
+        # culls it as soon as the view scrolls away from there
+        if self._bounding_rect is None:
+            if self.line_start.isNull() and self.line_end.isNull(): return QRectF()
+            # At least half the 15-unit clickable stroke of shape(); the merged line is shifted by -offset
+            margin = max(DECORATION_PX / self._view_scale, 7.5) + max(abs(self.offset.x()), abs(self.offset.y()))
+            self._bounding_rect = QRectF(self.line_start, self.line_end).normalized().adjusted(-margin, -margin, margin, margin)
+        return self._bounding_rect
 
     def update_path(self):
-        """This method now only calculates the start and end points of the line."""
-        start_pos = self.start_item.sceneBoundingRect().center() + self.offset
-        end_pos = self.end_item.sceneBoundingRect().center() + self.offset
-        
-        line = end_pos - start_pos
-        if line.isNull(): return
-
-        def get_intersection_point(rect: QRectF, line_vec: QPointF, center: QPointF):
-            if rect.isEmpty() or line_vec.isNull(): return center
-            p_far = center + line_vec * 1000
-            intersect_line = QLineF(center, p_far)
-            
-            sides = [QLineF(rect.topLeft(), rect.topRight()), QLineF(rect.topRight(), rect.bottomRight()),
-                     QLineF(rect.bottomRight(), rect.bottomLeft()), QLineF(rect.bottomLeft(), rect.topLeft())]
-            
-            for side in sides:
-                intersection_type, point = side.intersects(intersect_line)
-                if intersection_type == QLineF.IntersectionType.BoundedIntersection:
-                    return point
-            return center
-
-        self.line_start = get_intersection_point(self.start_item.rect(), line, start_pos)
-        self.line_end = get_intersection_point(self.end_item.rect(), -line, end_pos)
+        """Recomputes the line's endpoints from the two boxes."""
+        self.prepareGeometryChange()
+        self._shape, self._bounding_rect = None, None
+        start_box, end_box = _box(self.start_item), _box(self.end_item)
+        start_center, end_center = (start_box[:2] + start_box[2:]) / 2, (end_box[:2] + end_box[2:]) / 2
+        line = end_center - start_center
+        if not line.any(): return
+        offset = np.array([self.offset.x(), self.offset.y()])
+        points = ray_box_exit([start_center + offset, end_center + offset], [line, -line], [start_box, end_box])
+        self.line_start, self.line_end = QPointF(*points[0]), QPointF(*points[1])
+
+    def contains(self, point: QPointF) -> bool:
+        """Same as shape().contains(point) for the round-capped stroke, without building the path;
+        hit tests call this for every arrow whose bounding rect holds the point."""
+        if self.line_start.isNull() or self.line_end.isNull(): return False
+        line_vec = self.line_end - self.line_start
+        length_sq = QPointF.dotProduct(line_vec, line_vec)
+        t = 0.0 if length_sq == 0 else min(1.0, max(0.0, QPointF.dotProduct(point - self.line_start, line_vec) / length_sq))
+        nearest = self.line_start + line_vec * t
+        return math.hypot(point.x() - nearest.x(), point.y() - nearest.y()) <= 7.5
 
     def shape(self):
+        if self._shape is None: self._shape = self._build_shape()
+        return self._shape
+
+    def _build_shape(self):
         path = QPainterPath()
         if self.line_start.isNull() or self.line_end.isNull(): return path
         path.moveTo(self.line_start)
@@ -113,4 +172,102 @@ class ArrowItem(QGraphicsPathItem, SelectableGraphicsItem):
         # This is an advanced technique, but it makes the clickable area consistent.
         # However, for simplicity and robustness, a fixed large width is often sufficient.
         # Let's stick to the simpler approach for now.
-        return stroke
\ No newline at end of file
+        return stroke
+
+class GhostArrowItem(ArrowItem):
+    """A dashed (dotted if not confident), not yet accepted connection proposal; `proposal` is
+    {"source", "target", "type", "count", "confident"}."""
+    def __init__(self, start_item, end_item, proposal, parent=None):
+        super().__init__(start_item, end_item, QColor("#c678dd"), proposal["source"], proposal["target"],
+                         proposal["type"] == "inout", parent=parent)
+        self.proposal = proposal
+        self._line_pen.setStyle(Qt.PenStyle.DashLine if proposal["confident"] else Qt.PenStyle.DotLine)
+        # Above the accepted arrows, so it can be clicked where they overlap
+        self.setZValue(1)
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: Optional[QWidget] = None) -> None:
+        super().paint(painter, option, widget)
+        if self.proposal["count"] > 1 and not self.line_start.isNull():
+            self._paint_count_badge(painter, (self.line_start + self.line_end) / 2, self.proposal["count"])
+
+_BADGE_CACHE = {}
+
+def _badge_metrics(text):
+    """(font, pill size) of a count badge; fonts can only be made once the application exists."""
+    if text not in _BADGE_CACHE:
+        font = QFont(); font.setPixelSize(11); font.setBold(True)
+        _BADGE_CACHE[text] = (font, QFontMetricsF(font).boundingRect(text).adjusted(-4, -2, 4, 2).size())
+    return _BADGE_CACHE[text]
+
+
+def connection_pairs(components):
+    """{pair: {'type': 'output' | 'inout', 'count': n}} from the output and inout fields;
+    output pairs are (source, target), inout pairs are sorted."""
+    all_connections = defaultdict(lambda: {'type': 'none', 'count': 0})
+    for source_name, details in components.items():
+        connections = details.get("connections", {})
+
+        # Process outputs (unidirectional)
+        for conn in connections.get("output", []):
+            pair = (source_name, conn['name'])
+            all_connections[pair]['type'] = 'output'
+            all_connections[pair]['count'] = conn.get('count', 1)
+
+        # Process inouts (bidirectional)
+        for conn in connections.get("inout", []):
+            # Use a sorted tuple to represent the undirected pair
+            pair = tuple(sorted((source_name, conn['name'])))
+            all_connections[pair]['type'] = 'inout'
+            all_connections[pair]['count'] = max(all_connections[pair]['count'], conn.get('count', 1))
+    return all_connections
+
+
+def _box(item):
+    rect = item.rect()
+    return np.array([rect.left(), rect.top(), rect.right(), rect.bottom()])
+
+
+def build_arrows(component_rects, components, show_all, selected_name):
+    """The ArrowItems (not yet added to a scene) for `components` between the given
+    {name: ComponentRectItem}, colored by view mode: every connection when `show_all`,
+    otherwise only those touching `selected_name`."""
+    color_output = QColor("#e06c75")
+    color_input = QColor("#98c379")
+    color_inout = QColor("#61afef")
+    # 1. Collect the connections to draw, with their color and properties
+    edges = []
+    for (source, target), info in connection_pairs(components).items():
+        conn_type = info['type']
+        if conn_type == 'none': continue
+        if source not in component_rects or target not in component_rects: continue
+
+        # Determine if the arrow should be drawn based on the view mode.
+        if not (show_all or (selected_name and selected_name in (source, target))): continue
+
+        is_bidirectional = (conn_type == 'inout')
+        # In "selected only" mode, color depends on direction relative to selection
+        if not show_all and selected_name:
+            if is_bidirectional: final_color = color_inout
+            else: final_color = color_output if source == selected_name else color_input
+        # In "show all" mode, or if no selection, use default colors
+        else:
+            final_color = color_inout if is_bidirectional else color_output
+        edges.append((source, target, info['count'], final_color, is_bidirectional))
+    if not edges: return []
+
+    # 2. Lay out every arrow at once, parallel connections side by side
+    names = list(component_rects)
+    index = {name: i for i, name in enumerate(names)}
+    boxes = np.array([_box(component_rects[name]) for name in names])
+    edge, parallel_index, offsets, starts, ends = layout_arrows(
+        boxes, [index[e[0]] for e in edges], [index[e[1]] for e in edges], [e[2] for e in edges], PARALLEL_SPACING)
+
+    # 3. Build the items from the precomputed endpoints
+    line_width = 5 if not show_all else 3 # Thicker lines when focused
+    arrows = []
+    for e, i, (ox, oy), (sx, sy), (ex, ey) in zip(edge.tolist(), parallel_index.tolist(), offsets.tolist(), starts.tolist(), ends.tolist()):
+        source, target, count, color, is_bidirectional = edges[e]
+        arrows.append(ArrowItem(component_rects[source], component_rects[target], color, source, target, is_bidirectional,
+                                offset=QPointF(ox, oy), line_width=line_width, parallel_index=i, parallel_count=count,
+                                line=(QPointF(sx, sy), QPointF(ex, ey))))
+    return arrows
@@ -0,0 +1,188 @@
+# src/duplicates.py
+"""Near-duplicate images (re-exports, resized copies) by difference hash.
+
+Each image is decoded at a small size straight from the file, averaged down to a 17x16
+grid, and hashed to 256 bits: one per horizontal neighbour pair, set where brightness
+increases. Resizing and re-encoding change a handful of bits. Diagrams are mostly white
+with thin lines, which a 64-bit hash blurs away; 256 bits keep distinct layouts apart. Hashes are cached
+per file (by mtime and size) in ``<json_folder>/.duplicates/hashes.json`` and computed
+in a process pool.
+
+Grouping uses a multi-index search. With a distance of at most d bits, two hashes split
+into d + 1 blocks agree exactly on at least one block, so only hashes sharing a block are
+compared. 100k images group in seconds once hashed.
+
+    python -m src.duplicates IMAGE_DIR --json-folder JSON_DIR --output groups.json
+"""
+import json
+import os
+from functools import partial
+
+import numpy as np
+
+from src.annotation_core import read_annotation, components_of, write_json_atomic
+from src.batch.common import parallel_map
+
+DUPLICATE_DIR = ".duplicates"
+CACHE_VERSION = 1
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+HASH_SIZE = 16
+# Images are decoded at this multiple of the hash grid and averaged down, which is far
+# more robust to resampling than decoding to the grid directly
+DECODE_SCALE = 4
+DEFAULT_MAX_DISTANCE = 8
+DUPLICATE_REASON = "Duplicate image"
+
+
+def dhash(gray, hash_size=HASH_SIZE):
+    """Difference hash (hash_size**2 bits, as an int) of an (h, w) grayscale array whose sides
+    are multiples of (hash_size + 1, hash_size)."""
+    h, w = gray.shape
+    small = gray.reshape(hash_size, h // hash_size, hash_size + 1, w // (hash_size + 1)).mean(axis=(1, 3))
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def dhash_file(image_path, hash_size=HASH_SIZE):
+    from PyQt6.QtCore import QSize
+    from PyQt6.QtGui import QImageReader
+    from src.image_arrays import qimage_to_gray
+    reader = QImageReader(image_path)
+    # JPEGs are then decoded at reduced size, other formats are scaled right after decoding
+    reader.setScaledSize(QSize((hash_size + 1) * DECODE_SCALE, hash_size * DECODE_SCALE))
+    image = reader.read()
+    if image.isNull(): raise IOError(f"Cannot read image: {image_path}")
+    return dhash(qimage_to_gray(image), hash_size)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def hash_cache_path(json_folder):
+    return os.path.join(json_folder, DUPLICATE_DIR, "hashes.json")
+
+
+def _hash_for_worker(item, image_folder):
+    name, key = item
+    try:
+        return name, key, dhash_file(os.path.join(image_folder, name))
+    except OSError:
+        return name, key, None
+
+
+def hash_folder(image_folder, cache_path=None, workers=None, progress=None):
+    """{image name: hash} for the folder; unreadable images are left out. Uncached images are
+    hashed in a process pool. `progress(done, total)` may return False to stop early; what was
+    hashed so far is still cached."""
+    cache = {}
+    if cache_path:
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f: data = json.load(f)
+            if data.get("version") == CACHE_VERSION: cache = data["hashes"]
+        except (OSError, ValueError, KeyError):
+            pass
+    hashes, todo, fresh = {}, [], {}
+    with os.scandir(image_folder) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith(IMAGE_EXTENSIONS): continue
+            try: st = entry.stat()
+            except OSError: continue
+            key, cached = [st.st_mtime_ns, st.st_size], cache.get(entry.name)
+            if cached and cached[:2] == key:
+                fresh[entry.name] = cached
+                if cached[2] is not None: hashes[entry.name] = int(cached[2], 16)
+            else:
+                todo.append((entry.name, key))
+    results = parallel_map(partial(_hash_for_worker, image_folder=image_folder), todo, workers, chunksize=16)
+    try:
+        for done, (name, key, value) in enumerate(results, 1):
+            fresh[name] = key + [None if value is None else format(value, 'x')]
+            if value is not None: hashes[name] = value
+            if progress and progress(done, len(todo)) is False: break
+    finally:
+        results.close() # Stops the pool when cancelled
+    if cache_path and (todo or len(fresh) != len(cache)):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        write_json_atomic(cache_path, {"version": CACHE_VERSION, "hashes": fresh})
+    return hashes
+
+
+def _block_specs(bits, blocks):
+    """(shift, mask) of `blocks` nearly equal bit ranges covering `bits`."""
+    specs, start = [], 0
+    for i in range(blocks):
+        width = bits // blocks + (1 if i < bits % blocks else 0)
+        specs.append((start, (1 << width) - 1)); start += width
+    return specs
+
+
+def find_duplicate_groups(hashes, max_distance=DEFAULT_MAX_DISTANCE, bits=HASH_SIZE * HASH_SIZE):
+    """Groups of names (2 or more each, sorted) whose hashes are connected by distances of at
+    most `max_distance` bits."""
+    by_hash = {}
+    for name, value in hashes.items(): by_hash.setdefault(value, []).append(name)
+    values = list(by_hash)
+    parent = list(range(len(values)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]; i = parent[i]
+        return i
+
+    specs = _block_specs(bits, max_distance + 1)
+    tables = [{} for _ in specs]
+    for i, value in enumerate(values):
+        seen = set()
+        for table, (shift, mask) in zip(tables, specs):
+            bucket = table.setdefault((value >> shift) & mask, [])
+            for j in bucket:
+                if j in seen: continue
+                seen.add(j)
+                if hamming(value, values[j]) <= max_distance: parent[find(i)] = find(j)
+            bucket.append(i)
+    groups = {}
+    for i, value in enumerate(values): groups.setdefault(find(i), []).extend(by_hash[value])
+    return sorted((sorted(names) for names in groups.values() if len(names) > 1), key=lambda names: names[0])
+
+
+def _has_annotations(json_folder, image_name):
+    return bool(components_of(read_annotation(os.path.join(json_folder, f"{os.path.splitext(image_name)[0]}.json"))))
+
+
+def pick_originals(groups, json_folder=None, sort_key=None):
+    """{duplicate name: original name} for every group. The original is the first image (in
+    `sort_key` order) that already has annotations, else the first image of the group."""
+    duplicate_of = {}
+    for names in groups:
+        names = sorted(names, key=sort_key)
+        original = next((name for name in names if json_folder and _has_annotations(json_folder, name)), names[0])
+        for name in names:
+            if name != original: duplicate_of[name] = original
+    return duplicate_of
+
+
+def scale_components(components, sx, sy):
+    """A copy of `components` with every box scaled by (sx, sy), for a resized duplicate."""
+    scaled = json.loads(json.dumps(components))
+    for details in scaled.values():
+        x1, y1, x2, y2 = details["component_box"]
+        details["component_box"] = [round(x1 * sx, 2), round(y1 * sy, 2), round(x2 * sx, 2), round(y2 * sy, 2)]
+    return scaled
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Find near-duplicate images by perceptual hash")
+    parser.add_argument("image_folder")
+    parser.add_argument("--json-folder", help="Hash cache location, and annotated images are preferred as originals")
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE, help="Largest Hamming distance (of 256 bits) counted as a duplicate")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", help="Write {duplicate: original} as JSON to this file")
+    args = parser.parse_args()
+    hashes = hash_folder(args.image_folder, hash_cache_path(args.json_folder) if args.json_folder else None, args.workers)
+    groups = find_duplicate_groups(hashes, args.max_distance)
+    duplicate_of = pick_originals(groups, args.json_folder)
+    print(f"{len(hashes)} images hashed, {len(groups)} duplicate groups, {len(duplicate_of)} duplicates")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: json.dump(duplicate_of, f, indent=2, ensure_ascii=False)
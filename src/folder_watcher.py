@@ -0,0 +1,128 @@
+# src/folder_watcher.py
+"""Change detection for the open image and JSON folders.
+
+Folders are watched with QFileSystemWatcher. When a watch cannot be set up, or when forced
+with ``SBA_WATCH=poll`` (network shares, where remote writes raise no local events), they
+are polled instead. Either way the folder listing is diffed against the previous one, so
+only the files that were added, removed or rewritten are reported. Bursts of events, e.g. from a
+batch tool, are coalesced into one diff. ``SBA_WATCH=0`` turns watching off.
+"""
+import os
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+WATCH_ENV_VAR = "SBA_WATCH"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Quiet time after the last event before the folders are diffed
+DEBOUNCE_MS = 300
+POLL_INTERVAL_MS = 3000
+
+
+def default_mode():
+    value = os.environ.get(WATCH_ENV_VAR, "").strip().lower()
+    if value in ("0", "false", "no", "off"): return "off"
+    return "poll" if value == "poll" else "watch"
+
+
+def scan_images(folder):
+    with os.scandir(folder) as entries:
+        return {entry.name for entry in entries if entry.name.lower().endswith(IMAGE_EXTENSIONS)}
+
+
+def scan_jsons(folder, with_stat=False):
+    """{JSON file name: signature}; hidden entries (.claims, temp files) are left out.
+
+    The inode alone (free from the directory listing) changes with every atomic rewrite;
+    `with_stat` adds mtime and size to also catch in-place writes, at one stat per file.
+    """
+    state = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json') or entry.name.startswith('.'): continue
+            try:
+                if not with_stat: state[entry.name] = entry.inode(); continue
+                st = entry.stat()
+            except OSError: continue # Removed while scanning
+            state[entry.name] = (st.st_ino, st.st_mtime_ns, st.st_size)
+    return state
+
+
+class FolderWatcher(QObject):
+    # Image file names added to and removed from the image folder
+    images_changed = pyqtSignal(list, list)
+    # JSON file names that were created, removed or rewritten
+    annotations_changed = pyqtSignal(list)
+
+    def __init__(self, parent=None, mode=None):
+        super().__init__(parent)
+        self.mode = mode or default_mode()
+        self.image_folder, self.json_folder = None, None
+        self._images, self._jsons = set(), {}
+        self._watched_file = None
+        # Watched files that reported a change, for the next refresh to pass on
+        self._touched = set()
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self.schedule_refresh)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(DEBOUNCE_MS)
+        self._debounce.timeout.connect(self.refresh)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(POLL_INTERVAL_MS)
+        self._poll_timer.timeout.connect(self.refresh)
+
+    @property
+    def polling(self):
+        return self._poll_timer.isActive()
+
+    def set_folders(self, image_folder, json_folder):
+        """Starts watching the given folders (either may be None) from their current contents."""
+        self.stop()
+        self.image_folder, self.json_folder = image_folder, json_folder
+        try:
+            self._images = scan_images(image_folder) if image_folder else set()
+            self._jsons = {}
+            if self.mode == "off": return
+            folders = {folder for folder in (image_folder, json_folder) if folder}
+            if self.mode == "poll" or not all(self._watcher.addPath(folder) for folder in folders):
+                if self._watcher.directories(): self._watcher.removePaths(self._watcher.directories())
+                if folders: self._poll_timer.start()
+            self._jsons = scan_jsons(json_folder, self.polling) if json_folder else {}
+        except OSError:
+            self._images, self._jsons = set(), {}
+
+    def watch_file(self, path):
+        """Also watches `path` itself (the open annotation), which catches in-place rewrites
+        that do not touch the folder entry."""
+        if self._watched_file and self._watched_file in self._watcher.files(): self._watcher.removePath(self._watched_file)
+        self._watched_file = path
+        if path and self.mode == "watch" and os.path.exists(path): self._watcher.addPath(path)
+
+    def stop(self):
+        self._debounce.stop(); self._poll_timer.stop(); self._touched.clear()
+        paths = self._watcher.directories() + self._watcher.files()
+        if paths: self._watcher.removePaths(paths)
+        self._watched_file = None
+
+    def schedule_refresh(self, *_):
+        self._debounce.start()
+
+    def _on_file_changed(self, path):
+        self._touched.add(os.path.basename(path)); self._debounce.start()
+
+    def refresh(self):
+        """Diffs the folders against the last snapshot and reports what changed."""
+        try:
+            images = scan_images(self.image_folder) if self.image_folder else set()
+            jsons = scan_jsons(self.json_folder, self.polling) if self.json_folder else {}
+        except OSError:
+            return # The folder is gone or unreachable; keep the snapshot and try again later
+        added, removed = sorted(images - self._images), sorted(self._images - images)
+        changed = {name for name in self._jsons.keys() | jsons.keys() if self._jsons.get(name) != jsons.get(name)}
+        changed = sorted(changed | (self._touched & jsons.keys()))
+        self._images, self._jsons, self._touched = images, jsons, set()
+        # A rewritten file replaces the watched inode and drops it from the watcher
+        if self._watched_file and self.mode == "watch" and self._watched_file not in self._watcher.files() and os.path.exists(self._watched_file):
+            self._watcher.addPath(self._watched_file)
+        if added or removed: self.images_changed.emit(added, removed)
+        if changed: self.annotations_changed.emit(changed)
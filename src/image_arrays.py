@@ -0,0 +1,22 @@
+# src/image_arrays.py
+"""Conversion between QImage and NumPy arrays."""
+import numpy as np
+from PyQt6.QtGui import QImage, QImageReader
+
+
+def qimage_to_gray(image: QImage) -> np.ndarray:
+    """Returns an (h, w) uint8 grayscale copy of `image`."""
+    if image.format() != QImage.Format.Format_Grayscale8:
+        image = image.convertToFormat(QImage.Format.Format_Grayscale8)
+    h, w, stride = image.height(), image.width(), image.bytesPerLine()
+    if h == 0 or w == 0: return np.zeros((0, 0), dtype=np.uint8)
+    buffer = image.constBits()
+    buffer.setsize(stride * h)
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(h, stride)[:, :w].copy()
+
+
+def load_gray(image_path) -> np.ndarray:
+    """Decodes an image file straight to a grayscale array (works without a QApplication)."""
+    image = QImageReader(image_path).read()
+    if image.isNull(): raise IOError(f"Cannot read image: {image_path}")
+    return qimage_to_gray(image)
@@ -0,0 +1,172 @@
+# src/image_cache.py
+"""Local cache of decoded images, for image folders on slow network shares.
+
+Each image is stored once decoded, as its raw pixel buffer behind a small header (size,
+stride, pixel format), under a key made from the source path, mtime and size. A hit is
+memory-mapped and wrapped in a QImage without decoding or copying; for opaque images even
+the QPixmap shares the mapped pages. The cache is pruned, least recently used first, to a
+disk budget, and a background thread fills it for the images the user is likely to open
+next.
+
+Off unless ``SBA_IMAGE_CACHE`` is set: ``1`` uses the user's cache directory, anything
+else is taken as the path. ``SBA_IMAGE_CACHE_MB`` sets the budget (default 2048).
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtGui import QImage, QImageReader
+
+IMAGE_CACHE_ENV_VAR = "SBA_IMAGE_CACHE"
+IMAGE_CACHE_BUDGET_ENV_VAR = "SBA_IMAGE_CACHE_MB"
+DEFAULT_BUDGET_MB = 2048
+MAGIC = b"SBAIMG1\0"
+# magic, width, height, bytes per line, QImage.Format; pixels start at HEADER_SIZE
+HEADER = struct.Struct("<8sIIII")
+HEADER_SIZE = 64
+CACHE_SUFFIX = ".raw"
+# Images after (and before) the current one that the warmer decodes ahead
+WARM_AHEAD, WARM_BEHIND = 3, 1
+
+
+def cache_from_env():
+    """The ImageCache configured by the environment, or None if caching is off."""
+    value = os.environ.get(IMAGE_CACHE_ENV_VAR, "").strip()
+    if not value or value.lower() in ("0", "false", "no", "off"): return None
+    if value.lower() in ("1", "true", "yes", "on"):
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        value = os.path.join(cache_home, "SysBlockAnnotator", "images")
+    try: budget_mb = float(os.environ.get(IMAGE_CACHE_BUDGET_ENV_VAR) or DEFAULT_BUDGET_MB)
+    except ValueError: budget_mb = DEFAULT_BUDGET_MB
+    return ImageCache(value, int(budget_mb * 1024 * 1024))
+
+
+def cache_key(image_path):
+    """Hex key of the source path, mtime and size; None if the file cannot be stat'ed."""
+    try: st = os.stat(image_path)
+    except OSError: return None
+    return hashlib.blake2b(f"{os.path.abspath(image_path)}\0{st.st_mtime_ns}\0{st.st_size}".encode(), digest_size=16).hexdigest()
+
+
+def storable(image):
+    """`image` in a format that is stored as-is: what QPixmap uses without converting where possible."""
+    if image.hasAlphaChannel(): target = QImage.Format.Format_ARGB32_Premultiplied
+    else: target = QImage.Format.Format_RGB32
+    return image if image.format() == target else image.convertToFormat(target)
+
+
+def map_image(cache_path):
+    """(QImage over the memory-mapped file, the mapped buffer), or None if the file is missing or
+    invalid. The image uses the buffer's memory: keep the buffer for as long as the image or any
+    pixmap made from it is alive."""
+    try:
+        with open(cache_path, 'rb') as f:
+            # Copy-on-write: a stray write into the image lands in private pages, never in the file
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (OSError, ValueError):
+        return None # Missing, or empty
+    if len(mapped) < HEADER_SIZE: return None
+    magic, width, height, bytes_per_line, fmt = HEADER.unpack_from(mapped)
+    if magic != MAGIC or len(mapped) != HEADER_SIZE + bytes_per_line * height: return None
+    buffer = memoryview(mapped)[HEADER_SIZE:]
+    image = QImage(buffer, width, height, bytes_per_line, QImage.Format(fmt))
+    return (image, buffer) if not image.isNull() else None
+
+
+def write_image(cache_path, image):
+    """Writes `image` (already storable()) atomically."""
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, image.width(), image.height(), image.bytesPerLine(), image.format().value).ljust(HEADER_SIZE, b"\0"))
+            f.write(bits)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+
+class ImageCache:
+    def __init__(self, cache_dir, budget_bytes):
+        self.cache_dir, self.budget_bytes = cache_dir, budget_bytes
+        # Paths the warmer should still decode; replaced by each warm() call
+        self._wanted = frozenset()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}{CACHE_SUFFIX}")
+
+    def load(self, image_path):
+        """(QImage, buffer) from the cache, as map_image returns them, or None on a miss."""
+        key = cache_key(image_path)
+        if key is None: return None
+        cache_path = self.path_for(key)
+        hit = map_image(cache_path)
+        if hit:
+            # The mtime is the last use, which pruning goes by
+            try: os.utime(cache_path)
+            except OSError: pass
+        return hit
+
+    def store(self, image_path, image):
+        """Adds a decoded image and prunes the cache to its budget. Safe to call from any thread."""
+        key = cache_key(image_path)
+        if key is None or image.isNull(): return
+        image = storable(image)
+        # An image taking most of the budget would only push out everything else
+        if image.sizeInBytes() > self.budget_bytes // 4: return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_image(self.path_for(key), image)
+            self.prune()
+        except OSError as e:
+            print(f"Error writing image cache: {e}")
+
+    def store_later(self, image_path, image):
+        """store() on the background thread, for an image that was just decoded for display."""
+        self._submit(self.store, image_path, image)
+
+    def prune(self):
+        """Deletes the least recently used entries until the cache fits its budget."""
+        with self._lock:
+            entries = []
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(CACHE_SUFFIX): continue
+                    try: st = entry.stat()
+                    except OSError: continue
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.budget_bytes: break
+                # Images still shown keep their pages: the mapping outlives the directory entry
+                try: os.remove(path); total -= size
+                except OSError: pass
+
+    def warm(self, image_paths):
+        """Decodes and caches `image_paths` in the background, in order. Replaces the previous
+        list; paths dropped from it before their turn are not decoded."""
+        # Stat'ing the sources may be slow on a share, so even the hit check is left to the thread
+        self._wanted = frozenset(image_paths)
+        for path in image_paths: self._submit(self._warm_one, path)
+
+    def _warm_one(self, image_path):
+        if image_path not in self._wanted: return
+        key = cache_key(image_path)
+        if key is None or os.path.exists(self.path_for(key)): return
+        image = QImageReader(image_path).read()
+        if not image.isNull(): self.store(image_path, image)
+
+    def _submit(self, func, *args):
+        if self._executor is None: self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-cache")
+        self._executor.submit(func, *args)
+
+    def stop(self):
+        self._wanted = frozenset()
+        if self._executor: self._executor.shutdown(wait=False, cancel_futures=True); self._executor = None
@@ -1,12 +1,57 @@
 # src/image_viewer.py
 import math
-from collections import defaultdict
 from PyQt6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QGraphicsTextItem
-from PyQt6.QtCore import Qt, QPointF, QRectF, pyqtSignal
-from PyQt6.QtGui import QPixmap, QPen, QColor, QPainter, QFont
+from PyQt6.QtCore import Qt, QRectF, pyqtSignal
+from PyQt6.QtGui import QPixmap, QPen, QColor, QPainter, QFont, QImageReader, QCursor
+
+from src.widgets.base_items import ComponentRectItem, GhostBoxItem
+from src.drawing_items import ArrowItem, GhostArrowItem, build_arrows
+from src.profiling import PROFILER, timed
+
+# Longest side (in pixels) of the cheap preview shown while navigation keys auto-repeat
+PREVIEW_MAX_SIDE = 800
+# Zoom factor of one wheel notch or +/- key press
+ZOOM_STEP = 1.25
+# Zoom range: from half the fitted size to this many screen pixels per image pixel
+MIN_ZOOM_OF_FIT = 0.5
+MAX_ZOOM = 32.0
+
+def skipped_text_item(reason, img_rect):
+    """The "SKIPPED" banner, centered on `img_rect`."""
+    font = QFont("Arial", 50, QFont.Weight.Bold)
+    text_item = QGraphicsTextItem(f"SKIPPED\nReason: {reason}")
+    text_item.setFont(font)
+    text_item.setDefaultTextColor(QColor(255, 0, 0, 150))
+    text_rect = text_item.boundingRect()
+    x = img_rect.center().x() - text_rect.width() / 2
+    y = img_rect.center().y() - text_rect.height() / 2
+    text_item.setPos(x, y)
+    return text_item
+
+
+class ViewerState:
+    """A detached scene with its image, annotation items and the view transform it was shown with."""
+    def __init__(self, scene, image_item, skipped_text_item, component_rects, arrow_items, transform, center, zoomed=False):
+        self.scene = scene
+        self.image_item = image_item
+        self.skipped_text_item = skipped_text_item
+        self.component_rects = component_rects
+        self.arrow_items = arrow_items
+        self.transform = transform
+        self.center = center
+        self.zoomed = zoomed
+
+    def pixmap_bytes(self):
+        if not self.image_item: return 0
+        pixmap = self.image_item.pixmap()
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def release(self):
+        if self.image_item: self.image_item.setPixmap(QPixmap())
+        self.scene.clear()
+        self.scene.deleteLater()
+        self.image_item, self.skipped_text_item, self.component_rects, self.arrow_items = None, None, {}, []
 
-from src.widgets.base_items import ComponentRectItem
-from src.drawing_items import ArrowItem
 
 class ImageViewer(QGraphicsView):
     # --- NO CHANGES to signals ---
@@ -17,9 +62,7 @@ class ImageViewer(QGraphicsView):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.scene = QGraphicsScene(self)
-        self.scene.selectionChanged.connect(self.scene_selection_changed)
-        self.setScene(self.scene)
+        self._install_scene(QGraphicsScene(self))
         
         self.image_item = None
         self.skipped_text_item = None
@@ -27,6 +70,19 @@ class ImageViewer(QGraphicsView):
         self.start_pos = None
         self.temp_rect = None
         self.component_rects = {}
+        # Arrows currently in the scene; tracked so clearing them does not scan every scene item
+        self.arrow_items = []
+        # Box and connection proposals not accepted yet; they never go into the scene cache
+        self.ghost_items = []
+        self.connection_ghosts = []
+        # Grayscale copy of the full-resolution image for image analysis, built on first use
+        self._gray = None
+        # True once the user zoomed; the view is then no longer refitted on resize
+        self.zoomed = False
+        # View scale the arrows' bounding rects are sized for (rounded down to a power of two)
+        self._arrow_scale = None
+        # Optional decoded-image cache (src.image_cache), set by the main window
+        self.image_cache = None
 
         self.setRenderHint(QPainter.RenderHint.Antialiasing)
         self.setTransformationAnchor(self.ViewportAnchor.AnchorUnderMouse)
@@ -36,38 +92,184 @@ class ImageViewer(QGraphicsView):
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
     
+    def _install_scene(self, scene):
+        self.scene = scene
+        self.scene.selectionChanged.connect(self.scene_selection_changed)
+        self.setScene(self.scene)
+
+    def take_state(self):
+        """Detaches the current scene for caching and leaves an empty one in its place."""
+        self.clear_proposals(); self._gray = None
+        state = ViewerState(self.scene, self.image_item, self.skipped_text_item, self.component_rects, self.arrow_items,
+                            self.transform(), self.mapToScene(self.viewport().rect().center()), self.zoomed)
+        self.scene.selectionChanged.disconnect(self.scene_selection_changed)
+        self.image_item, self.skipped_text_item, self.component_rects, self.arrow_items = None, None, {}, []
+        self._install_scene(QGraphicsScene(self))
+        return state
+
+    def restore_state(self, state):
+        """Swaps a previously detached scene back in, including zoom and scroll position."""
+        old_scene = self.scene
+        self._install_scene(state.scene)
+        old_scene.selectionChanged.disconnect(self.scene_selection_changed)
+        self._discard_item(self.image_item)
+        old_scene.deleteLater()
+        self.image_item, self.skipped_text_item = state.image_item, state.skipped_text_item
+        self.component_rects, self.arrow_items = state.component_rects, state.arrow_items
+        self._gray = None
+        if state.zoomed:
+            self.zoomed = True
+            self.setTransform(state.transform)
+            self.centerOn(state.center)
+            self._sync_arrow_scale(force=True)
+        else:
+            self.fit_to_image() # The window may have been resized since
+
     # --- NO CHANGES to most methods ---
+    @timed("set_image")
     def set_image(self, image_path):
-        if self.image_item: self.scene.removeItem(self.image_item); self.image_item = None
-        pixmap = QPixmap(image_path)
-        if pixmap.isNull(): return
+        self.clear_proposals(); self._gray = None
+        self._discard_item(self.image_item); self.image_item = None
+        hit = self.image_cache.load(image_path) if self.image_cache else None
+        if hit: image, buffer = hit
+        else:
+            # Decode through QImageReader: QPixmap(path) would also keep a copy in QPixmapCache
+            image, buffer = QImageReader(image_path).read(), None
+            if self.image_cache and not image.isNull(): self.image_cache.store_later(image_path, image)
+        if image.isNull(): return
+        pixmap = QPixmap.fromImage(image)
+        del image
         self.image_item = QGraphicsPixmapItem(pixmap)
+        # A cached image's pixmap may use the mapped file directly; the item keeps the mapping alive
+        self.image_item.mapped_buffer = buffer
+        self.scene.addItem(self.image_item)
+        self.fit_to_image()
+
+    def show_preview(self, image_path, max_side=PREVIEW_MAX_SIDE):
+        """Shows a downscaled decode of the image without any annotations."""
+        self.clear_all_annotations(); self.clear_proposals(); self._gray = None
+        self._discard_item(self.image_item); self.image_item = None
+        reader = QImageReader(image_path)
+        full_size = reader.size()
+        if full_size.isValid() and max(full_size.width(), full_size.height()) > max_side:
+            reader.setScaledSize(full_size.scaled(max_side, max_side, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull(): return
+        self.image_item = QGraphicsPixmapItem(QPixmap.fromImage(image))
+        # Keep scene coordinates identical to the full-size image so the framing does not jump
+        if full_size.isValid() and image.width() > 0: self.image_item.setScale(full_size.width() / image.width())
         self.scene.addItem(self.image_item)
+        self.fit_to_image()
+
+    def fit_to_image(self):
+        """Shows the whole image and leaves zoomed mode."""
+        self.zoomed = False
+        if not self.image_item: return
         self.fitInView(self.image_item, Qt.AspectRatioMode.KeepAspectRatio)
+        self._sync_arrow_scale()
+
+    def zoom_by(self, factor, anchor=None):
+        """Zooms by `factor`, keeping the image point under `anchor` (viewport coordinates;
+        default: the mouse if it is over the view, else the center) in place."""
+        if not self.image_item: return
+        rect = self.image_item.sceneBoundingRect()
+        viewport = self.viewport().rect()
+        if rect.isEmpty() or viewport.isEmpty(): return
+        fit_scale = min(viewport.width() / rect.width(), viewport.height() / rect.height())
+        current = self.transform().m11()
+        target = min(max(current * factor, fit_scale * MIN_ZOOM_OF_FIT), max(MAX_ZOOM, fit_scale))
+        if math.isclose(target, current): return
+        if anchor is None:
+            cursor = self.viewport().mapFromGlobal(QCursor.pos())
+            anchor = cursor if viewport.contains(cursor) else viewport.center()
+        scene_anchor = self.mapToScene(anchor)
+        self.setTransformationAnchor(self.ViewportAnchor.NoAnchor)
+        self.scale(target / current, target / current)
+        drift = self.mapToScene(anchor) - scene_anchor
+        self.translate(drift.x(), drift.y())
+        self.setTransformationAnchor(self.ViewportAnchor.AnchorUnderMouse)
+        self.zoomed = True
+        self._sync_arrow_scale()
+
+    def _sync_arrow_scale(self, force=False):
+        """Keeps the arrows' bounding rects large enough for their on-screen decorations. Only
+        updated when the scale crosses a power of two, so zooming does not touch every arrow."""
+        scale = self.transform().m11()
+        bucket = 2.0 ** math.floor(math.log2(scale)) if scale > 0 else 1.0
+        if bucket == self._arrow_scale and not force: return
+        self._arrow_scale = bucket
+        for arrow in self.arrow_items + self.connection_ghosts: arrow.set_view_scale(bucket)
 
     def clear_all_annotations(self):
-        self._clear_items(ComponentRectItem)
-        self._clear_items(ArrowItem)
-        if self.skipped_text_item: self.scene.removeItem(self.skipped_text_item); self.skipped_text_item = None
+        self._clear_arrows()
+        for rect_item in self.component_rects.values(): self._discard_item(rect_item)
         self.component_rects.clear()
+        self._discard_item(self.skipped_text_item); self.skipped_text_item = None
 
     def show_skipped_overlay(self, reason):
         self.clear_all_annotations()
         if not self.image_item: return
-        font = QFont("Arial", 50, QFont.Weight.Bold)
-        self.skipped_text_item = QGraphicsTextItem(f"SKIPPED\nReason: {reason}")
-        self.skipped_text_item.setFont(font)
-        self.skipped_text_item.setDefaultTextColor(QColor(255, 0, 0, 150))
-        img_rect = self.image_item.boundingRect()
-        text_rect = self.skipped_text_item.boundingRect()
-        x = img_rect.center().x() - text_rect.width() / 2
-        y = img_rect.center().y() - text_rect.height() / 2
-        self.skipped_text_item.setPos(x, y)
+        self.skipped_text_item = skipped_text_item(reason, self.image_item.boundingRect())
         self.scene.addItem(self.skipped_text_item)
 
-    def _clear_items(self, item_type):
-        items_to_remove = [item for item in self.scene.items() if isinstance(item, item_type)]
-        for item in items_to_remove: self.scene.removeItem(item)
+    def gray_image(self):
+        """The current image as an (h, w) uint8 array, or None while only a preview is shown."""
+        if self._gray is None and self.image_item and self.image_item.scale() == 1:
+            from src.image_arrays import qimage_to_gray
+            self._gray = qimage_to_gray(self.image_item.pixmap().toImage())
+        return self._gray
+
+    def show_proposals(self, boxes):
+        """Replaces the ghost boxes with `boxes` given as [x1, y1, x2, y2]."""
+        self.clear_box_proposals()
+        for box in boxes:
+            ghost = GhostBoxItem(QRectF(box[0], box[1], box[2] - box[0], box[3] - box[1]))
+            self.scene.addItem(ghost)
+            self.ghost_items.append(ghost)
+
+    def show_connection_proposals(self, proposals):
+        """Replaces the ghost arrows with `proposals` (from propose_connections) between shown components."""
+        self.clear_connection_proposals()
+        for proposal in proposals:
+            if proposal["source"] not in self.component_rects or proposal["target"] not in self.component_rects: continue
+            ghost = GhostArrowItem(self.component_rects[proposal["source"]], self.component_rects[proposal["target"]], proposal)
+            ghost.set_view_scale(self._arrow_scale or 1.0)
+            self.scene.addItem(ghost)
+            self.connection_ghosts.append(ghost)
+
+    def clear_proposals(self):
+        self.clear_box_proposals(); self.clear_connection_proposals()
+
+    def clear_box_proposals(self):
+        for ghost in self.ghost_items: self._discard_item(ghost)
+        self.ghost_items = []
+
+    def clear_connection_proposals(self):
+        for ghost in self.connection_ghosts: self._discard_item(ghost)
+        self.connection_ghosts = []
+
+    def remove_proposal(self, ghost):
+        if ghost in self.ghost_items: self.ghost_items.remove(ghost); self._discard_item(ghost)
+        elif ghost in self.connection_ghosts: self.connection_ghosts.remove(ghost); self._discard_item(ghost)
+
+    def proposal_at(self, view_pos):
+        """The ghost arrow under `view_pos`, else the smallest ghost box there, or None."""
+        items = self.items(view_pos)
+        arrows = [item for item in items if isinstance(item, GhostArrowItem)]
+        if arrows: return arrows[0]
+        ghosts = [item for item in items if isinstance(item, GhostBoxItem)]
+        return min(ghosts, key=lambda item: item.rect().width() * item.rect().height()) if ghosts else None
+
+    def _clear_arrows(self):
+        for arrow in self.arrow_items: self._discard_item(arrow)
+        self.arrow_items = []
+
+    def _discard_item(self, item):
+        """Removes `item` from its scene and drops what it holds, so nothing outlives the scene."""
+        if item is None: return
+        if item.scene() is not None: item.scene().removeItem(item)
+        if isinstance(item, QGraphicsPixmapItem): item.setPixmap(QPixmap())
+        elif isinstance(item, ArrowItem): item.start_item = item.end_item = None
 
     def set_mode(self, mode, force=False):
         self.current_mode = mode
@@ -78,6 +280,7 @@ class ImageViewer(QGraphicsView):
         else:
             self.setDragMode(self.DragMode.ScrollHandDrag); self.viewport().setCursor(Qt.CursorShape.ArrowCursor)
 
+    @timed("redraw_component_rects")
     def redraw_component_rects(self, data_model):
         self.clear_all_annotations()
         if not data_model: return
@@ -92,87 +295,17 @@ class ImageViewer(QGraphicsView):
     # ##################################################################
     # #         --- MODIFICATION: Complete Rewrite of Drawing Logic ---#
     # ##################################################################
+    @timed("redraw_connections")
     def redraw_connections(self, data_model, show_all, selected_name):
-        self._clear_items(ArrowItem)
+        self._clear_arrows()
         if not data_model or not self.component_rects: return
-        
-        color_output = QColor("#e06c75")
-        color_input = QColor("#98c379")
-        color_inout = QColor("#61afef")
-        
-        # Step 1: Build a simplified map of connections from output and inout fields
-        all_connections = defaultdict(lambda: {'type': 'none', 'count': 0})
+        for arrow in build_arrows(self.component_rects, data_model.components, show_all, selected_name):
+            arrow.set_view_scale(self._arrow_scale or 1.0)
+            self.scene.addItem(arrow)
+            self.arrow_items.append(arrow)
+        if PROFILER.enabled: PROFILER.count("scene_items", {"rects": len(self.component_rects), "arrows": len(self.arrow_items)})
+
 
-        for source_name, details in data_model.components.items():
-            connections = details.get("connections", {})
-            
-            # Process outputs (unidirectional)
-            for conn in connections.get("output", []):
-                target_name = conn['name']
-                pair = (source_name, target_name)
-                all_connections[pair]['type'] = 'output'
-                all_connections[pair]['count'] = conn.get('count', 1)
-
-            # Process inouts (bidirectional)
-            for conn in connections.get("inout", []):
-                target_name = conn['name']
-                # Use a sorted tuple to represent the undirected pair
-                pair = tuple(sorted((source_name, target_name)))
-                all_connections[pair]['type'] = 'inout'
-                all_connections[pair]['count'] = max(
-                    all_connections[pair]['count'], conn.get('count', 1)
-                )
-
-        # Step 2: Iterate through the unified map and draw
-        for pair, info in all_connections.items():
-            conn_type = info['type']
-            if conn_type == 'none': continue
-
-            source, target = pair[0], pair[1]
-            
-            if source not in self.component_rects or target not in self.component_rects:
-                continue
-
-            # 1. Determine if the arrow should be drawn based on the view mode.
-            draw_this_arrow = False
-            if show_all:
-                draw_this_arrow = True
-            elif selected_name and (source == selected_name or target == selected_name):
-                draw_this_arrow = True
-
-            # 2. If it should be drawn, determine its color and properties.
-            if draw_this_arrow:
-                is_bidirectional = (conn_type == 'inout')
-                
-                final_color = QColor()
-                # In "selected only" mode, color depends on direction relative to selection
-                if not show_all and selected_name:
-                    if is_bidirectional:
-                        final_color = color_inout
-                    else: # It's an 'output' type
-                        final_color = color_output if source == selected_name else color_input
-                # In "show all" mode, or if no selection, use default colors
-                else:
-                    final_color = color_inout if is_bidirectional else color_output
-
-                # 3. Draw the arrow(s)
-                start_item = self.component_rects[source]
-                end_item = self.component_rects[target]
-                count = info['count']
-
-                line_width = 5 if not show_all else 3 # Thicker lines when focused
-                line_vec = end_item.sceneBoundingRect().center() - start_item.sceneBoundingRect().center()
-                if line_vec.isNull(): continue
-                perp_vec = QPointF(line_vec.y(), -line_vec.x())
-                norm_perp = perp_vec / math.sqrt(QPointF.dotProduct(perp_vec, perp_vec)) if not perp_vec.isNull() else QPointF()
-                
-                for i in range(count):
-                    offset = norm_perp * ((i - (count - 1) / 2.0) * 15.0)
-                    arrow = ArrowItem(start_item, end_item, final_color, source, target, is_bidirectional, offset=offset, line_width=line_width)
-                    self.scene.addItem(arrow)
-
-
-    # --- NO CHANGES to mouse events or resizeEvent ---
     def mousePressEvent(self, event):
         if self.skipped_text_item and self.skipped_text_item.isVisible(): super().mousePressEvent(event); return
         if 'drawing_box' in self.current_mode and event.button() == Qt.MouseButton.LeftButton:
@@ -197,11 +330,18 @@ class ImageViewer(QGraphicsView):
     def mouseReleaseEvent(self, event):
         if 'drawing_box' in self.current_mode and self.start_pos and self.temp_rect:
             rect = self.temp_rect.rect()
-            if self.temp_rect.scene(): self.scene.removeItem(self.temp_rect)
+            self._discard_item(self.temp_rect)
             if rect.width() > 5 and rect.height() > 5: self.box_drawn.emit(rect)
             self.temp_rect, self.start_pos = None, None
         else: super().mouseReleaseEvent(event)
             
+    def wheelEvent(self, event):
+        delta = event.angleDelta().y()
+        if not delta or not self.image_item: super().wheelEvent(event); return
+        # Fractional steps keep high-resolution touchpads smooth
+        self.zoom_by(ZOOM_STEP ** (delta / 120), event.position().toPoint()); event.accept()
+
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        if self.image_item: self.fitInView(self.image_item, Qt.AspectRatioMode.KeepAspectRatio)
\ No newline at end of file
+        # A zoomed view keeps its zoom; otherwise the image is refitted
+        if self.image_item and not self.zoomed: self.fit_to_image()
\ No newline at end of file
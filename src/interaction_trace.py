@@ -0,0 +1,48 @@
+# src/interaction_trace.py
+"""Recording of the semantic actions MainWindow handles, one JSON object per line.
+
+A trace starts with a header line followed by events such as
+``{"t": 1.234, "action": "connect_click", "args": {"name": "Amp"}}`` where ``t`` is
+seconds since recording started. See benchmarks/replay_trace.py for the replayer.
+"""
+import json
+import os
+import time
+
+TRACE_ENV_VAR = "SBA_RECORD_TRACE"
+TRACE_VERSION = 1
+
+
+class InteractionRecorder:
+    def __init__(self, path):
+        self.path = path
+        self._start = time.perf_counter()
+        self._file = open(path, 'w', encoding='utf-8')
+        self._write({"type": "header", "version": TRACE_VERSION, "started": time.time(), "pid": os.getpid()})
+
+    def record(self, action, **args):
+        if self._file is None: return
+        self._write({"t": round(time.perf_counter() - self._start, 4), "action": action, "args": args})
+
+    def _write(self, obj):
+        self._file.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        # Flush every line so a crash still leaves a usable trace
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_trace(path):
+    """Returns (header, events) from a trace file."""
+    header, events = {}, []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line: continue
+            obj = json.loads(line)
+            if obj.get("type") == "header": header = obj
+            else: events.append(obj)
+    return header, events
@@ -1,17 +1,41 @@
 # src/main_window.py
 import os
-from PyQt6.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QMessageBox, QSplitter
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QAction, QKeyEvent
+import re
+from PyQt6.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QMessageBox, QSplitter, QApplication, QInputDialog
+from PyQt6.QtCore import Qt, QTimer, QRectF
+from PyQt6.QtGui import QAction, QKeyEvent, QCursor
 
-from src.data_model import AnnotationData
-from src.image_viewer import ImageViewer
+from src.data_model import AnnotationData, ConcurrentModificationError
+from src.image_viewer import ImageViewer, ZOOM_STEP
 from src.widgets.left_panel import LeftPanel
-from src.widgets.right_panel import RightPanel
-from src.dialogs import ComponentNameDialog
+from src.widgets.right_panel import RightPanel, scan_file_entries
+from src.folder_watcher import FolderWatcher, IMAGE_EXTENSIONS
+from src.dialogs import ComponentNameDialog, BulkRenameDialog
 from src.stylesheet import STYLE_SHEET
-from src.drawing_items import ArrowItem
-from src.widgets.base_items import ComponentRectItem
+from src.drawing_items import ArrowItem, GhostArrowItem
+from src.widgets.base_items import ComponentRectItem, GhostBoxItem
+from src.scene_cache import SceneCache, SceneState, json_file_signature
+from src.image_cache import cache_from_env, WARM_AHEAD, WARM_BEHIND
+from src.ui_scheduler import UpdateScheduler, Dirty
+from src.profiling import PROFILER, timed
+
+# How long navigation must be idle before the image under the cursor is fully loaded
+NAV_SETTLE_MS = 150
+# How far (in screen pixels) a drawn edge may move when snapping it to a border
+SNAP_TOLERANCE_PX = 12
+# How often the background folder rescan after a session restore is checked for completion
+RECONCILE_POLL_MS = 100
+# How often the background connection detection is checked for completion
+CONNECTION_POLL_MS = 50
+# How often the box proposal work (current image, folder precompute) is checked for completion
+PROPOSAL_POLL_MS = 100
+# How often a dataset-wide job run behind a progress dialog is checked
+PROGRESS_POLL_MS = 50
+
+def _cancel_scanned(scan):
+    """Done-callback of a superseded folder scan: cancels the chunks it queued."""
+    if not scan.cancelled() and not scan.exception():
+        for future in scan.result(): future.cancel()
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -21,19 +45,80 @@ class MainWindow(QMainWindow):
         self.image_folder, self.json_folder = None, None
         self.current_image_path = None
         self.data_model = AnnotationData()
+        # Fully built scenes of recently visited images, so going back is a scene swap
+        self.scene_cache = SceneCache()
+        # Decoded images on local disk, for image folders on slow shares (off unless SBA_IMAGE_CACHE is set)
+        self.image_cache = cache_from_env()
+        # Handlers only mark parts dirty; the redraw itself runs once per event-loop iteration
+        self.ui_updates = UpdateScheduler(self._flush_ui_updates, self)
+        # Optional InteractionRecorder capturing the semantic actions handled below
+        self.recorder = None
+        # Optional MemoryDiagnostics sampled every N navigations
+        self.memory_diagnostics = None
         self.current_mode = 'idle'
         self.selected_component = None
         self.connection_start_node = None
         self.show_all_connections = True 
-        
+        # Box proposals: a process pool precomputes them for the folder (listed in a thread), the current
+        # image's are computed in a thread from the viewer's grayscale copy and shown as ghosts
+        self.proposals_enabled = False
+        self._proposal_executor = None
+        self._proposal_threads = None
+        self._proposal_scan = None
+        self._proposal_futures = []
+        self._current_proposal_future = None
+        self._current_proposals = None
+        self._proposal_timer = QTimer(self)
+        self._proposal_timer.setInterval(PROPOSAL_POLL_MS)
+        self._proposal_timer.timeout.connect(self._poll_proposals)
+        # Connection proposals: detected in a thread for the current boxes (keyed by image and boxes),
+        # shown as ghost arrows; the ones rejected with Delete stay hidden for this image
+        self.connection_proposals_enabled = False
+        self._connection_executor = None
+        self._connection_future = None
+        self._connection_key = None
+        self._connection_proposals = None
+        self._connection_rejected = set()
+        self._connection_timer = QTimer(self)
+        self._connection_timer.setInterval(CONNECTION_POLL_MS)
+        self._connection_timer.timeout.connect(self._poll_connection_proposals)
+        # Dataset query the file list is currently filtered by ('' shows every image)
+        self.file_query = ''
+        # Lease-based claims in the shared JSON folder (opt-in, see src.claims), renewed by a heartbeat
+        self.claims = None
+        self._claim_timer = QTimer(self)
+        self._claim_timer.timeout.connect(self._renew_claims)
+        # Session file (set by main.py) restored at start-up and saved on close; after a restore
+        # the file list comes from its snapshot and the folders are rescanned in a thread
+        self.session_path = None
+        self._reconcile_executor = None
+        self._reconcile_future = None
+        self._reconcile_timer = QTimer(self)
+        self._reconcile_timer.setInterval(RECONCILE_POLL_MS)
+        self._reconcile_timer.timeout.connect(self._poll_reconcile)
+        # Reports files added to, removed from or rewritten in the open folders
+        self.folder_watcher = FolderWatcher(self)
+        self.folder_watcher.images_changed.connect(self._on_images_changed)
+        self.folder_watcher.annotations_changed.connect(self._on_annotations_changed)
+        self._reload_prompt_open = False
+        # Row the file-list cursor moved to while A/D auto-repeats; loaded once the keys settle
+        self._pending_nav_row = None
+        self._nav_timer = QTimer(self)
+        self._nav_timer.setSingleShot(True)
+        self._nav_timer.setInterval(NAV_SETTLE_MS)
+        self._nav_timer.timeout.connect(self._commit_pending_navigation)
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.main_layout = QHBoxLayout(self.central_widget)
         self.statusBar().showMessage("Ready")
+        if PROFILER.enabled:
+            from src.widgets.profiler_overlay import ProfilerOverlay
+            self.statusBar().addPermanentWidget(ProfilerOverlay(extra_text=self.ui_updates.summary))
         self.splitter = QSplitter(Qt.Orientation.Horizontal)
         self.left_panel = LeftPanel()
         self.image_viewer = ImageViewer()
+        self.image_viewer.image_cache = self.image_cache
         self.right_panel = RightPanel()
         self.splitter.addWidget(self.left_panel)
         self.splitter.addWidget(self.image_viewer)
@@ -42,30 +127,60 @@ class MainWindow(QMainWindow):
         self.main_layout.addWidget(self.splitter)
         self.setStyleSheet(STYLE_SHEET)
         self._connect_signals()
-        self.update_button_states()
+        self.ui_updates.invalidate(Dirty.BUTTONS)
         self.left_panel.toggle_skip_panel(False)
     
     # --- NO CHANGES to keyPressEvent, _connect_signals, _cancel_operation ---
     def keyPressEvent(self, event: QKeyEvent) -> None:
         key = event.key()
-        if key == Qt.Key.Key_Escape: self._cancel_operation(); event.accept(); return
+        if key == Qt.Key.Key_Escape: self._record('cancel'); self._cancel_operation(); event.accept(); return
         if key in (Qt.Key.Key_Delete, Qt.Key.Key_Backspace): self.handle_deletion(); event.accept(); return
+        # Zoom works in every mode
+        if key in (Qt.Key.Key_Plus, Qt.Key.Key_Equal): self.image_viewer.zoom_by(ZOOM_STEP); event.accept(); return
+        if key == Qt.Key.Key_Minus: self.image_viewer.zoom_by(1 / ZOOM_STEP); event.accept(); return
+        if key == Qt.Key.Key_0: self.image_viewer.fit_to_image(); event.accept(); return
         if self.current_mode == 'idle':
             if key == Qt.Key.Key_W and self.left_panel.btn_draw_box.isEnabled(): self.left_panel.btn_draw_box.click()
             elif key == Qt.Key.Key_O and self.left_panel.btn_connect_uni.isEnabled(): self.left_panel.btn_connect_uni.click()
             elif key == Qt.Key.Key_N and self.left_panel.btn_connect_bi.isEnabled(): self.left_panel.btn_connect_bi.click()
-            elif key == Qt.Key.Key_A and self.left_panel.btn_prev.isEnabled(): self.go_to_prev_image()
-            elif key == Qt.Key.Key_D and self.left_panel.btn_next.isEnabled(): self.go_to_next_image()
+            elif key == Qt.Key.Key_A and self.left_panel.btn_prev.isEnabled(): self._navigate_by(-1, coalesce=event.isAutoRepeat())
+            elif key == Qt.Key.Key_D and self.left_panel.btn_next.isEnabled(): self._navigate_by(1, coalesce=event.isAutoRepeat())
             elif key == Qt.Key.Key_V and self.left_panel.btn_toggle_connections.isEnabled(): self.on_toggle_connections_view()
-            elif key == Qt.Key.Key_Tab and not self.show_all_connections: self.cycle_component_selection(forward=True)
-            elif key == Qt.Key.Key_Backtab and not self.show_all_connections: self.cycle_component_selection(forward=False)
+            elif key == Qt.Key.Key_P and self.left_panel.btn_proposals.isEnabled(): self.left_panel.btn_proposals.toggle()
+            elif key == Qt.Key.Key_C and self.left_panel.btn_connection_proposals.isEnabled(): self.left_panel.btn_connection_proposals.toggle()
+            elif key in (Qt.Key.Key_Return, Qt.Key.Key_Enter) and self.image_viewer.connection_ghosts and event.modifiers() & Qt.KeyboardModifier.ShiftModifier: self.accept_all_connection_proposals()
+            elif key in (Qt.Key.Key_Return, Qt.Key.Key_Enter) and (self.image_viewer.ghost_items or self.image_viewer.connection_ghosts): self.accept_proposal()
+            elif key == Qt.Key.Key_Tab and not self.show_all_connections: self._record('cycle', forward=True); self.cycle_component_selection(forward=True)
+            elif key == Qt.Key.Key_Backtab and not self.show_all_connections: self._record('cycle', forward=False); self.cycle_component_selection(forward=False)
             else: super().keyPressEvent(event); return
             event.accept()
         else: super().keyPressEvent(event)
 
+    def keyReleaseEvent(self, event: QKeyEvent) -> None:
+        # The final (non auto-repeat) release ends a burst of navigation: load right away
+        if event.key() in (Qt.Key.Key_A, Qt.Key.Key_D) and not event.isAutoRepeat() and self._pending_nav_row is not None:
+            self._commit_pending_navigation(); event.accept(); return
+        super().keyReleaseEvent(event)
+
     def _connect_signals(self):
-        self.left_panel.mode_changed.connect(self.set_mode); self.left_panel.load_images_requested.connect(self.load_image_folder); self.left_panel.load_jsons_requested.connect(self.load_json_folder); self.left_panel.save_requested.connect(self.save_current_annotations); self.left_panel.prev_image_requested.connect(self.go_to_prev_image); self.left_panel.next_image_requested.connect(self.go_to_next_image); self.left_panel.skip_image_requested.connect(self.on_skip_image); self.left_panel.toggle_connections_view_requested.connect(self.on_toggle_connections_view); self.right_panel.file_selected.connect(self.on_file_selected); self.right_panel.component_selected.connect(self.on_component_selected_from_list); self.right_panel.component_delete_requested.connect(self.handle_component_deletion); self.right_panel.component_name_changed.connect(self.on_component_name_changed); self.right_panel.component_connections_changed.connect(self.on_component_connections_changed); self.image_viewer.box_drawn.connect(self.on_box_drawn); self.image_viewer.connect_mode_clicked.connect(self.handle_connect_mode_click); self.image_viewer.scene_selection_changed.connect(self._handle_scene_selection_change); self.image_viewer.idle_mode_clicked.connect(self.handle_idle_mode_click)
+        self.left_panel.mode_changed.connect(self._on_mode_requested); self.left_panel.load_images_requested.connect(self.load_image_folder); self.left_panel.load_jsons_requested.connect(self.load_json_folder); self.left_panel.save_requested.connect(self._on_save_requested); self.left_panel.prev_image_requested.connect(self.go_to_prev_image); self.left_panel.next_image_requested.connect(self.go_to_next_image); self.left_panel.skip_image_requested.connect(self.on_skip_image); self.left_panel.toggle_connections_view_requested.connect(self.on_toggle_connections_view); self.left_panel.proposals_toggled.connect(self.on_proposals_toggled); self.left_panel.connection_proposals_toggled.connect(self.on_connection_proposals_toggled); self.left_panel.bulk_rename_requested.connect(self.open_bulk_rename); self.left_panel.query_requested.connect(self.open_dataset_query); self.left_panel.duplicates_requested.connect(self.find_duplicates); self.right_panel.copy_annotations_requested.connect(self.copy_annotations_to_duplicate); self.right_panel.skip_duplicate_requested.connect(self.skip_duplicate); self.right_panel.file_selected.connect(self._on_file_clicked); self.right_panel.component_selected.connect(self._on_list_component_clicked); self.right_panel.component_delete_requested.connect(self.handle_component_deletion); self.right_panel.component_name_changed.connect(self.on_component_name_changed); self.right_panel.component_connections_changed.connect(self.on_component_connections_changed); self.image_viewer.box_drawn.connect(self.on_box_drawn); self.image_viewer.connect_mode_clicked.connect(self.handle_connect_mode_click); self.image_viewer.scene_selection_changed.connect(self._handle_scene_selection_change); self.image_viewer.idle_mode_clicked.connect(self.handle_idle_mode_click)
     
+    def _record(self, action, **args):
+        if self.recorder: self.recorder.record(action, **args)
+
+    def _on_mode_requested(self, mode):
+        self._record('set_mode', mode=mode); self.set_mode(mode)
+
+    def _on_save_requested(self):
+        self._record('save'); self.save_current_annotations(force=True)
+
+    def _on_file_clicked(self, item):
+        if item: self._record('select_file', file=item.text())
+        self.on_file_selected(item)
+
+    def _on_list_component_clicked(self, name):
+        self._record('select_component', name=name); self.on_component_selected_from_list(name)
+
     def _cancel_operation(self):
         if self.connection_start_node: self.image_viewer.scene.clearSelection(); self.connection_start_node = None
         if self.current_mode != 'idle': self.set_mode('idle', force=True); self.statusBar().showMessage("Operation Canceled", 2000)
@@ -74,68 +189,133 @@ class MainWindow(QMainWindow):
     def handle_deletion(self):
         selected_items = self.image_viewer.scene.selectedItems()
         if not selected_items: return
-        comp_to_delete, did_delete_arrow = None, False
+        comp_to_delete = None
         for item in selected_items:
+            if isinstance(item, GhostBoxItem): self.image_viewer.remove_proposal(item); continue
+            if isinstance(item, GhostArrowItem): self._connection_rejected.add(self._proposal_key(item.proposal)); self.image_viewer.remove_proposal(item); continue
             if isinstance(item, ComponentRectItem) and item.data(0): comp_to_delete = item.data(0); break 
             elif isinstance(item, ArrowItem):
-                self.data_model.remove_connection(item.source_name, item.target_name, item.conn_type)
-                did_delete_arrow = True
+                self.delete_connection(item.source_name, item.target_name, item.conn_type)
         if comp_to_delete: self.handle_component_deletion(comp_to_delete)
-        elif did_delete_arrow: self._update_all_views() # This will call health check
+
+    def delete_connection(self, source, target, conn_type):
+        self._record('delete_arrow', source=source, target=target, conn_type=conn_type)
+        self.data_model.remove_connection(source, target, conn_type)
+        self.ui_updates.invalidate(Dirty.ARROWS | Dirty.DETAILS)
 
     # --- MODIFICATION: Call _update_connection_health after any change ---
     def handle_component_deletion(self, name):
         reply = QMessageBox.question(self, 'Confirm Deletion', f"Delete component '{name}'?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
-        if reply == QMessageBox.StandardButton.Yes:
-            self.image_viewer.scene.blockSignals(True)
-            self.data_model.remove_component(name)
-            self._update_all_views() # This will call health check
-            self.image_viewer.scene.blockSignals(False)
+        if reply == QMessageBox.StandardButton.Yes: self.delete_component(name)
+
+    def delete_component(self, name):
+        self._record('delete_component', name=name)
+        self.data_model.remove_component(name)
+        self._update_all_views()
+        if self.proposals_enabled: self._show_current_proposals()
             
+    @timed("navigate")
     def on_file_selected(self, item):
         if not item or not self.image_folder: return
-        if self.current_image_path: self.save_current_annotations()
+        self._nav_timer.stop(); self._pending_nav_row = None
         self._cancel_operation()
         new_path = os.path.join(self.image_folder, item.text())
         if new_path == self.current_image_path: return
+        self._stash_current_image()
         self.image_viewer.scene.blockSignals(True)
         self.current_image_path = new_path
-        self.selected_component = None
         self.right_panel.file_list_widget.setCurrentItem(item)
-        self.image_viewer.set_image(new_path)
-        self._load_annotations_for_current_image()
-        self._update_all_views() # This will call health check
+        self._claim_current_image()
+        self.folder_watcher.watch_file(self._json_path_for(new_path))
+        state = self.scene_cache.take(new_path, self._json_path_for(new_path))
+        if state:
+            self._restore_cached_image(state)
+        else:
+            self.selected_component = None
+            self.image_viewer.set_image(new_path)
+            self._load_annotations_for_current_image()
+            self._update_all_views()
         self.image_viewer.scene.blockSignals(False)
         self._handle_scene_selection_change()
-        
+        self._reset_current_proposals(); self._connection_rejected = set()
+        if self.proposals_enabled: self._show_current_proposals()
+        if self.connection_proposals_enabled: self._show_connection_proposals()
+        # Build the grayscale copy once the image is on screen, so the first snap is fast too
+        if self.left_panel.btn_snap.isChecked(): QTimer.singleShot(0, self.image_viewer.gray_image)
+        if self.image_cache: self._warm_image_cache()
+        if self.memory_diagnostics: self.memory_diagnostics.on_navigation(self)
+
+    def _warm_image_cache(self):
+        """Has the images next to the current one decoded into the image cache in the background."""
+        row, count = self.right_panel.get_current_file_index(), self.right_panel.get_file_count()
+        rows = [r for r in list(range(row + 1, row + 1 + WARM_AHEAD)) + list(range(row - WARM_BEHIND, row)) if 0 <= r < count]
+        self.image_cache.warm([os.path.join(self.image_folder, self.right_panel.file_list_widget.item(r).text()) for r in rows])
+
+    def _stash_current_image(self):
+        """Saves the current image and moves its built scene into the cache."""
+        if not self.current_image_path: return
+        self.save_current_annotations()
+        if self.claims: self.claims.release(self.current_image_path)
+        json_path = self._json_path_for(self.current_image_path)
+        state = SceneState(self.image_viewer.take_state(), self.data_model, self.selected_component,
+                           self.show_all_connections, json_file_signature(json_path))
+        self.scene_cache.put(self.current_image_path, state)
+        self.current_image_path = None
+        self.data_model = AnnotationData()
+        self.selected_component = None
+
+    def _restore_cached_image(self, state):
+        self.image_viewer.restore_state(state.viewer_state)
+        self.image_viewer.scene.blockSignals(True)
+        self.data_model, self.selected_component = state.data_model, state.selected_component
+        # The scene is already built; only the panels (and arrows if the view mode changed) need work
+        parts = Dirty.COMP_LIST | Dirty.DETAILS | Dirty.BUTTONS
+        if state.show_all_connections != self.show_all_connections: parts |= Dirty.ARROWS
+        self.ui_updates.invalidate(parts)
+
+    def _json_path_for(self, image_path):
+        if not self.json_folder or not image_path: return None
+        base_name = os.path.splitext(os.path.basename(image_path))[0]
+        return os.path.join(self.json_folder, f"{base_name}.json")
+
     def _load_annotations_for_current_image(self):
         self.data_model.clear()
-        if not self.json_folder or not self.current_image_path: return
-        base_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
-        json_path = os.path.join(self.json_folder, f"{base_name}.json")
+        json_path = self._json_path_for(self.current_image_path)
+        if not json_path: return
         self.data_model.load_from_json(json_path)
     
 
-    # --- MODIFICATION: Call health check before updating views ---
     def _update_all_views(self):
-        
+        self.ui_updates.invalidate(Dirty.ALL)
+
+    def _update_ui_for_selection_change(self):
+        self.ui_updates.invalidate(Dirty.DETAILS | Dirty.ARROWS)
+
+    @timed("ui_flush")
+    def _flush_ui_updates(self, parts):
+        """Does the minimal redraw for the parts marked dirty since the last flush."""
         if self.data_model.skipped_reason:
-            self.image_viewer.show_skipped_overlay(self.data_model.skipped_reason)
-            self.right_panel.update_component_list([])
-            self.right_panel.update_details(None, None)
+            if parts & Dirty.RECTS: self.image_viewer.show_skipped_overlay(self.data_model.skipped_reason)
+            if parts & Dirty.COMP_LIST: self.right_panel.update_component_list([])
+            if parts & Dirty.DETAILS: self.right_panel.update_details(None, None)
         else:
-            self.image_viewer.redraw_component_rects(self.data_model)
-            self.right_panel.update_component_list(self.data_model.components.keys())
             if self.selected_component and self.selected_component not in self.data_model.components:
-                 self.selected_component = None
-            
-            self.image_viewer.scene.blockSignals(True)
-            if self.selected_component and self.selected_component in self.image_viewer.component_rects:
-                self.image_viewer.component_rects[self.selected_component].setSelected(True)
-            self.image_viewer.scene.blockSignals(False)
-
-            self._update_ui_for_selection_change()
-        self.update_button_states()
+                self.selected_component = None
+            if parts & Dirty.RECTS:
+                self.image_viewer.scene.blockSignals(True)
+                self.image_viewer.redraw_component_rects(self.data_model)
+                if self.selected_component and self.selected_component in self.image_viewer.component_rects:
+                    self.image_viewer.component_rects[self.selected_component].setSelected(True)
+                self.image_viewer.scene.blockSignals(False)
+            if parts & Dirty.COMP_LIST:
+                self.right_panel.update_component_list(self.data_model.components.keys())
+            if parts & (Dirty.COMP_LIST | Dirty.DETAILS):
+                self._sync_selection_details()
+            # Rebuilding the rects also removed the arrows attached to them
+            if parts & (Dirty.RECTS | Dirty.ARROWS):
+                self.image_viewer.redraw_connections(self.data_model, self.show_all_connections, self.selected_component)
+                if self.connection_proposals_enabled: self._show_connection_proposals()
+        if parts & Dirty.BUTTONS: self.update_button_states()
 
     def set_mode(self, mode, force=False):
         if not force and self.current_mode != 'idle': self._cancel_operation()
@@ -145,9 +325,10 @@ class MainWindow(QMainWindow):
         elif self.current_mode == 'drawing_box':
              self.statusBar().showMessage(f"DRAW MODE: Draw a box for a new component. (Press Esc to cancel)")
         elif self.current_mode == 'idle': self.statusBar().showMessage("Ready")
-        self.image_viewer.set_mode(self.current_mode, force=force); self.update_button_states()
+        self.image_viewer.set_mode(self.current_mode, force=force); self.ui_updates.invalidate(Dirty.BUTTONS)
         
     def handle_connect_mode_click(self, component_name):
+        self._record('connect_click', name=component_name)
         if '_source' in self.current_mode:
             if not component_name: self._cancel_operation(); return
             self.connection_start_node = component_name
@@ -163,14 +344,15 @@ class MainWindow(QMainWindow):
     def create_connection(self, source, target):
         conn_type = 'output' if 'unidirectional' in self.current_mode else 'inout'
         self.data_model.add_connection(source, target, conn_type)
-        self._update_all_views() # This will call health check
+        self.ui_updates.invalidate(Dirty.ARROWS | Dirty.DETAILS)
 
     def handle_idle_mode_click(self, clicked_items):
         self.image_viewer.scene.clearSelection()
         component_items = [item for item in clicked_items if isinstance(item, ComponentRectItem)]
-        if not component_items: return
+        if not component_items: self._record('idle_click', name=None); return
         component_items.sort(key=lambda item: item.rect().width() * item.rect().height())
         item_to_select = component_items[0]
+        self._record('idle_click', name=item_to_select.data(0))
         item_to_select.setSelected(True)
 
     # --- FIX: Replace this entire method ---
@@ -199,96 +381,528 @@ class MainWindow(QMainWindow):
 
     # --- MODIFICATION: Call redraw with problem connections ---
     def on_toggle_connections_view(self):
+        self._record('toggle_view')
         self.show_all_connections = not self.show_all_connections
         if not self.show_all_connections and not self.selected_component and self.data_model.components: self.cycle_component_selection(forward=True)
-        else:
-            # --- MODIFICATION: Remove the last argument ---
-            self.image_viewer.redraw_connections(self.data_model, self.show_all_connections, self.selected_component)
-        self.update_button_states()
+        else: self.ui_updates.invalidate(Dirty.ARROWS)
+        self.ui_updates.invalidate(Dirty.BUTTONS)
     
     def on_skip_image(self, reason: str):
         if not reason or not self.current_image_path: QMessageBox.warning(self, "Warning", "Cannot skip. No image is currently loaded."); return
-        self.data_model.clear(); self.data_model.skipped_reason = reason
+        self._record('skip_image', reason=reason)
+        self.data_model.mark_skipped(reason)
+        self.image_viewer.clear_proposals()
         self.save_current_annotations()
         current_index = self.right_panel.get_current_file_index()
-        self.right_panel.mark_file_as_skipped(current_index); self.image_viewer.show_skipped_overlay(reason)
+        self.right_panel.mark_file_as_skipped(current_index); self._update_all_views()
         self.statusBar().showMessage(f"Image skipped. Reason: {reason}", 3000)
 
     def cycle_component_selection(self, forward=True):
-        list_widget = self.right_panel.comp_list_widget; comp_names = [list_widget.item(i).text() for i in range(list_widget.count())]
-        if not comp_names: return
-        try: current_idx = comp_names.index(self.selected_component); new_idx = (current_idx + (1 if forward else -1)) % len(comp_names)
-        except ValueError: new_idx = 0 if forward else -1
-        self.on_component_selected_from_list(comp_names[new_idx])
+        name = self.right_panel.adjacent_component(self.selected_component, forward)
+        if name: self.on_component_selected_from_list(name)
 
     def go_to_prev_image(self):
         if not self.left_panel.btn_prev.isEnabled(): return
-        idx = self.right_panel.get_current_file_index()
-        if idx > 0: self.on_file_selected(self.right_panel.file_list_widget.item(idx - 1))
+        self._navigate_by(-1)
 
     def go_to_next_image(self):
         if not self.left_panel.btn_next.isEnabled(): return
-        idx, count = self.right_panel.get_current_file_index(), self.right_panel.get_file_count()
-        if idx < count - 1: self.on_file_selected(self.right_panel.file_list_widget.item(idx + 1))
-        else: self.statusBar().showMessage("This is the last image.", 3000)
+        self._navigate_by(1)
+
+    def _navigate_by(self, step, coalesce=False):
+        """Moves `step` images. With `coalesce` only the cursor moves and a preview is shown;
+        the full load runs once navigation has been idle for NAV_SETTLE_MS."""
+        self._record('navigate', step=step, coalesce=coalesce)
+        idx = self._pending_nav_row if self._pending_nav_row is not None else self.right_panel.get_current_file_index()
+        target, count = idx + step, self.right_panel.get_file_count()
+        # Images other annotators are working on are stepped over
+        skipped_claimed = 0
+        while self.claims and 0 <= target < count and self._claimed_by_other(target): target += step; skipped_claimed += 1
+        if not 0 <= target < count:
+            if skipped_claimed: self.statusBar().showMessage("All remaining images in this direction are claimed by others.", 3000)
+            elif step > 0: self.statusBar().showMessage("This is the last image.", 3000)
+            return
+        if not coalesce and self._pending_nav_row is None:
+            self.on_file_selected(self.right_panel.file_list_widget.item(target)); return
+        if self._pending_nav_row is None:
+            # Leaving a fully loaded image: persist and cache it once, then drop it from the view
+            self._cancel_operation()
+            self._stash_current_image()
+            self.ui_updates.invalidate(Dirty.COMP_LIST | Dirty.DETAILS)
+        self._pending_nav_row = target
+        self.right_panel.set_current_file_item(target)
+        file_name = self.right_panel.file_list_widget.item(target).text()
+        self.image_viewer.scene.blockSignals(True)
+        self.image_viewer.show_preview(os.path.join(self.image_folder, file_name))
+        self.image_viewer.scene.blockSignals(False)
+        self.statusBar().showMessage(f"[{target + 1}/{count}] {file_name}")
+        self.ui_updates.invalidate(Dirty.BUTTONS)
+        self._nav_timer.start()
+
+    def _commit_pending_navigation(self):
+        row = self._pending_nav_row
+        if row is None: return
+        self._record('commit_navigation')
+        self.on_file_selected(self.right_panel.file_list_widget.item(row))
+        self.statusBar().showMessage("Ready")
 
     def load_image_folder(self, folder_path):
-        self.image_folder = folder_path; files = [f for f in os.listdir(folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+        self._record('load_image_folder', path=folder_path)
+        self.scene_cache.clear()
+        self._reconcile_future = None; self._reconcile_timer.stop()
+        self.image_folder = folder_path; files = self._image_files()
+        self.right_panel.duplicate_of = {}; self.right_panel.set_image_folder(folder_path)
+        self.file_query = ''; self.right_panel.file_list_group.setTitle("Image Progress")
         self.right_panel.update_file_list(files, self.json_folder)
-        if files: self.on_file_selected(self.right_panel.file_list_widget.item(0))
-        self.update_button_states()
+        self.folder_watcher.set_folders(self.image_folder, self.json_folder)
+        if self.proposals_enabled: self._start_proposal_precompute()
+        first_row = 0
+        if self.claims:
+            self.right_panel.mark_claimed_files(self.claims.active_claims())
+            first_row = next((row for row in range(len(files)) if not self._claimed_by_other(row)), 0)
+        if files: self.on_file_selected(self.right_panel.file_list_widget.item(first_row))
+        self.ui_updates.invalidate(Dirty.BUTTONS)
         
     def load_json_folder(self, folder_path):
+        self._record('load_json_folder', path=folder_path)
+        self.scene_cache.clear()
+        self._reconcile_future = None; self._reconcile_timer.stop()
+        if self.claims: self.claims.release_all(); self.claims = None; self._claim_timer.stop()
         self.json_folder = folder_path
+        from src.claims import ClaimManager, HEARTBEAT_SECONDS, claims_enabled
+        if claims_enabled(): self.claims = ClaimManager(folder_path); self._claim_timer.start(HEARTBEAT_SECONDS * 1000)
+        if self.image_folder: self.folder_watcher.set_folders(self.image_folder, self.json_folder)
+        if self.current_image_path: self._claim_current_image()
         if self.right_panel.get_file_count() > 0:
             files = [self.right_panel.file_list_widget.item(i).text() for i in range(self.right_panel.get_file_count())]
             current_index = self.right_panel.get_current_file_index()
             self.right_panel.update_file_list(files, self.json_folder); self.right_panel.set_current_file_item(current_index)
+            if self.claims: self.right_panel.mark_claimed_files(self.claims.active_claims())
         if self.current_image_path: self._load_annotations_for_current_image(); self._update_all_views()
-        self.update_button_states()
+        if self.proposals_enabled: self._start_proposal_precompute(); self._reset_current_proposals(); self._show_current_proposals()
+        self.ui_updates.invalidate(Dirty.BUTTONS)
 
     def on_box_drawn(self, rect):
-        self.set_mode('idle', force=True); name = ComponentNameDialog(self).get_name()
-        if name:
-            try: self.data_model.add_component(name, rect); self._update_all_views(); self.on_component_selected_from_list(name)
-            except ValueError as e: QMessageBox.critical(self, "Error", str(e))
-        else: self._update_all_views()
+        self.set_mode('idle', force=True)
+        if self.left_panel.btn_snap.isChecked(): rect = self.snap_rect(rect)
+        name = ComponentNameDialog(self).get_name()
+        self._record('box_drawn', name=name, rect=[rect.x(), rect.y(), rect.width(), rect.height()])
+        if name: self.add_component_from_box(name, rect)
+
+    @timed("snap_box")
+    def snap_rect(self, rect):
+        """`rect` with its edges moved onto the nearest rectangle border in the image."""
+        gray = self.image_viewer.gray_image()
+        if gray is None: return rect
+        from src.box_snap import snap_box
+        tolerance = max(2, round(SNAP_TOLERANCE_PX / max(self.image_viewer.transform().m11(), 1e-6)))
+        x1, y1, x2, y2 = snap_box(gray, [rect.left(), rect.top(), rect.right(), rect.bottom()], tolerance)
+        return QRectF(x1, y1, x2 - x1, y2 - y1)
+
+    def add_component_from_box(self, name, rect):
+        try: self.data_model.add_component(name, rect); self.selected_component = name; self._update_all_views()
+        except ValueError as e: QMessageBox.critical(self, "Error", str(e)); return
+        if self.proposals_enabled: self._show_current_proposals()
+
+    def on_proposals_toggled(self, checked):
+        self.proposals_enabled = checked
+        if checked: self._start_proposal_precompute(); self._show_current_proposals()
+        else: self.image_viewer.clear_box_proposals()
+
+    def _start_proposal_precompute(self):
+        """Queues the folder's images in the background process pool; listing the folder and checking
+        the cache happen off the GUI thread."""
+        for future in self._proposal_futures: future.cancel()
+        self._proposal_futures = []
+        # A scan still running hands its futures to nobody: cancel them as soon as it is done
+        if self._proposal_scan: self._proposal_scan.add_done_callback(_cancel_scanned)
+        self._proposal_scan = None
+        if not (self.image_folder and self.json_folder): return
+        from src import box_proposals
+        if self._proposal_executor is None: self._proposal_executor = box_proposals.create_executor()
+        self._proposal_scan = self._proposal_thread_pool().submit(box_proposals.submit_folder, self._proposal_executor, self.image_folder, self.json_folder)
+        self._proposal_timer.start()
+
+    def _proposal_thread_pool(self):
+        # One thread for the folder scan, one for the current image, so neither waits on the other
+        from concurrent.futures import ThreadPoolExecutor
+        if self._proposal_threads is None: self._proposal_threads = ThreadPoolExecutor(max_workers=2)
+        return self._proposal_threads
+
+    def _reset_current_proposals(self):
+        if self._current_proposal_future: self._current_proposal_future.cancel()
+        self._current_proposal_future, self._current_proposals = None, None
+
+    def _show_current_proposals(self):
+        """Shows the current image's proposals that no existing component already covers. Until they
+        are known (from the cache or computed in a thread) nothing is shown; the poll shows them."""
+        self.image_viewer.clear_box_proposals()
+        if not self.current_image_path or self.data_model.skipped_reason or self._pending_nav_row is not None: return
+        if self._current_proposals is None:
+            if self._current_proposal_future is None: self._submit_current_proposals()
+            return
+        from src.box_proposals import box_iou
+        existing = [details['component_box'] for details in self.data_model.components.values()]
+        boxes = [box for box in self._current_proposals if all(box_iou(box, other) <= 0.5 for other in existing)]
+        self.image_viewer.show_proposals(boxes)
+        self.statusBar().showMessage(f"{len(boxes)} box proposals (Enter: accept, Delete: reject)", 3000)
+
+    def _submit_current_proposals(self):
+        # An image that could not be loaded has nothing to propose
+        if self.image_viewer.image_item is None: self._current_proposals = []; return
+        gray = self.image_viewer.gray_image()
+        # Only a preview is shown yet; the poll tries again once the full image is in
+        if gray is not None:
+            from src.box_proposals import compute_proposals
+            self._current_proposal_future = self._proposal_thread_pool().submit(compute_proposals, self.current_image_path, self.json_folder, gray)
+        self._proposal_timer.start()
+
+    def _waiting_for_current_proposals(self):
+        return self.proposals_enabled and self._current_proposals is None and bool(self.current_image_path) and not self.data_model.skipped_reason
+
+    def _poll_proposals(self):
+        waiting_for_current = self._waiting_for_current_proposals()
+        future = self._current_proposal_future
+        if waiting_for_current and self._pending_nav_row is None:
+            if future is None: self._submit_current_proposals()
+            elif future.done():
+                self._current_proposal_future = None
+                try: self._current_proposals = future.result()
+                except (OSError, ValueError) as e:
+                    self.statusBar().showMessage(f"Box proposals failed: {e}", 3000); self._current_proposals = []
+                self._show_current_proposals()
+        if self._proposal_scan and self._proposal_scan.done():
+            try: self._proposal_futures = self._proposal_scan.result()
+            except (OSError, RuntimeError) as e: self.statusBar().showMessage(f"Could not queue box proposals for the folder: {e}", 5000)
+            self._proposal_scan = None
+        if self._proposal_futures and all(future.done() for future in self._proposal_futures):
+            from src.box_proposals import failures
+            failed = failures(self._proposal_futures); self._proposal_futures = []
+            if failed:
+                for failure in failed: print(f"Box proposal precompute failed: {failure}")
+                self.statusBar().showMessage(f"Box proposals failed for {len(failed)} images (first: {failed[0]})", 5000)
+        waiting_for_current = self._waiting_for_current_proposals()
+        if not (waiting_for_current or self._proposal_scan or self._proposal_futures): self._proposal_timer.stop()
+
+    def accept_proposal(self):
+        """Turns the selected ghost box, or the one under the mouse, into a named component; a ghost
+        arrow into its connection."""
+        ghosts = [item for item in self.image_viewer.scene.selectedItems() if isinstance(item, (GhostBoxItem, GhostArrowItem))]
+        ghost = ghosts[0] if ghosts else self.image_viewer.proposal_at(self.image_viewer.viewport().mapFromGlobal(QCursor.pos()))
+        if ghost is None: self.statusBar().showMessage("Select or hover a proposal first.", 2000); return
+        if isinstance(ghost, GhostArrowItem): self.add_proposed_connections([ghost.proposal]); return
+        rect = ghost.rect()
+        name = ComponentNameDialog(self).get_name()
+        if not name: return
+        self._record('box_drawn', name=name, rect=[rect.x(), rect.y(), rect.width(), rect.height()])
+        self.image_viewer.remove_proposal(ghost)
+        self.add_component_from_box(name, rect)
+
+    def on_connection_proposals_toggled(self, checked):
+        self.connection_proposals_enabled = checked
+        if checked: self._show_connection_proposals()
+        else: self._connection_timer.stop(); self.image_viewer.clear_connection_proposals()
+
+    @staticmethod
+    def _proposal_key(proposal):
+        return (proposal["type"], proposal["source"], proposal["target"])
+
+    def _show_connection_proposals(self):
+        """Shows the detected connections between the current boxes that are not annotated yet.
+        Detection runs in a thread; the ghosts appear once it is done."""
+        self.image_viewer.clear_connection_proposals()
+        if not self.current_image_path or self.data_model.skipped_reason or self._pending_nav_row is not None: return
+        boxes = {name: details['component_box'] for name, details in self.data_model.components.items()}
+        key = (self.current_image_path, tuple((name, tuple(box)) for name, box in boxes.items()))
+        if key != self._connection_key:
+            # Nothing to look at when the image could not be read
+            if self.image_viewer.image_item is None: self._connection_timer.stop(); return
+            gray = self.image_viewer.gray_image()
+            # Only a preview is shown yet; the poll tries again once the full image is in
+            if gray is None: self._connection_key = None; self._connection_timer.start(); return
+            from concurrent.futures import ThreadPoolExecutor
+            from src.connection_proposals import propose_connections
+            if self._connection_executor is None: self._connection_executor = ThreadPoolExecutor(max_workers=1)
+            if self._connection_future: self._connection_future.cancel()
+            self._connection_key, self._connection_proposals = key, None
+            self._connection_future = self._connection_executor.submit(propose_connections, gray, boxes)
+            self._connection_timer.start(); return
+        if self._connection_proposals is None: return
+        # Any annotated connection between two boxes means the detected one is already covered
+        existing = {frozenset((name, conn['name'])) for name, details in self.data_model.components.items()
+                    for conns in details['connections'].values() for conn in conns}
+        proposals = [proposal for proposal in self._connection_proposals
+                     if frozenset((proposal["source"], proposal["target"])) not in existing and self._proposal_key(proposal) not in self._connection_rejected]
+        self.image_viewer.show_connection_proposals(proposals)
+        self.statusBar().showMessage(f"{len(proposals)} connection proposals, {sum(not p['confident'] for p in proposals)} uncertain (Enter: accept, Shift+Enter: accept all certain ones, Delete: reject)", 3000)
+
+    def _poll_connection_proposals(self):
+        future = self._connection_future
+        if future is None:
+            # Waiting for the full image, not for a result
+            if self.image_viewer.image_item is None: self._connection_timer.stop()
+            elif self.image_viewer.gray_image() is not None: self._connection_timer.stop(); self._show_connection_proposals()
+            return
+        if not future.done(): return
+        self._connection_timer.stop(); self._connection_future = None
+        try: self._connection_proposals = future.result()
+        except (ValueError, MemoryError) as e:
+            self.statusBar().showMessage(f"Connection proposals failed: {e}", 3000); self._connection_proposals = []
+        if self.connection_proposals_enabled: self._show_connection_proposals()
+
+    def add_proposed_connections(self, proposals):
+        """Adds each proposal ({"source", "target", "type", "count", "confident"}) `count` times."""
+        self._record('accept_connections', proposals=proposals)
+        for proposal in proposals:
+            if proposal["source"] not in self.data_model.components or proposal["target"] not in self.data_model.components: continue
+            for _ in range(proposal["count"]): self.data_model.add_connection(proposal["source"], proposal["target"], proposal["type"])
+        self.ui_updates.invalidate(Dirty.ARROWS | Dirty.DETAILS)
+
+    def accept_all_connection_proposals(self):
+        """Accepts the confident proposals; uncertain ones (dotted) are left to accept one by one."""
+        proposals = [ghost.proposal for ghost in self.image_viewer.connection_ghosts if ghost.proposal["confident"]]
+        left = len(self.image_viewer.connection_ghosts) - len(proposals)
+        if proposals: self.add_proposed_connections(proposals)
+        self.statusBar().showMessage(f"Added {len(proposals)} proposed connections; {left} uncertain ones left to review.", 3000)
+
+    def _run_with_progress(self, label, func, *args, **kwargs):
+        """Runs `func(*args, progress=..., **kwargs)` in a thread behind a modal progress dialog.
+        `progress(done, total=0)` returns False once Cancel was pressed. Returns (result, canceled);
+        exceptions from `func` are raised here."""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from PyQt6.QtCore import QEventLoop
+        from PyQt6.QtWidgets import QProgressDialog
+        state, canceled = {"done": 0, "total": 0}, threading.Event()
+        def progress(done, total=0):
+            state["done"], state["total"] = done, total
+            return not canceled.is_set()
+        dialog = QProgressDialog(label, "Cancel", 0, 0, self)
+        dialog.setWindowModality(Qt.WindowModality.WindowModal); dialog.setMinimumDuration(500)
+        dialog.canceled.connect(canceled.set)
+        loop, timer = QEventLoop(), QTimer()
+        timer.setInterval(PROGRESS_POLL_MS)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(func, *args, progress=progress, **kwargs)
+            def poll():
+                if future.done(): loop.quit(); return
+                # Without a total the dialog shows a busy bar and the count in its label
+                if state["total"]: dialog.setMaximum(state["total"]); dialog.setValue(state["done"])
+                elif state["done"]: dialog.setLabelText(f"{label} ({state['done']} files)")
+            timer.timeout.connect(poll); timer.start()
+            if not future.done(): loop.exec()
+            timer.stop()
+        # Closing the dialog counts as canceling it, so check first
+        was_canceled = canceled.is_set(); dialog.close(); dialog.deleteLater()
+        return future.result(), was_canceled
+
+    def open_bulk_rename(self):
+        if not self.json_folder: QMessageBox.warning(self, "Warning", "Load a JSON folder first."); return
+        request = BulkRenameDialog(self).get_request()
+        if not request: return
+        rules_text, mode, dry_run = request
+        from src.batch.rename import parse_mapping_lines, rename_folder
+        try:
+            mapping = parse_mapping_lines(rules_text)
+            if not mapping: return
+            # The open image goes to disk first so the batch sees (and renames) it too
+            self.save_current_annotations()
+            result, _ = self._run_with_progress("Previewing renames..." if dry_run else "Renaming components...", rename_folder, self.json_folder, mapping, mode, dry_run)
+        except (ValueError, re.error, OSError) as e:
+            QMessageBox.critical(self, "Bulk Rename Error", str(e)); self.statusBar().showMessage("Ready"); return
+        if result["canceled"] and dry_run: self.statusBar().showMessage("Bulk rename preview canceled.", 3000); return
+        if dry_run:
+            reply = QMessageBox.question(self, "Bulk Rename Preview", "\n".join(self._rename_summary(result, True)) + "\n\nApply these renames now?")
+            if reply != QMessageBox.StandardButton.Yes: self.statusBar().showMessage("Ready"); return
+            try: result, _ = self._run_with_progress("Renaming components...", rename_folder, self.json_folder, mapping, mode, dry_run=False)
+            except OSError as e:
+                QMessageBox.critical(self, "Bulk Rename Error", str(e)); self.statusBar().showMessage("Ready"); return
+        self._on_dataset_changed()
+        QMessageBox.information(self, "Bulk Rename", "\n".join(self._rename_summary(result, False)))
+        self.statusBar().showMessage("Ready")
+
+    @staticmethod
+    def _rename_summary(result, dry_run):
+        """Message lines for a rename_folder() result."""
+        lines = [f"{'Would change' if dry_run else 'Changed'} {result['files_changed']} of {result['files']} files."]
+        if result["canceled"]: lines[0] = f"Canceled after {result['files']} files; at least {result['files_written']} files were renamed."
+        lines += [f"  {rename}: {count} files" for rename, count in sorted(result["renames"].items())[:15]]
+        if result["collisions"]:
+            lines.append(f"\n{len(result['collisions'])} files left unchanged because names would merge, e.g.:")
+            lines += [f"  {c['file']}: {', '.join(c['from'])} -> {c['name']}" for c in result["collisions"][:10]]
+        if result["claimed"]: lines.append(f"\n{len(result['claimed'])} files skipped because other annotators claimed them.")
+        return lines
+
+    @staticmethod
+    def _list_image_files(folder):
+        return [f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+    def _image_files(self):
+        return self._list_image_files(self.image_folder)
+
+    def open_dataset_query(self):
+        """Filters the file list to the images whose annotation graph matches a query."""
+        if not (self.image_folder and self.json_folder): QMessageBox.warning(self, "Warning", "Load an image folder and a JSON folder first."); return
+        import sqlite3
+        from src.batch.query import run_query, image_names_for, QueryError
+        query, ok = QInputDialog.getText(self, "Query Dataset", "Query, e.g. 'cycle and fanout > 5' or 'path A -> B <= 2'\n(leave empty to show all images):", text=self.file_query)
+        if not ok: return
+        query = query.strip()
+        self.save_current_annotations()
+        if query:
+            try: json_names, canceled = self._run_with_progress("Running query...", run_query, self.json_folder, query)
+            except (QueryError, sqlite3.Error, OSError) as e: QMessageBox.critical(self, "Query Error", str(e)); self.statusBar().showMessage("Ready"); return
+            if canceled or json_names is None: self.statusBar().showMessage("Query canceled; the index built so far is kept.", 3000); return
+            files = image_names_for(json_names, self.image_folder)
+        else:
+            files = self._image_files()
+        self.file_query = query
+        self.right_panel.file_list_group.setTitle(f"Image Progress [{query}]" if query else "Image Progress")
+        self._show_file_subset(files)
+        self.statusBar().showMessage(f"{len(files)} images match '{query}'" if query else "Showing all images", 5000)
+
+    def find_duplicates(self):
+        """Hashes the image folder (cached per file) and marks near-duplicate images in the file list."""
+        if not (self.image_folder and self.json_folder): QMessageBox.warning(self, "Warning", "Load an image folder and a JSON folder first."); return
+        from PyQt6.QtWidgets import QProgressDialog
+        from src.duplicates import hash_folder, hash_cache_path, find_duplicate_groups, pick_originals, DUPLICATE_REASON
+        from src.widgets.right_panel import natural_sort_key
+        # Originals are picked by what is annotated on disk
+        self.save_current_annotations()
+        progress = QProgressDialog("Hashing images...", "Cancel", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal); progress.setMinimumDuration(500)
+        def report(done, total):
+            progress.setMaximum(total); progress.setValue(done); QApplication.processEvents()
+            return not progress.wasCanceled()
+        try: hashes = hash_folder(self.image_folder, hash_cache_path(self.json_folder), progress=report)
+        except OSError as e: progress.close(); QMessageBox.critical(self, "Duplicate Search Error", str(e)); return
+        # Closing the dialog counts as canceling it, so check first
+        canceled = progress.wasCanceled(); progress.close()
+        if canceled: self.statusBar().showMessage("Duplicate search canceled; hashes computed so far are cached.", 3000); return
+        duplicate_of = pick_originals(find_duplicate_groups(hashes), self.json_folder, natural_sort_key)
+        self.right_panel.mark_duplicates(duplicate_of)
+        if duplicate_of: self.left_panel.add_skip_reason(DUPLICATE_REASON)
+        self.statusBar().showMessage(f"{len(duplicate_of)} near-duplicate images found; right-click one to copy annotations or skip it.", 5000)
+
+    def _open_file_by_name(self, file_name):
+        """Makes `file_name` the current image; False if it is not listed or someone else claimed it."""
+        items = self.right_panel.file_list_widget.findItems(file_name, Qt.MatchFlag.MatchExactly)
+        if not items: return False
+        holder = self.claims.holder(os.path.join(self.image_folder, file_name)) if self.claims else None
+        if holder: QMessageBox.warning(self, "Warning", f"'{file_name}' is being annotated by {holder}."); return False
+        self.on_file_selected(items[0])
+        return True
+
+    def copy_annotations_to_duplicate(self, file_name, original_name):
+        from PyQt6.QtGui import QImageReader
+        from src.annotation_core import read_annotation, components_of
+        from src.duplicates import scale_components
+        self._record('copy_annotations', file=file_name, source=original_name)
+        if self.current_image_path and os.path.basename(self.current_image_path) == original_name: self.save_current_annotations()
+        components = components_of(read_annotation(self._json_path_for(os.path.join(self.image_folder, original_name))))
+        if not components: QMessageBox.information(self, "Copy Annotations", f"'{original_name}' has no annotations to copy."); return
+        if not self._open_file_by_name(file_name): return
+        if self.data_model.components or self.data_model.skipped_reason:
+            reply = QMessageBox.question(self, "Copy Annotations", f"Replace the existing annotations of '{file_name}'?",
+                                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+            if reply != QMessageBox.StandardButton.Yes: return
+        # Duplicates are often resized copies
+        source_size = QImageReader(os.path.join(self.image_folder, original_name)).size()
+        target_size = QImageReader(self.current_image_path).size()
+        sx = target_size.width() / source_size.width() if source_size.width() > 0 and target_size.width() > 0 else 1.0
+        sy = target_size.height() / source_size.height() if source_size.height() > 0 and target_size.height() > 0 else 1.0
+        self.data_model.replace_components(scale_components(components, sx, sy))
+        self.selected_component = None
+        self.save_current_annotations()
+        self._update_all_views()
+        self.right_panel.refresh_file_statuses([os.path.splitext(file_name)[0]], self.json_folder)
+        self.statusBar().showMessage(f"Copied {len(components)} components from {original_name}.", 3000)
+
+    def skip_duplicate(self, file_name):
+        from src.duplicates import DUPLICATE_REASON
+        self._record('select_file', file=file_name)
+        if self._open_file_by_name(file_name): self.on_skip_image(DUPLICATE_REASON)
+
+    def _show_file_subset(self, files):
+        """Replaces the file list with `files`, staying on the current image if it is among them."""
+        current_name = os.path.basename(self.current_image_path) if self.current_image_path else None
+        self.right_panel.update_file_list(files, self.json_folder)
+        if self.claims: self.right_panel.mark_claimed_files(self.claims.active_claims())
+        names = [self.right_panel.file_list_widget.item(row).text() for row in range(self.right_panel.get_file_count())]
+        if current_name in names: self.right_panel.set_current_file_item(names.index(current_name))
+        elif names: self.on_file_selected(self.right_panel.file_list_widget.item(0))
+        self.ui_updates.invalidate(Dirty.BUTTONS)
+
+    def _on_dataset_changed(self):
+        """Drops everything derived from the JSON files after a batch tool rewrote them."""
+        self.scene_cache.clear()
+        if self.current_image_path:
+            self.selected_component = None
+            self._load_annotations_for_current_image(); self._update_all_views()
 
     def on_component_name_changed(self, old_name, new_name):
+        self._record('rename', old_name=old_name, new_name=new_name)
         try: self.data_model.rename_component(old_name, new_name); self.selected_component = new_name; self._update_all_views()
-        except ValueError as e: QMessageBox.critical(self, "Rename Error", str(e)); self._update_ui_for_selection_change()
+        except ValueError as e: QMessageBox.critical(self, "Rename Error", str(e)); self.ui_updates.invalidate(Dirty.DETAILS)
 
     def on_component_connections_changed(self, comp_name, conn_type, new_value_str):
+        self._record('edit_connections', name=comp_name, conn_type=conn_type, value=new_value_str)
         self.data_model.update_connections_from_string(comp_name, conn_type, new_value_str)
-        self._update_all_views()
+        self.ui_updates.invalidate(Dirty.ARROWS | Dirty.DETAILS)
 
-    def save_current_annotations(self):
+    def save_current_annotations(self, force=False):
         if not all([self.current_image_path, self.json_folder]): return False
         if not self.data_model.components and not self.data_model.skipped_reason: return False
-        base_name = os.path.splitext(os.path.basename(self.current_image_path))[0]
-        json_path = os.path.join(self.json_folder, f"{base_name}.json")
+        if not force and not self.data_model.modified: return False
+        json_path = self._json_path_for(self.current_image_path)
         os.makedirs(self.json_folder, exist_ok=True)
-        return self.data_model.save_to_json(json_path)
+        try:
+            saved = self.data_model.save_to_json(json_path)
+        except ConcurrentModificationError as e:
+            reply = QMessageBox.warning(self, "Concurrent Modification", f"{e}\n\nOverwrite the other changes with yours?",
+                                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+            if reply != QMessageBox.StandardButton.Yes:
+                self.statusBar().showMessage("Not saved: the annotation file was changed by someone else.", 5000)
+                return False
+            saved = self.data_model.save_to_json(json_path, overwrite=True)
+        if saved: self.right_panel.set_file_status(os.path.basename(self.current_image_path), self._current_file_status())
+        return saved
 
-    # --- MODIFICATION: Call redraw with problem connections ---
-    def _update_ui_for_selection_change(self):
-        if self.data_model.skipped_reason: return
+    def _current_file_status(self):
+        """File list status of the loaded image, as file_status would read it from its saved JSON."""
+        if self.data_model.skipped_reason: return "skipped"
+        return "annotated" if self.data_model.components else None
+
+    def _claim_current_image(self):
+        if not self.claims or not self.current_image_path: return
+        try: holder = self.claims.try_claim(self.current_image_path)
+        except OSError as e: self.statusBar().showMessage(f"Could not claim image: {e}", 3000); return
+        if holder: self.statusBar().showMessage(f"This image is being annotated by {holder}.", 5000)
+
+    def _claimed_by_other(self, row):
+        item = self.right_panel.file_list_widget.item(row)
+        return item is not None and self.claims.holder(os.path.join(self.image_folder, item.text())) is not None
+
+    def _renew_claims(self):
+        if not self.claims: return
+        try:
+            lost = self.claims.renew()
+            self.right_panel.mark_claimed_files(self.claims.active_claims())
+        except OSError as e:
+            self.statusBar().showMessage(f"Could not renew image claims: {e}", 3000); return
+        if self.current_image_path and os.path.splitext(os.path.basename(self.current_image_path))[0] in lost:
+            self.statusBar().showMessage("Your claim on this image expired and was taken over by someone else.", 5000)
+
+    def _sync_selection_details(self):
         if self.selected_component and self.selected_component in self.data_model.components:
             self.right_panel.update_details(self.selected_component, self.data_model.components[self.selected_component])
-            items = self.right_panel.comp_list_widget.findItems(self.selected_component, Qt.MatchFlag.MatchExactly)
-            if items and not items[0].isSelected():
-                self.right_panel.comp_list_widget.blockSignals(True)
-                self.right_panel.comp_list_widget.setCurrentItem(items[0])
-                self.right_panel.comp_list_widget.blockSignals(False)
+            self.right_panel.select_component(self.selected_component)
         else:
             self.right_panel.update_details(None, None)
-            self.right_panel.comp_list_widget.clearSelection()
-        
-        # This now becomes the single source of truth for redrawing connections
-        self.image_viewer.redraw_connections(self.data_model, self.show_all_connections, self.selected_component)
+            self.right_panel.clear_component_selection()
         
     def update_button_states(self):
-        has_images = self.right_panel.get_file_count() > 0; is_idle = 'idle' in self.current_mode; is_skipped = self.data_model.skipped_reason is not None
+        has_images = self.right_panel.get_file_count() > 0; self.left_panel.btn_proposals.setEnabled(has_images); self.left_panel.btn_connection_proposals.setEnabled(has_images); is_idle = 'idle' in self.current_mode; is_skipped = self.data_model.skipped_reason is not None
         can_annotate = has_images and is_idle and not is_skipped
         self.left_panel.btn_connect_uni.setEnabled(can_annotate); self.left_panel.btn_connect_bi.setEnabled(can_annotate); self.left_panel.btn_draw_box.setEnabled(can_annotate)
         self.left_panel.btn_toggle_connections.setEnabled(has_images and not is_skipped); self.left_panel.update_toggle_button_text(self.show_all_connections)
@@ -296,5 +910,135 @@ class MainWindow(QMainWindow):
         self.left_panel.btn_prev.setEnabled(idx > 0 and is_idle); self.left_panel.btn_next.setEnabled(idx < count - 1 and is_idle)
         self.left_panel.toggle_skip_button.setEnabled(has_images)
 
+    def restore_session(self):
+        """Reopens the session saved at `session_path`. The file list comes from its snapshot, so the
+        last image is shown at once; the folders are then rescanned in the background."""
+        from src.session import load_session
+        state = load_session(self.session_path)
+        if not state: return False
+        for reason in state.get("skip_reasons", []): self.left_panel.add_skip_reason(reason)
+        self.show_all_connections = state.get("show_all_connections", True)
+        image_folder, json_folder = state.get("image_folder"), state.get("json_folder")
+        if not (image_folder and os.path.isdir(image_folder)): self.ui_updates.invalidate(Dirty.BUTTONS); return False
+        if json_folder and os.path.isdir(json_folder): self.load_json_folder(json_folder)
+        self.image_folder = image_folder; self.right_panel.set_image_folder(image_folder)
+        self.right_panel.set_thumbnails_enabled(state.get("thumbnails", False))
+        entries = state.get("files")
+        try:
+            if entries is None: self.right_panel.update_file_list(self._image_files(), self.json_folder)
+            else: self.right_panel.populate_file_list([tuple(entry) for entry in entries])
+        except OSError as e:
+            self.image_folder = None; self.statusBar().showMessage(f"Could not restore the last session: {e}", 5000); return False
+        if self.claims: self.right_panel.mark_claimed_files(self.claims.active_claims())
+        names = [name for name, _ in self.right_panel.file_entries()]
+        row = names.index(state["current_file"]) if state.get("current_file") in names else min(state.get("current_index") or 0, len(names) - 1)
+        if row >= 0: self.on_file_selected(self.right_panel.file_list_widget.item(row))
+        # Watching starts from a fresh folder snapshot, taken by the rescan when there is one
+        if entries is not None: self._start_reconcile(state.get("signatures"))
+        else: self.folder_watcher.set_folders(self.image_folder, self.json_folder)
+        self.ui_updates.invalidate(Dirty.BUTTONS)
+        return True
+
+    def save_session(self):
+        from src.session import save_session, folder_signature
+        folders = [self.image_folder, self.json_folder]
+        state = {"image_folder": self.image_folder, "json_folder": self.json_folder,
+                 "current_file": os.path.basename(self.current_image_path) if self.current_image_path else None,
+                 "current_index": self.right_panel.get_current_file_index(),
+                 "show_all_connections": self.show_all_connections, "skip_reasons": self.left_panel.skip_reasons,
+                 "thumbnails": self.right_panel.btn_thumbnails.isChecked(),
+                 # A query result is not a listing of the folder; the next start scans it instead
+                 "files": None if self.file_query else self.right_panel.file_entries(),
+                 # Unknown while a rescan is pending, so the next start rescans as well
+                 "signatures": None if self._reconcile_future else [folder_signature(f) if f else None for f in folders]}
+        try: save_session(self.session_path, state)
+        except OSError as e: print(f"Error saving session: {e}")
+
+    @staticmethod
+    def _rescan_folders(image_folder, json_folder, signatures):
+        """Runs in the reconcile thread: fresh file entries, or None if neither folder changed since `signatures`."""
+        from src.session import folder_signature
+        if signatures and signatures == [folder_signature(image_folder), folder_signature(json_folder) if json_folder else None]: return None
+        return scan_file_entries(MainWindow._list_image_files(image_folder), json_folder)
+
+    def _start_reconcile(self, signatures):
+        from concurrent.futures import ThreadPoolExecutor
+        if self._reconcile_executor is None: self._reconcile_executor = ThreadPoolExecutor(max_workers=1)
+        self._reconcile_future = self._reconcile_executor.submit(self._rescan_folders, self.image_folder, self.json_folder, signatures)
+        self._reconcile_timer.start()
+
+    def _poll_reconcile(self):
+        future = self._reconcile_future
+        # Rows must not move under a coalesced navigation; try again once it has settled
+        if future is None or not future.done() or self._pending_nav_row is not None: return
+        self._reconcile_timer.stop(); self._reconcile_future = None
+        self.folder_watcher.set_folders(self.image_folder, self.json_folder)
+        try: entries = future.result()
+        except OSError as e: self.statusBar().showMessage(f"Could not rescan the folders: {e}", 3000); return
+        if entries is None or self.file_query: return
+        if self.current_image_path:
+            # The loaded image's status is known here, and may be newer than what the thread read
+            current_name = os.path.basename(self.current_image_path)
+            entries = [(name, self._current_file_status() if name == current_name else status) for name, status in entries]
+        self.right_panel.reconcile_file_list(entries)
+        if self.claims: self.right_panel.mark_claimed_files(self.claims.active_claims())
+        self.ui_updates.invalidate(Dirty.BUTTONS)
+
+    def _on_images_changed(self, added, removed):
+        # Rows must not move under a coalesced navigation; look again once it has settled
+        if self._pending_nav_row is not None: QTimer.singleShot(NAV_SETTLE_MS, lambda: self._on_images_changed(added, removed)); return
+        # New images cannot be known to match the query the list is filtered by
+        if self.file_query: added = []
+        self.right_panel.apply_file_changes(scan_file_entries(added, self.json_folder), removed)
+        if self.claims and added: self.right_panel.mark_claimed_files(self.claims.active_claims())
+        if self.current_image_path and os.path.basename(self.current_image_path) in removed:
+            self.statusBar().showMessage("The current image was removed from the image folder.", 5000)
+        elif added or removed:
+            self.statusBar().showMessage(f"Image folder changed: {len(added)} added, {len(removed)} removed.", 3000)
+        self.ui_updates.invalidate(Dirty.BUTTONS)
+
+    def _on_annotations_changed(self, json_names):
+        bases = {os.path.splitext(name)[0] for name in json_names}
+        self.right_panel.refresh_file_statuses(bases, self.json_folder)
+        if not self.current_image_path or os.path.splitext(os.path.basename(self.current_image_path))[0] not in bases: return
+        json_path = self._json_path_for(self.current_image_path)
+        # Our own saves leave nothing to reload
+        if self._reload_prompt_open or not self.data_model.changed_on_disk(json_path): return
+        if self.data_model.modified:
+            self._reload_prompt_open = True
+            try:
+                reply = QMessageBox.question(self, "Annotation Changed on Disk",
+                                             f"'{os.path.basename(json_path)}' was changed by someone else.\n\nReload it and discard your unsaved changes?",
+                                             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.Yes)
+            finally:
+                self._reload_prompt_open = False
+            # Keeping the local version: saving it later still asks before overwriting
+            if reply != QMessageBox.StandardButton.Yes: return
+        self.reload_current_annotations()
+        self.statusBar().showMessage("Reloaded the annotations changed on disk.", 3000)
+
+    def reload_current_annotations(self):
+        self._cancel_operation()
+        self._load_annotations_for_current_image()
+        if self.selected_component not in self.data_model.components: self.selected_component = None
+        self._update_all_views()
+        if self.proposals_enabled: self._reset_current_proposals(); self._show_current_proposals()
+        self.ui_updates.invalidate(Dirty.BUTTONS)
+
     def closeEvent(self, event):
-        self.save_current_annotations(); event.accept()
\ No newline at end of file
+        self._nav_timer.stop(); self._pending_nav_row = None
+        self.save_current_annotations()
+        # Closing an empty window keeps the previous session
+        if self.session_path and self.image_folder: self.save_session()
+        self.folder_watcher.stop(); self.right_panel.stop_thumbnails()
+        if self.image_cache: self.image_cache.stop()
+        if self._reconcile_executor: self._reconcile_executor.shutdown(wait=False, cancel_futures=True); self._reconcile_executor = None
+        if self.claims: self._claim_timer.stop(); self.claims.release_all()
+        if self.recorder: self.recorder.close(); self.recorder = None
+        self._proposal_timer.stop()
+        if self._proposal_threads: self._proposal_threads.shutdown(wait=False, cancel_futures=True); self._proposal_threads = None
+        if self._proposal_executor: self._proposal_executor.shutdown(wait=False, cancel_futures=True); self._proposal_executor = None
+        self._connection_timer.stop()
+        if self._connection_executor: self._connection_executor.shutdown(wait=False, cancel_futures=True); self._connection_executor = None
+        if self.memory_diagnostics: self.memory_diagnostics.sample(self); self.memory_diagnostics.write_report()
+        event.accept()
\ No newline at end of file
@@ -0,0 +1,114 @@
+# src/memory_diagnostics.py
+"""Memory accounting for long annotation sessions.
+
+Every N navigations a sample records live QGraphicsItems by type (in the current and
+cached scenes), Python wrappers of items that are no longer in any scene, pixmap bytes,
+the tracemalloc heap and the process RSS. Steady growth across samples is reported as
+a probable leak together with the allocation sites that grew the most.
+
+Enable with ``python main.py --mem-diagnostics N`` or ``SBA_MEMDIAG=N``.
+"""
+import gc
+import json
+import os
+import sys
+from collections import Counter
+
+from PyQt6.QtWidgets import QGraphicsItem
+
+MEMDIAG_ENV_VAR = "SBA_MEMDIAG"
+DEFAULT_REPORT_PATH = "sba_memory.json"
+# Growth (in bytes) of the traced heap across the last samples that counts as a leak
+HEAP_LEAK_THRESHOLD = 5 * 1024 * 1024
+# Number of consecutive samples that must all grow before a leak is reported
+LEAK_WINDOW = 4
+TOP_ALLOCATIONS = 10
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == "darwin" else peak * 1024
+        except ImportError:
+            return None
+
+
+class MemoryDiagnostics:
+    def __init__(self, every=100, report_path=DEFAULT_REPORT_PATH):
+        self.every = max(1, every)
+        self.report_path = report_path
+        self.navigations = 0
+        self.samples = []
+        self.leaks = []
+        self._last_snapshot = None
+        # Imported here: tracemalloc (and the pickle it pulls in) is only needed when diagnostics are on
+        import tracemalloc
+        if not tracemalloc.is_tracing(): tracemalloc.start()
+
+    def on_navigation(self, window):
+        self.navigations += 1
+        if self.navigations % self.every == 0: self.sample(window)
+
+    def sample(self, window):
+        gc.collect()
+        viewer_states = [state.viewer_state for state in window.scene_cache.states()]
+        scenes = [window.image_viewer.scene] + [state.scene for state in viewer_states]
+        in_scenes = Counter()
+        scene_item_ids = set()
+        for scene in scenes:
+            for item in scene.items():
+                in_scenes[type(item).__name__] += 1
+                scene_item_ids.add(id(item))
+        # Python wrappers of items that are in no live scene can only be leaks
+        orphaned = Counter(type(obj).__name__ for obj in gc.get_objects()
+                           if isinstance(obj, QGraphicsItem) and id(obj) not in scene_item_ids)
+        pixmap_bytes = sum(state.pixmap_bytes() for state in viewer_states)
+        if window.image_viewer.image_item:
+            pixmap = window.image_viewer.image_item.pixmap()
+            pixmap_bytes += pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+        import tracemalloc
+        heap_current, heap_peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        top_growth = []
+        if self._last_snapshot is not None:
+            for stat in snapshot.compare_to(self._last_snapshot, "lineno")[:TOP_ALLOCATIONS]:
+                if stat.size_diff <= 0: continue
+                frame = stat.traceback[0]
+                top_growth.append({"site": f"{frame.filename}:{frame.lineno}", "size_diff": stat.size_diff,
+                                   "count_diff": stat.count_diff})
+        self._last_snapshot = snapshot
+        sample = {"navigations": self.navigations, "items_in_scenes": dict(in_scenes),
+                  "orphaned_items": dict(orphaned), "live_scenes": len(scenes), "pixmap_bytes": pixmap_bytes,
+                  "heap_bytes": heap_current, "heap_peak_bytes": heap_peak, "rss_bytes": _rss_bytes(),
+                  "top_growth": top_growth}
+        self.samples.append(sample)
+        self._check_leaks(sample)
+        return sample
+
+    def _check_leaks(self, sample):
+        if sum(sample["orphaned_items"].values()):
+            self._report_leak(f"{sum(sample['orphaned_items'].values())} graphics items outlive their scene: {sample['orphaned_items']}")
+        recent = self.samples[-(LEAK_WINDOW + 1):]
+        if len(recent) <= LEAK_WINDOW: return
+        heaps = [s["heap_bytes"] for s in recent]
+        if all(b > a for a, b in zip(heaps, heaps[1:])) and heaps[-1] - heaps[0] > HEAP_LEAK_THRESHOLD:
+            sites = ", ".join(g["site"] for g in sample["top_growth"][:3])
+            self._report_leak(f"Python heap grew {(heaps[-1] - heaps[0]) / 2**20:.1f} MiB over {LEAK_WINDOW} samples (top sites: {sites})")
+
+    def _report_leak(self, message):
+        entry = {"navigations": self.navigations, "message": message}
+        self.leaks.append(entry)
+        print(f"[memory] after {self.navigations} navigations: {message}", file=sys.stderr)
+
+    def write_report(self, path=None):
+        path = path or self.report_path
+        if not path: return None
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"every": self.every, "navigations": self.navigations, "leaks": self.leaks,
+                       "samples": self.samples}, f, indent=2)
+        return path
@@ -0,0 +1,128 @@
+# src/profiling.py
+"""Opt-in timers and counters for the hot paths (no Qt dependency).
+
+Enable with ``python main.py --profile [trace.json]`` or ``SBA_PROFILE=1`` (or a path).
+While disabled, every wrapped call costs a single attribute check.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+PROFILE_ENV_VAR = "SBA_PROFILE"
+DEFAULT_TRACE_PATH = "sba_profile.json"
+# Number of recent samples per timer used for the rolling percentiles
+ROLLING_WINDOW = 200
+# Upper bound on stored trace events so week-long sessions cannot exhaust memory
+MAX_TRACE_EVENTS = 500_000
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values: return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.trace_path = None
+        self._lock = threading.Lock()
+        self._origin_ns = time.perf_counter_ns()
+        self._samples = defaultdict(lambda: deque(maxlen=ROLLING_WINDOW))
+        self._totals = defaultdict(int)
+        self._events = []
+        self.dropped_events = 0
+
+    def enable(self, trace_path=DEFAULT_TRACE_PATH):
+        self.enabled = True
+        self.trace_path = trace_path
+
+    def configure_from_env(self):
+        """Enables profiling if SBA_PROFILE is set; a value other than 1/true is the trace path."""
+        value = os.environ.get(PROFILE_ENV_VAR, "").strip()
+        if not value or value.lower() in ("0", "false", "no"): return False
+        self.enable(DEFAULT_TRACE_PATH if value.lower() in ("1", "true", "yes") else value)
+        return True
+
+    def timed(self, name):
+        """Decorator recording the wall time of every call under `name`."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled: return func(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, start, time.perf_counter_ns())
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield; return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter_ns())
+
+    def record(self, name, start_ns, end_ns):
+        duration_ms = (end_ns - start_ns) / 1e6
+        with self._lock:
+            self._samples[name].append(duration_ms)
+            self._totals[name] += 1
+            self._append_event({"name": name, "cat": "sba", "ph": "X", "ts": (start_ns - self._origin_ns) / 1e3,
+                                "dur": (end_ns - start_ns) / 1e3, "pid": os.getpid(), "tid": threading.get_ident()})
+
+    def count(self, name, values):
+        """Records a counter sample, e.g. count("scene_items", {"rects": 12, "arrows": 30})."""
+        if not self.enabled: return
+        with self._lock:
+            self._append_event({"name": name, "ph": "C", "ts": (time.perf_counter_ns() - self._origin_ns) / 1e3,
+                                "pid": os.getpid(), "args": dict(values)})
+
+    def _append_event(self, event):
+        if len(self._events) < MAX_TRACE_EVENTS: self._events.append(event)
+        else: self.dropped_events += 1
+
+    def percentiles(self, name):
+        """(p50, p95) in milliseconds over the last ROLLING_WINDOW calls."""
+        with self._lock:
+            values = sorted(self._samples.get(name, ()))
+        return _percentile(values, 0.5), _percentile(values, 0.95)
+
+    def summary(self):
+        with self._lock:
+            names = list(self._samples)
+        result = {}
+        for name in names:
+            p50, p95 = self.percentiles(name)
+            result[name] = {"calls": self._totals[name], "p50_ms": round(p50, 3), "p95_ms": round(p95, 3)}
+        return result
+
+    def dump(self, path=None):
+        """Writes a Chrome trace (chrome://tracing / Perfetto) with a summary section."""
+        path = path or self.trace_path
+        if not self.enabled or not path: return None
+        with self._lock:
+            events = list(self._events)
+        data = {"traceEvents": events, "displayTimeUnit": "ms", "summary": self.summary(),
+                "droppedEvents": self.dropped_events}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear(); self._totals.clear(); self._events.clear()
+            self.dropped_events = 0
+
+
+PROFILER = Profiler()
+timed = PROFILER.timed
@@ -0,0 +1,97 @@
+# src/scene_cache.py
+import os
+from collections import OrderedDict
+
+# Rough per-item cost of a QGraphicsItem plus its Python wrapper, used for the memory budget
+ITEM_OVERHEAD_BYTES = 2048
+DEFAULT_MAX_ENTRIES = 8
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def json_file_signature(json_path):
+    """(mtime_ns, size) of the annotation file, or None if it does not exist."""
+    if not json_path: return None
+    try:
+        st = os.stat(json_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class SceneState:
+    """A fully built image: the viewer's scene and transform plus the annotations behind it."""
+    def __init__(self, viewer_state, data_model, selected_component, show_all_connections, json_signature):
+        self.viewer_state = viewer_state
+        self.data_model = data_model
+        self.selected_component = selected_component
+        self.show_all_connections = show_all_connections
+        self.json_signature = json_signature
+
+    @property
+    def nbytes(self):
+        return self.viewer_state.pixmap_bytes() + len(self.viewer_state.scene.items()) * ITEM_OVERHEAD_BYTES
+
+    def release(self):
+        self.viewer_state.release()
+
+
+class SceneCache:
+    """LRU cache of SceneStates keyed by image path, bounded by entry count and memory budget."""
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, image_path):
+        return image_path in self._entries
+
+    def states(self):
+        return list(self._entries.values())
+
+    def put(self, image_path, state):
+        self.invalidate(image_path)
+        if self.max_entries <= 0: state.release(); return
+        size = state.nbytes
+        self._entries[image_path] = state
+        self._sizes[image_path] = size
+        self.total_bytes += size
+        self._evict()
+
+    def take(self, image_path, json_path):
+        """Removes and returns the cached state, or None if absent or its JSON changed on disk."""
+        state = self._pop(image_path)
+        if state is None:
+            self.misses += 1
+            return None
+        if state.json_signature != json_file_signature(json_path):
+            state.release()
+            self.misses += 1
+            return None
+        self.hits += 1
+        return state
+
+    def invalidate(self, image_path):
+        state = self._pop(image_path)
+        if state is not None: state.release()
+
+    def clear(self):
+        for state in self._entries.values(): state.release()
+        self._entries.clear(); self._sizes.clear()
+        self.total_bytes = 0
+
+    def _pop(self, image_path):
+        state = self._entries.pop(image_path, None)
+        if state is not None: self.total_bytes -= self._sizes.pop(image_path)
+        return state
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._pop(oldest).release()
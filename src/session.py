@@ -0,0 +1,55 @@
+# src/session.py
+"""The last session (folders, current image, view mode, skip reasons and a snapshot of the
+file list with each file's status), saved on exit and restored on the next launch.
+
+The snapshot lets the window reopen the last image without rescanning the folders; the
+real listing is reconciled in the background afterwards. The file lives in the user's
+config directory; ``SBA_SESSION`` overrides the path and ``SBA_SESSION=0`` (or
+``python main.py --no-restore``) turns restoring off.
+"""
+import json
+import os
+
+SESSION_ENV_VAR = "SBA_SESSION"
+# 2: file statuses include "annotated"
+SESSION_VERSION = 2
+
+
+def default_session_path():
+    """Path of the session file, or None if sessions are disabled."""
+    value = os.environ.get(SESSION_ENV_VAR, "").strip()
+    if value.lower() in ("0", "false", "no", "off"): return None
+    if value: return value
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(config_home, "SysBlockAnnotator", "session.json")
+
+
+def folder_signature(folder):
+    """(mtime_ns, entry count) of `folder`, None if it cannot be read. Adding, removing or
+    atomically rewriting a file changes it."""
+    try:
+        st = os.stat(folder)
+        with os.scandir(folder) as entries: count = sum(1 for _ in entries)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, count]
+
+
+def load_session(path):
+    """The saved session dict, or None if there is none or it is unusable."""
+    if not path: return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != SESSION_VERSION: return None
+    return state
+
+
+def save_session(path, state):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": SESSION_VERSION, **state}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,68 @@
+# src/startup_profile.py
+"""Cold-start timeline from process start to the first event-loop iteration (no Qt dependency).
+
+main.py marks each phase (Qt imported, application created, window built, shown, first
+frame). ``python main.py --startup-report [path]`` prints or writes the marks;
+benchmarks/run_benchmarks.py --only startup measures time-to-first-window over several runs.
+Marks are also recorded as PROFILER spans when --profile is on.
+"""
+import json
+import os
+import time
+
+from src.profiling import PROFILER
+
+STARTUP_ENV_VAR = "SBA_STARTUP_REPORT"
+
+
+def _process_age_ms():
+    """Milliseconds since the process was started (Linux only; 10 ms resolution), or None."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesised command name; starttime is field 22 of the full line
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, (uptime - start_ticks / os.sysconf("SC_CLK_TCK")) * 1000)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    def __init__(self):
+        # Interpreter start-up and imports before this module are not seen by perf_counter
+        self.before_origin_ms = _process_age_ms()
+        self._origin_ns = time.perf_counter_ns()
+        self._last_ns = self._origin_ns
+        self.marks = []
+
+    def mark(self, name):
+        now = time.perf_counter_ns()
+        self.marks.append((name, (now - self._origin_ns) / 1e6, (now - self._last_ns) / 1e6))
+        if PROFILER.enabled: PROFILER.record(f"startup:{name}", self._last_ns, now)
+        self._last_ns = now
+
+    def report(self):
+        offset = self.before_origin_ms or 0.0
+        return {"before_main_ms": None if self.before_origin_ms is None else round(self.before_origin_ms, 3),
+                "marks": [{"name": name, "at_ms": round(offset + at, 3), "phase_ms": round(phase, 3)}
+                          for name, at, phase in self.marks],
+                "total_ms": round(offset + (self.marks[-1][1] if self.marks else 0.0), 3)}
+
+    def format(self):
+        report = self.report()
+        lines = ["Startup profile (ms since process start):"]
+        if report["before_main_ms"] is not None:
+            lines.append(f"  {'interpreter + early imports':<28} {report['before_main_ms']:>9.1f}")
+        for mark in report["marks"]:
+            lines.append(f"  {mark['name']:<28} {mark['at_ms']:>9.1f}  (+{mark['phase_ms']:.1f})")
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Writes the report as JSON to `path`, or prints it for '-'."""
+        if path == "-": print(self.format()); return
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+STARTUP = StartupProfile()
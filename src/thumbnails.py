@@ -0,0 +1,133 @@
+# src/thumbnails.py
+"""Thumbnails for the file list, made off the GUI thread and cached on disk.
+
+Images are decoded straight to thumbnail size with QImageReader.setScaledSize, in a
+QThreadPool. Each thumbnail is stored under a key derived from the image's content (its
+size plus its first and last 64 KiB, which for PNG include the checksum of all image
+data), so renamed or copied images and later sessions reuse it without decoding. The
+cache lives in the user's cache directory; ``SBA_THUMB_CACHE`` overrides the path and
+``SBA_THUMB_CACHE=0`` keeps thumbnails in memory only.
+"""
+import hashlib
+import os
+import threading
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+
+THUMB_CACHE_ENV_VAR = "SBA_THUMB_CACHE"
+THUMB_SIZE = 96
+# Bytes read from each end of the file for the content key
+KEY_SAMPLE_BYTES = 64 * 1024
+MAX_THREADS = 4
+
+
+def default_cache_dir():
+    """Directory of the thumbnail cache, or None if disk caching is disabled."""
+    value = os.environ.get(THUMB_CACHE_ENV_VAR, "").strip()
+    if value.lower() in ("0", "false", "no", "off"): return None
+    if value: return value
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "SysBlockAnnotator", "thumbnails")
+
+
+def content_key(image_path, size=THUMB_SIZE):
+    """Hex digest of the file's length and both ends, plus the thumbnail size."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(image_path, 'rb') as f:
+        length = os.fstat(f.fileno()).st_size
+        digest.update(f"{length}:{size}".encode())
+        digest.update(f.read(KEY_SAMPLE_BYTES))
+        if length > KEY_SAMPLE_BYTES:
+            f.seek(max(KEY_SAMPLE_BYTES, length - KEY_SAMPLE_BYTES))
+            digest.update(f.read(KEY_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def make_thumbnail(image_path, size=THUMB_SIZE):
+    """The image scaled to fit `size` x `size`, decoded at that size; a null QImage if unreadable."""
+    reader = QImageReader(image_path)
+    full_size = reader.size()
+    if full_size.isValid() and max(full_size.width(), full_size.height()) > size:
+        reader.setScaledSize(full_size.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio))
+    return reader.read()
+
+
+def load_thumbnail(image_path, cache_dir, size=THUMB_SIZE):
+    """Thumbnail from the disk cache, made and stored if missing. Safe to call from worker threads."""
+    if not cache_dir: return make_thumbnail(image_path, size)
+    try: key = content_key(image_path, size)
+    except OSError: return QImage()
+    cache_path = os.path.join(cache_dir, key[:2], f"{key}.png")
+    image = QImage(cache_path)
+    if not image.isNull(): return image
+    image = make_thumbnail(image_path, size)
+    if image.isNull(): return image
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp.png"
+        if image.save(tmp_path): os.replace(tmp_path, cache_path)
+    except OSError:
+        pass # A read-only or full cache still leaves the thumbnail usable
+    return image
+
+
+class _JobSignals(QObject):
+    # (image folder, file name, thumbnail or a null image)
+    done = pyqtSignal(str, str, QImage)
+
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, loader, folder, file_name):
+        super().__init__()
+        self.loader, self.folder, self.file_name = loader, folder, file_name
+        self.signals = loader._signals
+
+    def run(self):
+        # Rows scrolled out of view before the job started are not worth decoding
+        if self.folder != self.loader.folder or self.file_name not in self.loader.wanted:
+            image = QImage()
+        else:
+            image = load_thumbnail(os.path.join(self.folder, self.file_name), self.loader.cache_dir, self.loader.size)
+        self.signals.done.emit(self.folder, self.file_name, image)
+
+
+class ThumbnailLoader(QObject):
+    """Makes thumbnails in a thread pool for the file names last passed to request()."""
+    thumbnail_ready = pyqtSignal(str, QImage)
+
+    def __init__(self, parent=None, cache_dir=None, size=THUMB_SIZE):
+        super().__init__(parent)
+        self.cache_dir, self.size = cache_dir, size
+        self.folder = None
+        self.wanted = frozenset()
+        self._in_flight = set()
+        self._signals = _JobSignals(self)
+        self._signals.done.connect(self._on_done)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(1, min(MAX_THREADS, QThreadPool.globalInstance().maxThreadCount() - 1)))
+
+    def set_folder(self, folder):
+        if folder == self.folder: return
+        self.folder, self.wanted = folder, frozenset()
+        # Queued jobs never run once cleared; running ones report for the old folder and are ignored
+        self._pool.clear(); self._in_flight.clear()
+
+    def request(self, file_names):
+        """Replaces what is wanted; jobs for names no longer wanted finish without decoding."""
+        self.wanted = frozenset(file_names)
+        if not self.folder: return
+        for name in file_names:
+            if name in self._in_flight: continue
+            self._in_flight.add(name)
+            self._pool.start(_ThumbnailJob(self, self.folder, name))
+
+    def stop(self):
+        self.wanted = frozenset()
+        self._pool.clear()
+        self._pool.waitForDone()
+        self._in_flight.clear()
+
+    def _on_done(self, folder, file_name, image):
+        if folder != self.folder: return
+        self._in_flight.discard(file_name)
+        if not image.isNull(): self.thumbnail_ready.emit(file_name, image)
@@ -0,0 +1,61 @@
+# src/ui_scheduler.py
+from enum import IntFlag
+from PyQt6.QtCore import QObject, QTimer
+
+
+class Dirty(IntFlag):
+    """Parts of the main window that can be marked for refresh."""
+    RECTS = 1        # component rectangles (or the skipped overlay) in the scene
+    ARROWS = 2       # connection arrows in the scene
+    COMP_LIST = 4    # "Annotated Components" list
+    DETAILS = 8      # details editor and the component list's current row
+    BUTTONS = 16     # enabled state of the left panel buttons
+    ALL = RECTS | ARROWS | COMP_LIST | DETAILS | BUTTONS
+
+
+class UpdateScheduler(QObject):
+    """Collects invalidations and flushes them once per event-loop iteration.
+
+    Handlers call invalidate() as often as they like; a zero-interval timer then runs
+    `flush_handler(parts)` a single time with the union of everything marked dirty.
+    """
+    def __init__(self, flush_handler, parent=None):
+        super().__init__(parent)
+        self._flush_handler = flush_handler
+        self._pending = Dirty(0)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.flush)
+        self.requested = {part: 0 for part in Dirty if part != Dirty.ALL}
+        self.performed = {part: 0 for part in Dirty if part != Dirty.ALL}
+        self.flush_count = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def invalidate(self, parts):
+        for part in self.requested:
+            if parts & part: self.requested[part] += 1
+        self._pending |= parts
+        if not self._timer.isActive(): self._timer.start()
+
+    def flush(self):
+        """Runs pending work now. Safe to call directly when a caller needs up-to-date UI."""
+        self._timer.stop()
+        parts, self._pending = self._pending, Dirty(0)
+        if not parts: return
+        self.flush_count += 1
+        for part in self.performed:
+            if parts & part: self.performed[part] += 1
+        self._flush_handler(parts)
+
+    def stats(self):
+        return {part.name.lower(): {"requested": self.requested[part], "performed": self.performed[part],
+                                    "avoided": self.requested[part] - self.performed[part]}
+                for part in self.requested}
+
+    def summary(self):
+        avoided = sum(self.requested[p] - self.performed[p] for p in self.requested)
+        return f"{self.flush_count} flushes, {avoided} redundant updates avoided"
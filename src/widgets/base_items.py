@@ -4,10 +4,15 @@ from PyQt6.QtGui import QPen, QColor, QPainter, QBrush
 from PyQt6.QtCore import Qt
 from typing import Optional
 
+# Level of detail (screen pixels per scene unit, from painter.worldTransform()) below which
+# items skip decorations such as arrowheads and selection halos
+LOW_DETAIL_SCALE = 0.1
+
 class SelectableGraphicsItem:
     """A base class for items that can be selected and show a highlight."""
     def paint_selection_highlight(self, painter: QPainter, option: QStyleOptionGraphicsItem):
         if option.state & QStyle.StateFlag.State_Selected:
+            if QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform()) < LOW_DETAIL_SCALE: return
             # Create the highlight pen
             highlight_pen = QPen(QColor(38, 220, 255), 5, Qt.PenStyle.SolidLine)
             
@@ -39,4 +44,18 @@ class ComponentRectItem(QGraphicsRectItem, SelectableGraphicsItem):
         
     def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: Optional[QWidget] = None) -> None:
         super().paint(painter, option, widget)
-        self.paint_selection_highlight(painter, option)
\ No newline at end of file
+        self.paint_selection_highlight(painter, option)
+
+class GhostBoxItem(QGraphicsRectItem, SelectableGraphicsItem):
+    """A dashed, not yet accepted box proposal."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setFlag(self.GraphicsItemFlag.ItemIsSelectable)
+        pen = QPen(QColor("#c678dd"), 2, Qt.PenStyle.DashLine)
+        pen.setCosmetic(True)
+        self.setPen(pen)
+        self.setBrush(QColor(198, 120, 221, 20))
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: Optional[QWidget] = None) -> None:
+        super().paint(painter, option, widget)
+        self.paint_selection_highlight(painter, option)
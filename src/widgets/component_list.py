@@ -0,0 +1,67 @@
+# src/widgets/component_list.py
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+from sortedcontainers import SortedList
+
+# Above this many changed names a full model reset is cheaper than row-by-row updates
+RESET_THRESHOLD = 64
+
+
+class ComponentListModel(QAbstractListModel):
+    """Sorted list of component names with incremental insert/remove/rename.
+
+    Names live in a SortedList, so both name -> row (``row_of``) and row -> name are
+    O(log n) and inserting or removing a name only touches a single row of the view.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._names = SortedList()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._names)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._names): return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole): return self._names[index.row()]
+        return None
+
+    def names(self):
+        return self._names
+
+    def name_at(self, row):
+        return self._names[row] if 0 <= row < len(self._names) else None
+
+    def row_of(self, name):
+        if name is None: return -1
+        row = self._names.bisect_left(name)
+        return row if row < len(self._names) and self._names[row] == name else -1
+
+    def insert(self, name):
+        if self.row_of(name) >= 0: return
+        row = self._names.bisect_left(name)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._names.add(name)
+        self.endInsertRows()
+
+    def remove(self, name):
+        row = self.row_of(name)
+        if row < 0: return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._names[row]
+        self.endRemoveRows()
+
+    def rename(self, old_name, new_name):
+        self.remove(old_name)
+        self.insert(new_name)
+
+    def set_names(self, names):
+        """Brings the model in line with `names`, touching only the rows that changed."""
+        new_names = set(names)
+        current = set(self._names)
+        removed, added = current - new_names, new_names - current
+        if len(removed) + len(added) > RESET_THRESHOLD:
+            self.beginResetModel()
+            self._names = SortedList(new_names)
+            self.endResetModel()
+            return
+        for name in removed: self.remove(name)
+        for name in added: self.insert(name)
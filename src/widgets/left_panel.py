@@ -12,6 +12,11 @@ class LeftPanel(QWidget):
     next_image_requested = pyqtSignal()
     skip_image_requested = pyqtSignal(str)
     toggle_connections_view_requested = pyqtSignal()
+    proposals_toggled = pyqtSignal(bool)
+    connection_proposals_toggled = pyqtSignal(bool)
+    bulk_rename_requested = pyqtSignal()
+    query_requested = pyqtSignal()
+    duplicates_requested = pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -25,6 +30,12 @@ class LeftPanel(QWidget):
         self.btn_load_images = QPushButton("Load Image Folder")
         self.btn_load_jsons = QPushButton("Load JSON Folder")
         self.btn_save = QPushButton("Save Current (Ctrl+S)")
+        self.btn_bulk_rename = QPushButton("Bulk Rename...")
+        self.btn_bulk_rename.clicked.connect(self.bulk_rename_requested)
+        self.btn_query = QPushButton("Query Dataset...")
+        self.btn_query.clicked.connect(self.query_requested)
+        self.btn_duplicates = QPushButton("Find Duplicates...")
+        self.btn_duplicates.clicked.connect(self.duplicates_requested)
         self.btn_load_images.clicked.connect(self.on_load_images)
         self.btn_load_jsons.clicked.connect(self.on_load_jsons)
         self.btn_save.clicked.connect(self.save_requested)
@@ -33,6 +44,9 @@ class LeftPanel(QWidget):
         data_layout.addWidget(self.btn_load_images)
         data_layout.addWidget(self.btn_load_jsons)
         data_layout.addWidget(self.btn_save)
+        data_layout.addWidget(self.btn_bulk_rename)
+        data_layout.addWidget(self.btn_query)
+        data_layout.addWidget(self.btn_duplicates)
         data_group.setLayout(data_layout)
 
         # --- Navigation Group ---
@@ -53,6 +67,17 @@ class LeftPanel(QWidget):
         self.btn_connect_uni = QPushButton("Unidirectional Arrow (O)")
         self.btn_connect_bi = QPushButton("Bidirectional Arrow (N)")
         self.btn_toggle_connections = QPushButton("Toggle View (V)")
+        self.btn_proposals = QPushButton("Propose Boxes (P)")
+        self.btn_proposals.setCheckable(True)
+        self.btn_proposals.setToolTip("Show detected boxes; Enter accepts the selected or hovered one, Delete rejects it")
+        self.btn_proposals.toggled.connect(self.proposals_toggled)
+        self.btn_connection_proposals = QPushButton("Propose Connections (C)")
+        self.btn_connection_proposals.setCheckable(True)
+        self.btn_connection_proposals.setToolTip("Show connections detected between the boxes (dotted: uncertain); Enter accepts the selected or hovered one, Shift+Enter accepts all certain ones, Delete rejects it")
+        self.btn_connection_proposals.toggled.connect(self.connection_proposals_toggled)
+        self.btn_snap = QPushButton("Snap Boxes to Borders")
+        self.btn_snap.setCheckable(True)
+        self.btn_snap.setToolTip("Move the edges of a drawn box onto the nearest rectangle border in the image")
         
         # REMOVED .setShortcut() from here
         self.btn_toggle_connections.clicked.connect(self.toggle_connections_view_requested)
@@ -63,21 +88,34 @@ class LeftPanel(QWidget):
         anno_layout.addWidget(self.btn_connect_uni)
         anno_layout.addWidget(self.btn_connect_bi)
         anno_layout.addWidget(self.btn_toggle_connections)
+        anno_layout.addWidget(self.btn_proposals)
+        anno_layout.addWidget(self.btn_connection_proposals)
+        anno_layout.addWidget(self.btn_snap)
         anno_group.setLayout(anno_layout)
 
         # --- Skip Image Group ---
         skip_group_container = QGroupBox("Skip Image")
-        skip_main_layout = QVBoxLayout(skip_group_container)
+        self.skip_main_layout = QVBoxLayout(skip_group_container)
         self.toggle_skip_button = QPushButton()
         self.toggle_skip_button.setCheckable(True)
         self.toggle_skip_button.setChecked(False)
         self.toggle_skip_button.setStyleSheet("text-align: left; padding-left: 10px;")
         self.toggle_skip_button.clicked.connect(self.toggle_skip_panel)
-        skip_main_layout.addWidget(self.toggle_skip_button)
+        self.skip_main_layout.addWidget(self.toggle_skip_button)
+        self.skip_reasons = ["Contains basic elements", "Parent/child diagram", "Series/parallel connection"]
+        # Built the first time it is shown; most sessions never open it
+        self.skip_reasons_panel = None
+
+        self.layout.addWidget(data_group)
+        self.layout.addWidget(nav_group)
+        self.layout.addWidget(anno_group)
+        self.layout.addWidget(skip_group_container)
+        self.layout.addStretch()
+        self.toggle_skip_panel(False)
+
+    def _build_skip_panel(self):
         self.skip_reasons_panel = QWidget()
         self.skip_layout = QVBoxLayout(self.skip_reasons_panel)
-        self.skip_reasons_panel.setVisible(False)
-        skip_main_layout.addWidget(self.skip_reasons_panel)
         add_reason_layout = QHBoxLayout()
         self.new_reason_input = QLineEdit()
         self.new_reason_input.setPlaceholderText("Add new reason...")
@@ -87,39 +125,39 @@ class LeftPanel(QWidget):
         add_reason_layout.addWidget(self.new_reason_input)
         add_reason_layout.addWidget(self.btn_add_reason)
         self.skip_layout.addLayout(add_reason_layout)
-        self.skip_reasons = ["Contains basic elements", "Parent/child diagram", "Series/parallel connection"]
         self.reason_buttons_layout = QVBoxLayout()
         self.skip_layout.addLayout(self.reason_buttons_layout)
         self.update_reason_buttons()
-
-        self.layout.addWidget(data_group)
-        self.layout.addWidget(nav_group)
-        self.layout.addWidget(anno_group)
-        self.layout.addWidget(skip_group_container)
-        self.layout.addStretch()
-        self.toggle_skip_panel(False)
+        self.skip_main_layout.addWidget(self.skip_reasons_panel)
 
     def toggle_skip_panel(self, checked):
-        self.skip_reasons_panel.setVisible(checked)
+        if checked and self.skip_reasons_panel is None: self._build_skip_panel()
+        if self.skip_reasons_panel is not None: self.skip_reasons_panel.setVisible(checked)
         if checked: self.toggle_skip_button.setText("[-] Hide Skip Reasons")
         else: self.toggle_skip_button.setText("[+] Show Skip Reasons")
 
     def update_reason_buttons(self):
+        if self.skip_reasons_panel is None: return
         while self.reason_buttons_layout.count():
             child = self.reason_buttons_layout.takeAt(0)
             if child.widget(): child.widget().deleteLater()
-        for reason in self.skip_reasons:
-            btn = QPushButton(reason)
-            btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
-            btn.clicked.connect(lambda checked, r=reason: self.skip_image_requested.emit(r))
-            self.reason_buttons_layout.addWidget(btn)
+        for reason in self.skip_reasons: self._add_reason_button(reason)
+
+    def _add_reason_button(self, reason):
+        btn = QPushButton(reason)
+        btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        btn.clicked.connect(lambda checked, r=reason: self.skip_image_requested.emit(r))
+        self.reason_buttons_layout.addWidget(btn)
+
+    def add_skip_reason(self, reason):
+        if not reason or reason in self.skip_reasons: return False
+        self.skip_reasons.append(reason)
+        # Only the new button is created; the existing ones are kept
+        if self.skip_reasons_panel is not None: self._add_reason_button(reason)
+        return True
 
     def add_new_reason(self):
-        new_reason = self.new_reason_input.text().strip()
-        if new_reason and new_reason not in self.skip_reasons:
-            self.skip_reasons.append(new_reason)
-            self.update_reason_buttons()
-            self.new_reason_input.clear()
+        if self.add_skip_reason(self.new_reason_input.text().strip()): self.new_reason_input.clear()
 
     def update_toggle_button_text(self, show_all: bool):
         text = "Show Selected Only (V)" if show_all else "Show All Connections (V)"
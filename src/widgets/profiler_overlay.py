@@ -0,0 +1,34 @@
+# src/widgets/profiler_overlay.py
+from PyQt6.QtWidgets import QLabel
+from PyQt6.QtCore import QTimer
+
+from src.profiling import PROFILER
+
+# Timers shown in the status bar, in display order
+OVERLAY_TIMERS = ["navigate", "set_image", "load_from_json", "save_to_json",
+                  "redraw_component_rects", "redraw_connections", "update_file_list"]
+SHORT_NAMES = {"navigate": "nav", "set_image": "img", "load_from_json": "load", "save_to_json": "save",
+               "redraw_component_rects": "rects", "redraw_connections": "arrows", "update_file_list": "files"}
+
+
+class ProfilerOverlay(QLabel):
+    """Status-bar label with rolling p50/p95 (ms) of the profiled hot paths."""
+    def __init__(self, extra_text=None, parent=None, interval_ms=1000):
+        super().__init__(parent)
+        self._extra_text = extra_text
+        self.setStyleSheet("font-family: monospace; font-size: 9pt; color: #abb2bf;")
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start(interval_ms)
+        self.refresh()
+
+    def refresh(self):
+        summary = PROFILER.summary()
+        parts = []
+        for name in OVERLAY_TIMERS:
+            if name in summary:
+                stats = summary[name]
+                parts.append(f"{SHORT_NAMES[name]} {stats['p50_ms']:.1f}/{stats['p95_ms']:.1f}")
+        text = "p50/p95 ms  " + "  ".join(parts) if parts else "profiling: no samples yet"
+        if self._extra_text: text += f"  |  {self._extra_text()}"
+        self.setText(text)
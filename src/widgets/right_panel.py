@@ -1,20 +1,75 @@
 # src/widgets/right_panel.py
 import re
 import os # Import os for path operations
-import json # Import json to check for skipped status
+from collections import OrderedDict
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QListWidget, QGroupBox, 
                              QLabel, QSplitter, QListWidgetItem, QMenu,
-                             QLineEdit, QFormLayout)
-from PyQt6.QtCore import Qt, pyqtSignal, QPoint
-from PyQt6.QtGui import QIcon, QColor # Import QIcon and QColor
+                             QLineEdit, QFormLayout, QListView, QPushButton,
+                             QStyledItemDelegate, QStyleOptionViewItem, QStyle, QApplication)
+from PyQt6.QtCore import Qt, pyqtSignal, QPoint, QPointF, QRectF, QSize, QEvent, QTimer, QSortFilterProxyModel, QItemSelectionModel
+from PyQt6.QtGui import QIcon, QColor, QPixmap, QPainter, QPen, QPolygonF # Import QIcon and QColor
+from src.widgets.component_list import ComponentListModel
+from src.annotation_core import read_annotation, is_skipped, format_connections
+from src.profiling import timed
 
 def natural_sort_key(s):
     return [int(text) if text.isdigit() else text.lower() for text in re.split(r'([0-9]+)', s)]
 
+# Thumbnails kept on list rows at once; rows scrolled far away drop theirs (the disk cache keeps them)
+MAX_THUMBNAIL_ROWS = 1000
+# Rows above and below the visible ones that also get thumbnails, and the scroll debounce
+THUMBNAIL_ROW_MARGIN = 10
+THUMBNAIL_REQUEST_DELAY_MS = 40
+
+def file_status(json_folder, file_name):
+    """'skipped' if the image's JSON marks it as skipped, 'annotated' if it has components, else None."""
+    data = read_annotation(os.path.join(json_folder, f"{os.path.splitext(file_name)[0]}.json"))
+    if not isinstance(data, dict) or not data: return None # Missing, corrupted, unreadable or empty
+    return "skipped" if is_skipped(data) else "annotated"
+
+def scan_file_entries(file_names, json_folder):
+    """[(file name, status)] in natural order. Touches only the filesystem, so it can run off the GUI thread."""
+    return [(name, file_status(json_folder, name) if json_folder else None) for name in sorted(file_names, key=natural_sort_key)]
+
+class FileItemDelegate(QStyledItemDelegate):
+    """File list rows; with thumbnails shown, rows are thumbnail-high and the status is drawn over the thumbnail."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.thumbnail_size = 0
+
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        if self.thumbnail_size: size.setHeight(max(size.height(), self.thumbnail_size + 4))
+        return size
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        status = index.data(Qt.ItemDataRole.UserRole)
+        if not self.thumbnail_size or not status or index.data(Qt.ItemDataRole.DecorationRole) is None: return
+        opt = QStyleOptionViewItem(option); self.initStyleOption(opt, index)
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        icon_rect = QRectF(style.subElementRect(QStyle.SubElement.SE_ItemViewItemDecoration, opt, opt.widget))
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        if status == "skipped":
+            painter.fillRect(icon_rect, QColor(40, 44, 52, 170))
+            font = painter.font(); font.setBold(True); painter.setFont(font)
+            painter.setPen(QColor("#e06c75")); painter.drawText(icon_rect, Qt.AlignmentFlag.AlignCenter, "SKIPPED")
+        elif status == "annotated":
+            badge = QRectF(icon_rect.right() - 17, icon_rect.bottom() - 17, 16, 16)
+            painter.setPen(Qt.PenStyle.NoPen); painter.setBrush(QColor("#98c379")); painter.drawEllipse(badge)
+            painter.setPen(QPen(QColor("#282c34"), 2)); painter.setBrush(Qt.BrushStyle.NoBrush)
+            painter.drawPolyline(QPolygonF([badge.topLeft() + QPointF(4, 8), badge.topLeft() + QPointF(7, 11), badge.topLeft() + QPointF(12, 5)]))
+        painter.restore()
+
+
 class RightPanel(QWidget):
     component_selected = pyqtSignal(str)
     component_delete_requested = pyqtSignal(str)
     file_selected = pyqtSignal(QListWidgetItem)
+    # (duplicate file name, original file name) / duplicate file name
+    copy_annotations_requested = pyqtSignal(str, str)
+    skip_duplicate_requested = pyqtSignal(str)
     
     component_name_changed = pyqtSignal(str, str)
     component_connections_changed = pyqtSignal(str, str, str)
@@ -47,11 +102,23 @@ class RightPanel(QWidget):
         # --- Component List Group ---
         self.comp_list_group = QGroupBox("Annotated Components")
         comp_list_layout = QVBoxLayout()
-        self.comp_list_widget = QListWidget()
-        self.comp_list_widget.itemClicked.connect(self.on_comp_selected)
-        self.comp_list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.comp_list_widget.customContextMenuRequested.connect(self.show_comp_context_menu)
-        comp_list_layout.addWidget(self.comp_list_widget)
+        self.comp_filter_edit = QLineEdit()
+        self.comp_filter_edit.setPlaceholderText("Filter components...")
+        self.comp_filter_edit.setClearButtonEnabled(True)
+        self.comp_model = ComponentListModel(self)
+        self.comp_proxy = QSortFilterProxyModel(self)
+        self.comp_proxy.setSourceModel(self.comp_model)
+        self.comp_proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.comp_filter_edit.textChanged.connect(self.comp_proxy.setFilterFixedString)
+        self.comp_list_view = QListView()
+        self.comp_list_view.setModel(self.comp_proxy)
+        self.comp_list_view.setUniformItemSizes(True)
+        self.comp_list_view.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.comp_list_view.clicked.connect(self.on_comp_selected)
+        self.comp_list_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.comp_list_view.customContextMenuRequested.connect(self.show_comp_context_menu)
+        comp_list_layout.addWidget(self.comp_filter_edit)
+        comp_list_layout.addWidget(self.comp_list_view)
         self.comp_list_group.setLayout(comp_list_layout)
 
         # --- File List Group ---
@@ -59,6 +126,29 @@ class RightPanel(QWidget):
         file_list_layout = QVBoxLayout()
         self.file_list_widget = QListWidget()
         self.file_list_widget.itemClicked.connect(self.file_selected)
+        self.file_list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.file_list_widget.customContextMenuRequested.connect(self.show_file_context_menu)
+        self.file_delegate = FileItemDelegate(self.file_list_widget)
+        self.file_list_widget.setItemDelegate(self.file_delegate)
+        # {duplicate file name: original file name} from the last duplicate search
+        self.duplicate_of = {}
+        # Thumbnails: the loader is only created once they are first shown
+        self.btn_thumbnails = QPushButton("Show Thumbnails")
+        self.btn_thumbnails.setCheckable(True)
+        self.btn_thumbnails.toggled.connect(self.set_thumbnails_enabled)
+        self.image_folder = None
+        self.thumbnail_loader = None
+        # Rows asked for thumbnails ({file name: item}), and the rows showing one, oldest first
+        self._thumbnail_requests, self._thumbnail_rows = {}, OrderedDict()
+        self._thumbnail_timer = QTimer(self)
+        self._thumbnail_timer.setSingleShot(True)
+        self._thumbnail_timer.setInterval(THUMBNAIL_REQUEST_DELAY_MS)
+        self._thumbnail_timer.timeout.connect(self._request_visible_thumbnails)
+        self.file_list_widget.verticalScrollBar().valueChanged.connect(self._schedule_thumbnails)
+        self.file_list_widget.model().rowsInserted.connect(self._schedule_thumbnails)
+        self.file_list_widget.model().modelReset.connect(self._schedule_thumbnails)
+        self.file_list_widget.viewport().installEventFilter(self)
+        file_list_layout.addWidget(self.btn_thumbnails)
         file_list_layout.addWidget(self.file_list_widget)
         self.file_list_group.setLayout(file_list_layout)
 
@@ -87,52 +177,219 @@ class RightPanel(QWidget):
         self.component_connections_changed.emit(self._current_comp_name, conn_type, editor.text())
 
     def show_comp_context_menu(self, pos: QPoint):
-        item = self.comp_list_widget.itemAt(pos)
-        if not item: return
+        index = self.comp_list_view.indexAt(pos)
+        if not index.isValid(): return
         context_menu = QMenu(self)
         delete_action = context_menu.addAction("Delete Component")
-        action = context_menu.exec(self.comp_list_widget.mapToGlobal(pos))
-        if action == delete_action: self.component_delete_requested.emit(item.text())
+        action = context_menu.exec(self.comp_list_view.mapToGlobal(pos))
+        if action == delete_action: self.component_delete_requested.emit(index.data())
 
-    def on_comp_selected(self, item):
-        self.component_selected.emit(item.text())
+    def on_comp_selected(self, index):
+        self.component_selected.emit(index.data())
 
     def update_component_list(self, component_names):
-        self.comp_list_widget.clear()
-        self.comp_list_widget.addItems(sorted(component_names))
+        self.comp_model.set_names(component_names)
+
+    def select_component(self, name):
+        """Makes `name` the current row without emitting component_selected."""
+        row = self.comp_model.row_of(name)
+        proxy_index = self.comp_proxy.mapFromSource(self.comp_model.index(row)) if row >= 0 else None
+        if proxy_index is None or not proxy_index.isValid(): self.clear_component_selection(); return
+        if self.comp_list_view.currentIndex() == proxy_index: return
+        self.comp_list_view.selectionModel().setCurrentIndex(proxy_index, QItemSelectionModel.SelectionFlag.ClearAndSelect)
+
+    def clear_component_selection(self):
+        self.comp_list_view.clearSelection()
+
+    def adjacent_component(self, name, forward=True):
+        """Name of the next/previous visible component after `name` (wrapping around)."""
+        visible_count = self.comp_proxy.rowCount()
+        if not visible_count: return None
+        row = self.comp_model.row_of(name)
+        proxy_row = self.comp_proxy.mapFromSource(self.comp_model.index(row)).row() if row >= 0 else -1
+        if proxy_row < 0: new_row = 0 if forward else visible_count - 1
+        else: new_row = (proxy_row + (1 if forward else -1)) % visible_count
+        return self.comp_proxy.index(new_row, 0).data()
     
     # --- MODIFIED: update_file_list now checks for skipped status ---
+    @timed("update_file_list")
     def update_file_list(self, file_names, json_folder):
+        self.populate_file_list(scan_file_entries(file_names, json_folder))
+
+    def populate_file_list(self, entries):
+        """Fills the list from [(file name, status)] as returned by scan_file_entries."""
+        # clear() deletes the items, so no reference to them may be used afterwards
+        self._thumbnail_requests, self._thumbnail_rows = {}, OrderedDict()
         self.file_list_widget.clear()
-        
-        # Sort files naturally
-        sorted_files = sorted(file_names, key=natural_sort_key)
-        
-        for file_name in sorted_files:
-            item = QListWidgetItem(file_name)
-            
-            # Check if a corresponding JSON indicates a skipped status
-            if json_folder:
-                base_name = os.path.splitext(file_name)[0]
-                json_path = os.path.join(json_folder, f"{base_name}.json")
-                if os.path.exists(json_path):
-                    try:
-                        with open(json_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            if data.get("status") == "skipped":
-                                # Style the item to indicate it's skipped
-                                item.setForeground(QColor("#888888")) # Gray text
-                                item.setData(Qt.ItemDataRole.UserRole, "skipped") # Store status
-                    except (json.JSONDecodeError, IOError):
-                        pass # Ignore corrupted or unreadable files
-                        
-            self.file_list_widget.addItem(item)
-    
+        for file_name, status in entries: self.file_list_widget.addItem(self._new_file_item(file_name, status))
+
+    def _new_file_item(self, file_name, status):
+        item = QListWidgetItem(file_name)
+        if status: self._set_file_status(item, status)
+        if file_name in self.duplicate_of: self._set_duplicate_mark(item, self.duplicate_of[file_name])
+        return item
+
+    def _set_file_status(self, item, status):
+        if item.data(Qt.ItemDataRole.UserRole) == status: return
+        item.setData(Qt.ItemDataRole.UserRole, status)
+        # Files claimed by others keep their claim colour
+        if item.data(Qt.ItemDataRole.UserRole + 1): return
+        if status == "skipped": item.setForeground(QColor("#888888")) # Gray text
+        else: item.setData(Qt.ItemDataRole.ForegroundRole, None)
+
+    def set_file_status(self, file_name, status):
+        """Updates one row's status; the current row is checked first, saving a scan of the list."""
+        item = self.file_list_widget.currentItem()
+        items = [item] if item is not None and item.text() == file_name else self.file_list_widget.findItems(file_name, Qt.MatchFlag.MatchExactly)
+        for item in items: self._set_file_status(item, status)
+
+    def file_entries(self):
+        """[(file name, status)] of the list as shown."""
+        return [(item.text(), item.data(Qt.ItemDataRole.UserRole))
+                for item in (self.file_list_widget.item(row) for row in range(self.file_list_widget.count()))]
+
+    def reconcile_file_list(self, entries):
+        """Brings the list in line with fresh `entries`, staying on the current file.
+        Rows are only rebuilt when files were added or removed; returns True if they were."""
+        names = [name for name, _ in entries]
+        if names == [item_name for item_name, _ in self.file_entries()]:
+            for row, (_, status) in enumerate(entries): self._set_file_status(self.file_list_widget.item(row), status)
+            return False
+        current = self.file_list_widget.currentItem()
+        current_name, current_row = (current.text(), self.file_list_widget.currentRow()) if current else (None, -1)
+        self.populate_file_list(entries)
+        if current_name in names: self.file_list_widget.setCurrentRow(names.index(current_name))
+        elif names and current_row >= 0: self.file_list_widget.setCurrentRow(min(current_row, len(names) - 1))
+        return True
+
+    def apply_file_changes(self, added_entries, removed_names):
+        """Removes and inserts single rows (keeping natural order) instead of rebuilding the list."""
+        for name in removed_names:
+            for item in self.file_list_widget.findItems(name, Qt.MatchFlag.MatchExactly):
+                self.file_list_widget.takeItem(self.file_list_widget.row(item))
+            self._thumbnail_requests.pop(name, None); self._thumbnail_rows.pop(name, None)
+        for file_name, status in added_entries:
+            key, low, high = natural_sort_key(file_name), 0, self.file_list_widget.count()
+            while low < high:
+                mid = (low + high) // 2
+                if natural_sort_key(self.file_list_widget.item(mid).text()) < key: low = mid + 1
+                else: high = mid
+            self.file_list_widget.insertItem(low, self._new_file_item(file_name, status))
+
+    def refresh_file_statuses(self, base_names, json_folder):
+        """Re-reads the status of the images whose JSON (by base name) changed."""
+        for base in base_names:
+            for item in self.file_list_widget.findItems(f"{base}.", Qt.MatchFlag.MatchStartsWith):
+                if os.path.splitext(item.text())[0] == base: self._set_file_status(item, file_status(json_folder, item.text()))
+
+    # --- Thumbnails ---
+    def set_image_folder(self, folder):
+        self.image_folder = folder
+        if self.thumbnail_loader: self.thumbnail_loader.set_folder(folder)
+        self._schedule_thumbnails()
+
+    def set_thumbnails_enabled(self, enabled):
+        if self.btn_thumbnails.isChecked() != enabled: self.btn_thumbnails.setChecked(enabled); return # Comes back through toggled
+        if enabled and self.thumbnail_loader is None:
+            from src.thumbnails import ThumbnailLoader, default_cache_dir
+            self.thumbnail_loader = ThumbnailLoader(self, default_cache_dir())
+            self.thumbnail_loader.thumbnail_ready.connect(self._on_thumbnail_ready)
+        if self.thumbnail_loader: self.thumbnail_loader.set_folder(self.image_folder if enabled else None)
+        size = self.thumbnail_loader.size if enabled else 0
+        self.file_delegate.thumbnail_size = size
+        if enabled: self.file_list_widget.setIconSize(QSize(size, size))
+        else:
+            for item in self._thumbnail_rows.values(): item.setIcon(QIcon())
+            self._thumbnail_requests, self._thumbnail_rows = {}, OrderedDict()
+        # Rows are all the same height either way; this saves measuring each one
+        self.file_list_widget.setUniformItemSizes(enabled)
+        self.file_list_widget.doItemsLayout()
+        self._schedule_thumbnails()
+
+    def stop_thumbnails(self):
+        """Waits for running thumbnail jobs; call before the panel goes away."""
+        self._thumbnail_timer.stop()
+        if self.thumbnail_loader: self.thumbnail_loader.stop()
+
+    def eventFilter(self, obj, event):
+        if obj is self.file_list_widget.viewport() and event.type() == QEvent.Type.Resize: self._schedule_thumbnails()
+        return super().eventFilter(obj, event)
+
+    def _schedule_thumbnails(self, *_):
+        if self.btn_thumbnails.isChecked(): self._thumbnail_timer.start()
+
+    def _request_visible_thumbnails(self):
+        """Asks for the thumbnails of the rows in view (plus a margin) that have none yet."""
+        lw = self.file_list_widget
+        if not self.btn_thumbnails.isChecked() or not self.image_folder or not lw.count(): return
+        viewport = lw.viewport().rect()
+        first = lw.indexAt(viewport.topLeft()).row()
+        last = lw.indexAt(viewport.bottomLeft()).row()
+        if first < 0: first = 0
+        if last < 0: last = lw.count() - 1
+        self._thumbnail_requests = {}
+        for row in range(max(0, first - THUMBNAIL_ROW_MARGIN), min(lw.count(), last + THUMBNAIL_ROW_MARGIN + 1)):
+            item = lw.item(row)
+            if item.text() in self._thumbnail_rows: self._thumbnail_rows.move_to_end(item.text())
+            else: self._thumbnail_requests[item.text()] = item
+        self.thumbnail_loader.request(list(self._thumbnail_requests))
+
+    def _on_thumbnail_ready(self, file_name, image):
+        item = self._thumbnail_requests.pop(file_name, None)
+        if item is None: return # Scrolled away, or the list was rebuilt
+        item.setIcon(QIcon(QPixmap.fromImage(image)))
+        self._thumbnail_rows[file_name] = item
+        while len(self._thumbnail_rows) > MAX_THUMBNAIL_ROWS:
+            _, old_item = self._thumbnail_rows.popitem(last=False)
+            old_item.setIcon(QIcon())
+
     def mark_file_as_skipped(self, index):
         if 0 <= index < self.file_list_widget.count():
-            item = self.file_list_widget.item(index)
-            item.setForeground(QColor("#888888")) # Gray text
-            item.setData(Qt.ItemDataRole.UserRole, "skipped")
+            self._set_file_status(self.file_list_widget.item(index), "skipped")
+
+    def mark_claimed_files(self, claimed):
+        """Highlights files claimed by other annotators; `claimed` maps image base names to owners."""
+        for row in range(self.file_list_widget.count()):
+            item = self.file_list_widget.item(row)
+            owner = claimed.get(os.path.splitext(item.text())[0])
+            if owner == item.data(Qt.ItemDataRole.UserRole + 1): continue
+            item.setData(Qt.ItemDataRole.UserRole + 1, owner)
+            if owner:
+                item.setForeground(QColor("#d19a66"))
+            else:
+                if item.data(Qt.ItemDataRole.UserRole) == "skipped": item.setForeground(QColor("#888888"))
+                else: item.setData(Qt.ItemDataRole.ForegroundRole, None)
+            self._update_file_tooltip(item)
+
+    def mark_duplicates(self, duplicate_of):
+        """Marks near-duplicates; `duplicate_of` maps file names to the original they duplicate."""
+        self.duplicate_of = dict(duplicate_of)
+        for row in range(self.file_list_widget.count()):
+            item = self.file_list_widget.item(row)
+            original = self.duplicate_of.get(item.text())
+            if original != item.data(Qt.ItemDataRole.UserRole + 2): self._set_duplicate_mark(item, original)
+
+    def _set_duplicate_mark(self, item, original):
+        item.setData(Qt.ItemDataRole.UserRole + 2, original)
+        if original: item.setBackground(QColor("#4b3f5c"))
+        else: item.setData(Qt.ItemDataRole.BackgroundRole, None)
+        self._update_file_tooltip(item)
+
+    def _update_file_tooltip(self, item):
+        owner, original = item.data(Qt.ItemDataRole.UserRole + 1), item.data(Qt.ItemDataRole.UserRole + 2)
+        lines = ([f"Claimed by {owner}"] if owner else []) + ([f"Near-duplicate of {original}"] if original else [])
+        item.setToolTip("\n".join(lines))
+
+    def show_file_context_menu(self, pos: QPoint):
+        item = self.file_list_widget.itemAt(pos)
+        original = item.data(Qt.ItemDataRole.UserRole + 2) if item else None
+        if not original: return
+        context_menu = QMenu(self)
+        copy_action = context_menu.addAction(f"Copy Annotations from {original}")
+        skip_action = context_menu.addAction("Skip as Duplicate")
+        action = context_menu.exec(self.file_list_widget.mapToGlobal(pos))
+        if action == copy_action: self.copy_annotations_requested.emit(item.text(), original)
+        elif action == skip_action: self.skip_duplicate_requested.emit(item.text())
 
     def update_details(self, component_name, details):
         if not details or not component_name:
@@ -151,14 +408,9 @@ class RightPanel(QWidget):
         self.inouts_edit.blockSignals(True)
         self.name_edit.setText(component_name)
         conns = details.get('connections', {})
-        def format_conns(conn_list):
-            items = []
-            for c in conn_list:
-                items.append(f"{c['name']}*{c['count']}" if c.get('count', 1) > 1 else c['name'])
-            return ", ".join(items)
-        self.inputs_edit.setText(format_conns(conns.get('input', [])))
-        self.outputs_edit.setText(format_conns(conns.get('output', [])))
-        self.inouts_edit.setText(format_conns(conns.get('inout', [])))
+        self.inputs_edit.setText(format_connections(conns.get('input', [])))
+        self.outputs_edit.setText(format_connections(conns.get('output', [])))
+        self.inouts_edit.setText(format_connections(conns.get('inout', [])))
         self.name_edit.blockSignals(False)
         self.inputs_edit.blockSignals(False)
         self.outputs_edit.blockSignals(False)